@@ -1,37 +1,64 @@
 import streamlit as st
-from PIL import Image
 from src.workflow import expense_agent_system
 from src.types.state import ExpenseState
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.types import Command
+import logging
 import os
+import re
+import uuid
 from dotenv import load_dotenv
+from src.utils.blob_store import get_blob_store
+from src.utils.claim_classifier import warm_claim_classifier
+from src.utils.telemetry import configure_logging
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger("app")
+warm_claim_classifier()  # Builds the past-claim index in the background, once per process
 
 st.title("Expense Reimbursement Conversational Agent")
 
-# Initialize session state
+THREAD_ID_PATTERN = re.compile(r"claim-[0-9a-f]{32}")
+
+def new_thread_id() -> str:
+    """Unique checkpoint thread per request, so persisted claims are never reopened"""
+    return f"claim-{uuid.uuid4().hex}"
+
+def set_thread_id(thread_id: str) -> None:
+    """Use ``thread_id`` for this tab, keeping it in the URL so a reload or server restart resumes the claim"""
+    st.session_state.thread_id = thread_id
+    st.query_params["thread"] = thread_id
+
+def thread_has_state(thread_id: str) -> bool:
+    try:
+        return bool(expense_agent_system.get_state({"configurable": {"thread_id": thread_id}}).values)
+    except Exception as e:
+        logger.warning("Error loading thread %s: %s", thread_id, e)
+        return False
+
+# Initialize session state; a thread id in the URL reconnects to its checkpointed claim
 if "thread_id" not in st.session_state:
-    st.session_state.thread_id = "default_thread"
+    thread_id = st.query_params.get("thread")
+    set_thread_id(thread_id if thread_id and THREAD_ID_PATTERN.fullmatch(thread_id) else new_thread_id())
 if "last_interrupt" not in st.session_state:
     st.session_state.last_interrupt = None
 if "workflow_started" not in st.session_state:
-    st.session_state.workflow_started = False
+    st.session_state.workflow_started = thread_has_state(st.session_state.thread_id)
 
-print("=== UI Status ===")
-print(f"Thread ID: {st.session_state.thread_id}")
-print(f"Workflow Started: {st.session_state.workflow_started}")
-print(f"Last Interrupt: {st.session_state.last_interrupt}")
+logger.debug("UI Status")
+logger.debug("Thread ID: %s", st.session_state.thread_id)
+logger.debug("Workflow Started: %s", st.session_state.workflow_started)
+logger.debug("Last Interrupt: %s", st.session_state.last_interrupt)
 
 # Display chat messages from state if available
 try:
     config = {"configurable": {"thread_id": st.session_state.thread_id}}
     state = expense_agent_system.get_state(config)
-    print(f"Current State: {state}")
+    logger.debug("Current State: %s", state)
     if state.values and "messages" in state.values:
         messages = state.values["messages"]
-        print(f"Messages in state: {len(messages)}")
+        logger.debug("Messages in state: %s", len(messages))
         for msg in messages:
             if isinstance(msg, AIMessage):
                 with st.chat_message("assistant"):
@@ -40,20 +67,24 @@ try:
                 with st.chat_message("user"):
                     st.write(msg.content)
 except Exception as e:
-    print(f"Error loading state: {e}")
+    logger.warning("Error loading state: %s", e)
     st.write(f"Error loading state: {e}")
 
 # Sidebar for upload
 with st.sidebar:
     st.header("Upload Receipt")
-    uploaded_file = st.file_uploader("Upload your Uber/Lyft receipt", type=["png", "jpg", "jpeg"])
+    # PDFs and long screenshots are OCR'd page by page until the first receipt is complete;
+    # receipts after it are counted and reported in the chat, and go through `python -m src.batch`
+    uploaded_file = st.file_uploader("Upload your Uber/Lyft receipt", type=["png", "jpg", "jpeg", "pdf"])
     if uploaded_file and not st.session_state.workflow_started:
-        print("=== Receipt Upload Detected ===")
-        print(f"File uploaded: {uploaded_file.name}")
-        image = Image.open(uploaded_file)
-        print(f"Image loaded: {image.size}")
+        logger.debug("Receipt Upload Detected")
+        logger.debug("File uploaded: %s", uploaded_file.name)
+        # The upload goes straight to disk; the state only carries its blob key
+        blob = get_blob_store().put_bytes(uploaded_file.getvalue(), uploaded_file.type, uploaded_file.name)
+        logger.debug("Receipt stored: %s (%d bytes)", blob["key"], blob["size"])
         initial_state = ExpenseState(
-            receipt_image=image,  # Will be removed after OCR processing
+            receipt_blob=blob,
+            receipt_image=None,
             ocr_text=None,
             ocr_complete=False,
             amount=None,
@@ -85,63 +116,64 @@ with st.sidebar:
         )
         config = {"configurable": {"thread_id": st.session_state.thread_id}}
         try:
-            print("=== Starting Workflow ===")
+            logger.debug("Starting Workflow")
             result = expense_agent_system.invoke(initial_state, config)
-            print(f"Workflow result: {result}")
+            logger.debug("Workflow result: %s", result)
             st.session_state.workflow_started = True
             st.rerun()
         except Exception as e:
-            print(f"Error starting workflow: {e}")
+            logger.warning("Error starting workflow: %s", e)
             st.error(f"Error starting workflow: {e}")
 
 # Check for interrupts
 config = {"configurable": {"thread_id": st.session_state.thread_id}}
 try:
     state = expense_agent_system.get_state(config)
-    print(f"Checking for interrupts. State next: {state.next}")
+    logger.debug("Checking for interrupts. State next: %s", state.next)
     if state.next and any("hitl" in str(task) for task in state.tasks if task.interrupts):
-        print("=== HITL Interrupt Detected ===")
+        logger.debug("HITL Interrupt Detected")
         for task in state.tasks:
             if task.interrupts:
                 interrupt_value = task.interrupts[0].value
-                print(f"Interrupt value: {interrupt_value}")
+                logger.debug("Interrupt value: %s", interrupt_value)
                 st.session_state.last_interrupt = interrupt_value
                 with st.chat_message("assistant"):
                     st.write(interrupt_value)
                 break
 except Exception as e:
-    print(f"Error checking interrupts: {e}")
+    logger.warning("Error checking interrupts: %s", e)
 
 # Chat input for user responses - ALWAYS AVAILABLE
-print("=== Chat Input Section ===")
+logger.debug("Chat Input Section")
 if st.session_state.last_interrupt:
-    print("Showing interrupt response input")
+    logger.debug("Showing interrupt response input")
     user_input = st.chat_input("Your response:")
     if user_input:
-        print(f"User interrupt response: {user_input}")
+        logger.debug("User interrupt response: %s", user_input)
         # Resume workflow with user input
         try:
             result = expense_agent_system.invoke(Command(resume=user_input), config)
-            print(f"Resume result: {result}")
+            logger.debug("Resume result: %s", result)
             st.session_state.last_interrupt = None
             st.rerun()
         except Exception as e:
-            print(f"Error resuming workflow: {e}")
+            logger.warning("Error resuming workflow: %s", e)
             st.error(f"Error resuming workflow: {e}")
 else:
-    print("Showing general chat input")
+    logger.debug("Showing general chat input")
     user_input = st.chat_input("Ask me about your expense or upload a receipt:")
     if user_input:
-        print(f"User general message: {user_input}")
+        logger.debug("User general message: %s", user_input)
         # Send general message to workflow
         try:
             if st.session_state.workflow_started:
-                print("Sending message to active workflow")
+                logger.debug("Sending message to active workflow")
                 result = expense_agent_system.invoke(Command(resume=user_input), config)
-                print(f"Message result: {result}")
+                logger.debug("Message result: %s", result)
             else:
-                print("Starting new conversation")
+                logger.debug("Starting new conversation")
                 initial_state = ExpenseState(
+                    receipt_blob=None,
                     receipt_image=None,
                     ocr_text=None,
                     ocr_complete=False,
@@ -173,21 +205,21 @@ else:
                     approval_determined=False
                 )
                 result = expense_agent_system.invoke(initial_state, config)
-                print(f"New conversation result: {result}")
+                logger.debug("New conversation result: %s", result)
                 st.session_state.workflow_started = True
             st.rerun()
         except Exception as e:
-            print(f"Error sending message: {e}")
+            logger.warning("Error sending message: %s", e)
             st.error(f"Error sending message: {e}")
 
 if st.session_state.workflow_started:
-    print("=== Checking Workflow Completion ===")
+    logger.debug("Checking Workflow Completion")
     # Check if workflow is complete
     try:
         state = expense_agent_system.get_state(config)
-        print(f"Final state check - next: {state.next}")
+        logger.debug("Final state check - next: %s", state.next)
         if not state.next:
-            print("=== Workflow Complete ===")
+            logger.debug("Workflow Complete")
             with st.chat_message("assistant"):
                 st.write("Workflow complete!")
                 final_state = state.values
@@ -196,13 +228,13 @@ if st.session_state.workflow_started:
                 else:
                     st.write("Your expense requires manager approval.")
             if st.button("Start New Request"):
-                print("=== Resetting for New Request ===")
+                logger.debug("Resetting for New Request")
                 # Reset
                 st.session_state.workflow_started = False
-                st.session_state.thread_id = f"thread_{len(st.session_state.thread_id.split('_'))}"
+                set_thread_id(new_thread_id())
                 st.rerun()
     except Exception as e:
-        print(f"Error checking completion: {e}")
+        logger.warning("Error checking completion: %s", e)
         st.error(f"Error checking completion: {e}")
 
-print("=== UI Render Complete ===")
\ No newline at end of file
+logger.debug("UI Render Complete")
\ No newline at end of file
@@ -6,4 +6,4 @@ from ..types.state import ExpenseState
 def approval_router_agent_node(state: ExpenseState) -> Command:
     """Route approval"""
     # Stub: just pass through
-    return Command(goto="supervisor", update=state)
\ No newline at end of file
+    return Command(goto="supervisor")
\ No newline at end of file
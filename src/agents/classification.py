@@ -1,23 +1,28 @@
 """Classification Agent - Classifies expense purpose and department"""
 
+import asyncio
+import logging
+from typing import Any, Dict, Optional
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.types import Command
 from ..types.state import ExpenseState
-from ..utils.helpers import extract_json_from_llm_response
-from ..config.settings import LLM_MODEL, LLM_BASE_URL, LLM_DEFAULT_HEADERS, OPENROUTER_API_KEY, CLASSIFICATION_CONFIDENCE_THRESHOLD
-from langchain_openai import ChatOpenAI
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model=LLM_MODEL,
-    base_url=LLM_BASE_URL,
-    api_key=OPENROUTER_API_KEY,
-    default_headers=LLM_DEFAULT_HEADERS
-)
+from ..config.settings import CLASSIFICATION_CONFIDENCE_THRESHOLD
+from ..utils.llm_client import get_llm
+from ..utils.hitl_matcher import clarification_options, format_options
+from ..utils.llm_json import JSONSchema, SchemaField
 
-def classification_agent_node(state: ExpenseState) -> Command:
-    """Classify expense purpose and department"""
-    prompt = f"""
+logger = logging.getLogger(__name__)
+
+CLASSIFICATION_SCHEMA = JSONSchema("classification", {
+    "department": SchemaField(str, required=True),
+    "purpose": SchemaField(str, required=True),
+    "confidence": SchemaField(int, required=True, minimum=0, maximum=100),
+    "questions": SchemaField(list, default=[]),
+})
+
+def _build_classification_prompt(state: ExpenseState) -> str:
+    """Prompt asking the LLM for department, purpose and confidence"""
+    return f"""
     Analyze this expense:
     Dropoff: {state.get('dropoff_location', '')}
     Date: {state.get('expense_date', '')}
@@ -28,20 +33,67 @@ def classification_agent_node(state: ExpenseState) -> Command:
 
     Respond in JSON: {{"department": "...", "purpose": "...", "confidence": 0, "questions": []}}
     """
-    response = llm.invoke([HumanMessage(content=prompt)])
-    parsed = extract_json_from_llm_response(response.content)
-    state.update({
+
+def classification_result(parsed: dict, path: str = "llm", employee_id: Optional[str] = None) -> Dict[str, Any]:
+    """State update recording department, purpose and confidence, flagging HITL when confidence is low
+
+    A clarification offers numbered options: the guess itself, then the
+    employee's most frequent past classifications.
+    """
+    update = {
         "department": parsed["department"],
         "purpose": parsed["purpose"],
-        "classification_confidence": parsed["confidence"]
-    })
+        "classification_confidence": parsed["confidence"],
+        "classification_path": path,
+    }
 
     if parsed["confidence"] < CLASSIFICATION_CONFIDENCE_THRESHOLD:
-        state["needs_clarification"] = True
-        state["clarification_questions"] = parsed["questions"]
-        state["messages"].append(AIMessage(content=f"Classified: Department {parsed['department']}, Purpose {parsed['purpose']} (Confidence: {parsed['confidence']}%) - Need clarification"))
-        return Command(goto="hitl", update=state)
+        update["needs_clarification"] = True
+        options = clarification_options(employee_id, parsed["department"], parsed["purpose"])
+        questions = list(parsed.get("questions", []))
+        update["clarification_options"] = options
+        update["clarification_questions"] = questions + [format_options(options)] if options else questions
+        update["messages"] = [AIMessage(content=f"Classified: Department {parsed['department']}, Purpose {parsed['purpose']} (Confidence: {parsed['confidence']}%) - Need clarification")]
     else:
-        state["department_confirmed"] = True
-        state["messages"].append(AIMessage(content=f"Classified: Department {parsed['department']}, Purpose {parsed['purpose']} (Confidence: {parsed['confidence']}%)"))
-        return Command(goto="supervisor", update=state)
\ No newline at end of file
+        update["department_confirmed"] = True
+        update["messages"] = [AIMessage(content=f"Classified: Department {parsed['department']}, Purpose {parsed['purpose']} (Confidence: {parsed['confidence']}%)")]
+    return update
+
+def _classify_offline(state: ExpenseState) -> Optional[Dict[str, Any]]:
+    """Department and purpose agreed on by similar past claims; None means the LLM is needed"""
+    # NumPy loads with the classifier index, on the first claim that needs classifying
+    from ..utils.claim_classifier import ClaimKey, get_claim_classifier
+
+    try:
+        classifier = get_claim_classifier(wait=False)
+        prediction = classifier.predict(ClaimKey.from_state(state)) if classifier is not None else None
+    except Exception as e:
+        logger.warning("Past-claim classifier failed: %s", e)
+        return None
+    if prediction is None or prediction.confidence < CLASSIFICATION_CONFIDENCE_THRESHOLD:
+        return None
+    logger.debug("Classified from %d similar past claims: %s", prediction.support, prediction)
+    parsed = {"department": prediction.department, "purpose": prediction.purpose, "confidence": round(prediction.confidence)}
+    return classification_result(parsed, path="knn")
+
+def _classification_command(update: Dict[str, Any]) -> Command:
+    """Route to HITL when the classification's confidence is low"""
+    if update.get("needs_clarification"):
+        return Command(goto="hitl", update=update)
+    return Command(goto="supervisor", update=update)
+
+def classification_agent_node(state: ExpenseState) -> Command:
+    """Classify expense purpose and department"""
+    update = _classify_offline(state)
+    if update is None:
+        parsed = get_llm().invoke_json([HumanMessage(content=_build_classification_prompt(state))], CLASSIFICATION_SCHEMA)
+        update = classification_result(parsed, employee_id=state.get("employee_id"))
+    return _classification_command(update)
+
+async def aclassification_agent_node(state: ExpenseState) -> Command:
+    """Async variant of classification_agent_node; the index search runs in a worker thread"""
+    update = await asyncio.to_thread(_classify_offline, state)
+    if update is None:
+        parsed = await get_llm().ainvoke_json([HumanMessage(content=_build_classification_prompt(state))], CLASSIFICATION_SCHEMA)
+        update = classification_result(parsed, employee_id=state.get("employee_id"))
+    return _classification_command(update)
@@ -1,10 +1,98 @@
 """Exception Handler Agent - Manages policy violations and edge cases"""
 
+import logging
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
+from ..config.settings import ESCALATING_VIOLATION_SEVERITIES
 from ..types.state import ExpenseState
 
-def exception_handler_agent_node(state: ExpenseState) -> Command:
-    """Handle exceptions"""
-    # Stub: assume no violation
-    state["policy_violation"] = False
-    return Command(goto="supervisor", update=state)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+def _duplicate_violation(duplicate: dict) -> dict:
+    """Violation record for a receipt that was already submitted"""
+    submitter = duplicate.get("employee_id") or "another claim"
+    return {
+        "type": "duplicate_receipt",
+        "severity": "high",
+        "message": f"Receipt matches one submitted by {submitter} on {duplicate.get('first_seen')} ({duplicate.get('match')} match)",
+        **duplicate,
+    }
+
+def _exact_duplicate_violation(match: dict) -> dict:
+    """Violation record for a claim with the same merchant, date and amount as an earlier one"""
+    return {
+        "type": "duplicate_claim",
+        "severity": "high",
+        "message": f"Same merchant, date and amount ({match['amount']:.2f} {match['currency']}) as claim {match['claim_id']}",
+        **match,
+    }
+
+def _near_duplicate_violation(matches: List[dict], window_days: int) -> dict:
+    """Violation record for similar claims by the same employee close together in time"""
+    described = ", ".join(f"{m['claim_id']} ({m['expense_date']}, {m['amount']:.2f} {m['currency']})" for m in matches[:3])
+    return {
+        "type": "near_duplicate_claim",
+        "severity": "medium",
+        "message": f"{len(matches)} similar claim(s) within {window_days} days: {described}",
+        "matches": matches,
+    }
+
+def _outlier_violation(outlier) -> dict:
+    """Violation record for an amount far above its merchant's or route's history"""
+    return {
+        "type": "amount_outlier",
+        "severity": "medium",
+        "message": (
+            f"Amount is {outlier.z_score} standard deviations above typical for {outlier.group} "
+            f"(typical ~{outlier.typical_amount_usd:.2f} USD over {outlier.samples} claims)"
+        ),
+        **outlier._asdict(),
+    }
+
+def _history_violations(state: ExpenseState, thread_id: Optional[str]) -> List[dict]:
+    """Check the claim against indexed history, then record it"""
+    from ..utils.claim_index import ClaimRecord, get_claim_index
+
+    index = get_claim_index()
+    if index is None:
+        return []
+    exact, near, outliers = index.check(ClaimRecord.from_state(state, thread_id))
+    violations = [_exact_duplicate_violation(exact)] if exact else []
+    if near:
+        violations.append(_near_duplicate_violation(near, index.window_days))
+    violations.extend(_outlier_violation(outlier) for outlier in outliers)
+    return violations
+
+def exception_handler_agent_node(state: ExpenseState, config: RunnableConfig = None) -> Command:
+    """Flag duplicate receipts, duplicate or near-duplicate claims and outlying amounts"""
+    violations = list(state.get("violations") or [])
+
+    duplicate = state.get("duplicate_receipt")
+    if duplicate:
+        violations.append(_duplicate_violation(duplicate))
+
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    try:
+        violations.extend(_history_violations(state, thread_id))
+    except Exception as e:
+        logger.warning("Claim history check failed: %s", e)
+
+    update = {
+        "violations": violations,
+        "policy_violation": bool(violations),
+        "exceptions_checked": True,
+    }
+    new_violations = violations[len(state.get("violations") or []):]
+    if any(violation["severity"] in ESCALATING_VIOLATION_SEVERITIES for violation in new_violations):
+        # Duplicates always go to a manager, whatever the amount
+        update["requires_manager_approval"] = True
+        update["approval_status"] = "requires_manager"
+    if new_violations:
+        update["messages"] = [
+            AIMessage(content=f"Possible {violation['type'].replace('_', ' ')}: {violation['message']}")
+            for violation in new_violations
+        ]
+    return Command(goto="supervisor", update=update)
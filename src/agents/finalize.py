@@ -1,11 +1,54 @@
 """Finalize Agent - Completes expense submission"""
 
+import logging
+
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
 from langgraph.types import Command
 from ..types.state import ExpenseState
+from ..utils.spend_ledger import get_spend_ledger
+from .policy_engine import claim_amount_usd
+
+logger = logging.getLogger(__name__)
+
+# Classifications the past-claim classifier learns from: the LLM's and fully answered HITL questions
+LEARNED_CLASSIFICATION_PATHS = ("llm", "fused", "hitl")
+
+def _record_spend(state: ExpenseState, config: RunnableConfig) -> None:
+    """Add the completed claim to the running spend totals"""
+    ledger = get_spend_ledger()
+    claim = claim_amount_usd(state)
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    if ledger is None or claim is None or thread_id is None:
+        return
+    expense_date, amount_usd = claim
+    try:
+        ledger.record_claim(thread_id, state.get("employee_id"), state.get("department"), expense_date, amount_usd)
+    except Exception as e:
+        logger.warning("Recording spend failed: %s", e)
+
+def _record_classification(state: ExpenseState, config: RunnableConfig) -> None:
+    """Teach the past-claim classifier this claim's confirmed department and purpose
+
+    Claims the classifier labelled itself are skipped, so it only learns from
+    the LLM and from employees. So are answers naming only one field
+    (``"hitl_partial"``), whose other field is still the low-confidence guess.
+    """
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    department, purpose = state.get("department"), state.get("purpose")
+    if (thread_id is None or not state.get("department_confirmed") or not department or not purpose
+            or state.get("classification_path") not in LEARNED_CLASSIFICATION_PATHS):
+        return
+    from ..utils.claim_classifier import ClaimKey, record_classification
+
+    try:
+        record_classification(thread_id, ClaimKey.from_state(state), department, purpose)
+    except Exception as e:
+        logger.warning("Recording classification failed: %s", e)
 
-def finalize_agent_node(state: ExpenseState) -> Command:
+def finalize_agent_node(state: ExpenseState, config: RunnableConfig = None) -> Command:
     """Finalize"""
-    # Stub
-    state["messages"].append(AIMessage(content="Expense submitted successfully."))
-    return Command(goto="finalize", update=state)
\ No newline at end of file
+    _record_spend(state, config)
+    _record_classification(state, config)
+    return Command(goto=END, update={"messages": [AIMessage(content="Expense submitted successfully.")]})
\ No newline at end of file
@@ -1,19 +1,51 @@
 """HITL (Human-in-the-Loop) Agent - Handles interactive conversations for clarification"""
 
+from typing import Any, Dict, Optional
+import logging
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.types import Command, interrupt
 from ..types.state import ExpenseState
-from ..utils.helpers import extract_json_from_llm_response
-from ..config.settings import LLM_MODEL, LLM_BASE_URL, LLM_DEFAULT_HEADERS, OPENROUTER_API_KEY
-from langchain_openai import ChatOpenAI
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model=LLM_MODEL,
-    base_url=LLM_BASE_URL,
-    api_key=OPENROUTER_API_KEY,
-    default_headers=LLM_DEFAULT_HEADERS
-)
+from ..config.settings import HITL_LOCAL_MATCH_ENABLED
+from ..utils.hitl_matcher import AnswerMatch, get_answer_matcher
+from ..utils.llm_client import get_llm
+from ..utils.llm_json import JSONSchema, SchemaField
+from ..utils.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Either may be missing when the answer only covers one; the classification's value is kept,
+# but the claim is marked "hitl_partial" so the past-claim classifier does not learn the guess
+HITL_SCHEMA = JSONSchema("hitl", {
+    "department": SchemaField(str),
+    "purpose": SchemaField(str),
+})
+
+def _build_parse_prompt(question_text: str, user_response: Any) -> str:
+    return f"User asked: {question_text}\nUser said: {user_response}\nExtract department and purpose as JSON: {{\"department\": \"...\", \"purpose\": \"...\"}}. Use null for anything the user did not state."
+
+def _match_locally(state: ExpenseState, user_response: Any) -> Optional[AnswerMatch]:
+    """Department and purpose read from an option number or known vocabulary; None means the LLM is needed"""
+    if not HITL_LOCAL_MATCH_ENABLED:
+        return None
+    try:
+        return get_answer_matcher().match(str(user_response), state.get("clarification_options") or [])
+    except Exception as e:
+        logger.warning("Local HITL answer matching failed: %s", e)
+        return None
+
+def _user_response_update(state: ExpenseState, user_response: str, parsed: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """State update with the department and purpose parsed from the user's answer"""
+    get_telemetry().record_hitl_answer(path)
+    complete = bool(parsed.get("department") and parsed.get("purpose"))
+    return {
+        "department": parsed.get("department") or state.get("department"),
+        "purpose": parsed.get("purpose") or state.get("purpose"),
+        "needs_clarification": False,
+        "department_confirmed": True,
+        "classification_path": "hitl" if complete else "hitl_partial",
+        "hitl_path": path,
+        "user_provided_context": user_response
+    }
 
 def hitl_agent_node(state: ExpenseState) -> Command:
     """Handle user clarification"""
@@ -21,15 +53,25 @@ def hitl_agent_node(state: ExpenseState) -> Command:
     question_text = "\n".join(questions)
     user_response = interrupt(question_text)
 
-    # Parse response
-    parse_prompt = f"User asked: {question_text}\nUser said: {user_response}\nExtract department and purpose."
-    response = llm.invoke([HumanMessage(content=parse_prompt)])
-    parsed = extract_json_from_llm_response(response.content)
-    state.update({
-        "department": parsed.get("department", state.get("department")),
-        "purpose": parsed.get("purpose", state.get("purpose")),
-        "needs_clarification": False,
-        "department_confirmed": True,
-        "user_provided_context": user_response
-    })
-    return Command(goto="supervisor", update=state)
\ No newline at end of file
+    # Parse response: locally when the answer is an option number or a known department/purpose
+    match = _match_locally(state, user_response)
+    if match is not None:
+        parsed, path = match._asdict(), match.path
+    else:
+        parsed = get_llm().invoke_json([HumanMessage(content=_build_parse_prompt(question_text, user_response))], HITL_SCHEMA)
+        path = "llm"
+    return Command(goto="supervisor", update=_user_response_update(state, user_response, parsed, path))
+
+async def ahitl_agent_node(state: ExpenseState) -> Command:
+    """Async variant of hitl_agent_node"""
+    questions = state["clarification_questions"]
+    question_text = "\n".join(questions)
+    user_response = interrupt(question_text)
+
+    match = _match_locally(state, user_response)
+    if match is not None:
+        parsed, path = match._asdict(), match.path
+    else:
+        parsed = await get_llm().ainvoke_json([HumanMessage(content=_build_parse_prompt(question_text, user_response))], HITL_SCHEMA)
+        path = "llm"
+    return Command(goto="supervisor", update=_user_response_update(state, user_response, parsed, path))
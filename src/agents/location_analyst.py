@@ -1,26 +1,55 @@
 """Location Analyst Agent - Determines country and geographic context"""
 
+from typing import Any, Dict, Optional
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.types import Command
 from ..types.state import ExpenseState
-from ..config.settings import LLM_MODEL, LLM_BASE_URL, LLM_DEFAULT_HEADERS, OPENROUTER_API_KEY
-from langchain_openai import ChatOpenAI
+from ..config.settings import GAZETTEER_ENABLED
+from ..utils.gazetteer import get_gazetteer
+from ..utils.llm_client import get_llm
 
-# Initialize LLM
-llm = ChatOpenAI(
-    model=LLM_MODEL,
-    base_url=LLM_BASE_URL,
-    api_key=OPENROUTER_API_KEY,
-    default_headers=LLM_DEFAULT_HEADERS
-)
+def _build_location_prompt(state: ExpenseState) -> str:
+    """Prompt asking the LLM for the country of the trip"""
+    locations = f"{state.get('pickup_location', '')} {state.get('dropoff_location', '')}"
+    return f"Identify the country from these locations: {locations}. Respond with country name."
+
+def location_result(country: str, city: Optional[str] = None) -> Dict[str, Any]:
+    """State update recording the identified country (and city, when known)"""
+    update = {"country": country, "country_identified": True, "messages": [AIMessage(content=f"Identified country: {country}")]}
+    if city:
+        update["city"] = city
+    return update
+
+def _resolve_offline(state: ExpenseState) -> Optional[Dict[str, Any]]:
+    """Country and city from the gazetteer; None means the LLM is needed"""
+    if not GAZETTEER_ENABLED:
+        return None
+    place = get_gazetteer().resolve(state.get("pickup_location"), state.get("dropoff_location"))
+    if place is None:
+        return None
+    return location_result(place.country, place.city)
+
+def _location_update(state: ExpenseState, response_content: str) -> Dict[str, Any]:
+    """Record the country named in the LLM response and memoize it when it is a known country"""
+    country = response_content.strip()
+    if GAZETTEER_ENABLED:
+        gazetteer = get_gazetteer()
+        country = gazetteer.canonical_country(country) or country
+        gazetteer.remember(state.get("pickup_location"), state.get("dropoff_location"), country)
+    return location_result(country)
 
 def location_analyst_agent_node(state: ExpenseState) -> Command:
     """Determine country from location data"""
-    locations = f"{state.get('pickup_location', '')} {state.get('dropoff_location', '')}"
-    prompt = f"Identify the country from these locations: {locations}. Respond with country name."
-    response = llm.invoke([HumanMessage(content=prompt)])
-    country = response.content.strip()
-    state["country"] = country
-    state["country_identified"] = True
-    state["messages"].append(AIMessage(content=f"Identified country: {country}"))
-    return Command(goto="supervisor", update=state)
\ No newline at end of file
+    update = _resolve_offline(state)
+    if update is None:
+        response = get_llm().invoke([HumanMessage(content=_build_location_prompt(state))])
+        update = _location_update(state, response.content)
+    return Command(goto="supervisor", update=update)
+
+async def alocation_analyst_agent_node(state: ExpenseState) -> Command:
+    """Async variant of location_analyst_agent_node"""
+    update = _resolve_offline(state)
+    if update is None:
+        response = await get_llm().ainvoke([HumanMessage(content=_build_location_prompt(state))])
+        update = _location_update(state, response.content)
+    return Command(goto="supervisor", update=update)
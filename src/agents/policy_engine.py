@@ -1,29 +1,69 @@
 """Policy Engine Agent - Applies temporal business rules"""
 
+import logging
+
 from langchain_core.messages import AIMessage
 from langgraph.types import Command
 from ..types.state import ExpenseState
-from ..utils.helpers import calculate_approval_threshold, determine_approval_status
-from ..config.settings import RULE_CHANGE_DATE
+from ..utils.policy_rules import get_policy_table, normalize_expense_date
+from ..utils.spend_ledger import get_spend_ledger
+from ..config.settings import DEFAULT_EXPENSE_CATEGORY
+
+logger = logging.getLogger(__name__)
+
+def claim_amount_usd(state: ExpenseState):
+    """(ISO expense date, amount in USD) of a claim, or None when either is unknown"""
+    expense_date = normalize_expense_date(state.get("expense_date"))
+    amount = state.get("amount")
+    if expense_date is None or amount is None:
+        return None
+    amount_usd = get_policy_table().convert(float(amount), state.get("currency"), "USD")
+    return None if amount_usd is None else (expense_date, amount_usd)
+
+def _check_spend_caps(state: ExpenseState):
+    """Spend to date and breached caps from the running totals (constant-time lookups)"""
+    ledger = get_spend_ledger()
+    claim = claim_amount_usd(state)
+    if ledger is None or claim is None:
+        return None, []
+    expense_date, amount_usd = claim
+    try:
+        return ledger.check_caps(state.get("employee_id"), state.get("department"), expense_date, amount_usd)
+    except Exception as e:
+        logger.warning("Spend cap check failed: %s", e)
+        return None, []
 
 def policy_engine_agent_node(state: ExpenseState) -> Command:
     """Apply business rules"""
-    date = state.get("expense_date", "")
-    amount = state.get("amount", 0)
+    # Most specific effective-dated rule for the claim's country, department and category
+    decision = get_policy_table().evaluate(
+        amount=state.get("amount"),
+        currency=state.get("currency"),
+        expense_date=state.get("expense_date"),
+        country=state.get("country"),
+        department=state.get("department"),
+        category=state.get("expense_category") or DEFAULT_EXPENSE_CATEGORY,
+    )
+    approval_status = decision.approval_status
+    reason = decision.reason
 
-    # Calculate threshold based on date
-    threshold = calculate_approval_threshold(date)
+    spend_to_date, cap_breaches = _check_spend_caps(state)
+    if cap_breaches:
+        approval_status = "requires_manager"
+        reason = "; ".join(
+            f"{b['scope']} {b['period']} cap {b['cap_usd']:.2f} USD would reach {b['projected_usd']:.2f} USD"
+            for b in cap_breaches
+        )
 
-    # Determine approval status
-    approval_status = determine_approval_status(amount, threshold)
-
-    state.update({
+    status_msg = "requires manager approval" if approval_status == "requires_manager" else "auto-approved"
+    rule_id = decision.rule.id if decision.rule else "none"
+    return Command(goto="supervisor", update={
         "rules_applied": True,
+        "applied_rule": decision.applied_rule(),
         "requires_manager_approval": approval_status == "requires_manager",
         "approval_status": approval_status,
-        "approval_determined": True
+        "spend_to_date": spend_to_date,
+        "cap_breaches": cap_breaches,
+        "approval_determined": True,
+        "messages": [AIMessage(content=f"Applied rules: {status_msg} (rule {rule_id}: {reason})")]
     })
-
-    status_msg = "requires manager approval" if approval_status == "requires_manager" else "auto-approved"
-    state["messages"].append(AIMessage(content=f"Applied rules: {status_msg}"))
-    return Command(goto="supervisor", update=state)
\ No newline at end of file
@@ -1,62 +1,115 @@
 """Receipt Processor Agent - Handles OCR and data extraction from receipts"""
 
-import pytesseract
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
 from ..types.state import ExpenseState
-from ..utils.helpers import extract_json_from_llm_response
-from ..config.settings import LLM_MODEL, LLM_BASE_URL, LLM_DEFAULT_HEADERS, OPENROUTER_API_KEY
-from langchain_openai import ChatOpenAI
-
-# Configure pytesseract to use the correct path
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model=LLM_MODEL,
-    base_url=LLM_BASE_URL,
-    api_key=OPENROUTER_API_KEY,
-    default_headers=LLM_DEFAULT_HEADERS
-)
-
-def receipt_processor_agent_node(state: ExpenseState) -> Command:
-    """Extract structured data from receipt"""
-    print("=== RECEIPT PROCESSOR STARTED ===")
-    print(f"Receipt image present: {state['receipt_image'] is not None}")
-    
-    if state["receipt_image"]:
-        print("Processing receipt image with OCR...")
-        try:
-            # Use pytesseract for text extraction
-            text = pytesseract.image_to_string(state["receipt_image"])
-            print("=== TESSERACT OCR SUCCESSFUL ===")
-            print(f"Extracted text length: {len(text)} characters")
-            print("OCR Text preview:")
-            print(text[:200] + "..." if len(text) > 200 else text)
-        except Exception as e:
-            # Fallback: Use mock OCR data if Tesseract fails
-            print(f"=== TESSERACT FAILED: {e} ===")
-            print("Using mock OCR data fallback")
-            text = """
-            UBER RECEIPT
-            Date: 2025-10-30
-            Amount: $45.67
-            Merchant: Uber
-            Pickup: Downtown Office
-            Dropoff: Airport Terminal 3
-            """
-        
-        state["ocr_text"] = text
-        state["ocr_complete"] = True
-        print("OCR text stored in state")
-        
-        # Remove image from state to avoid serialization issues
-        del state["receipt_image"]  # Completely remove the key
-        print("Receipt image completely removed from state for serialization")
+from ..utils.receipt_parsers import parse_receipt_text
+from ..config.settings import CLASSIFICATION_CONFIDENCE_THRESHOLD, EXTRACTION_MODE, TEMPLATE_PARSERS_ENABLED, TEMPLATE_PARSER_MIN_CONFIDENCE
+from .location_analyst import location_result
+from .classification import classification_result
+from ..utils.llm_client import get_llm
+from ..utils.llm_json import JSONSchema, SchemaField
 
-        # Use LLM to extract fields
-        print("=== LLM DATA EXTRACTION ===")
-        prompt = f"""
+logger = logging.getLogger(__name__)
+
+# Receipt fields produced by extraction
+FIELD_KEYS = ["amount", "currency", "expense_date", "merchant", "pickup_location", "dropoff_location"]
+
+# Fields may be null when the receipt does not show them; the policy engine handles a missing amount
+EXTRACTION_SCHEMA = JSONSchema("extraction", {
+    "amount": SchemaField(float, minimum=0),
+    "currency": SchemaField(str, default="USD"),
+    "expense_date": SchemaField(str),
+    "merchant": SchemaField(str),
+    "pickup_location": SchemaField(str),
+    "dropoff_location": SchemaField(str),
+})
+
+# Stage keys are optional: a stage the response leaves out is run by its dedicated agent
+FUSED_SCHEMA = JSONSchema("fused extraction", {
+    **EXTRACTION_SCHEMA.fields,
+    "country": SchemaField(str),
+    "city": SchemaField(str),
+    "department": SchemaField(str),
+    "purpose": SchemaField(str),
+    "confidence": SchemaField(int, minimum=0, maximum=100),
+    "questions": SchemaField(list),
+})
+
+def _ocr_receipt(state: ExpenseState, config: Optional[RunnableConfig]) -> Tuple[str, Dict[str, Any]]:
+    """OCR the receipt through the cache; returns the text and the state update
+
+    Blob-store receipts are read page by page (PDF pages, or tiles of a tall
+    image), each decoded only while it is OCR'd, and reading stops once the
+    first receipt in the document has every required field. Receipts found
+    after it and pages left unread are recorded, and the user is told. A legacy
+    in-memory image is cleared by the update, so later checkpoints no longer
+    carry it.
+    """
+    # Tesseract, OpenCV, NumPy and PIL load on the first receipt image, not at import
+    from ..utils.ocr_cache import cached_ocr
+
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    blob = state.get("receipt_blob")
+    if blob:
+        from ..utils.blob_store import get_blob_store
+        from ..utils.document_ingest import iter_pages, read_first_claim
+
+        fingerprints, duplicates = [], []
+
+        def ocr_page(image, steps=None) -> str:
+            page_text, page_fingerprint, page_duplicate = cached_ocr(image, thread_id, state.get("employee_id"), steps=steps)
+            fingerprints.append(page_fingerprint)
+            if page_duplicate:
+                duplicates.append(page_duplicate)
+            return page_text
+
+        first = read_first_claim(iter_pages(get_blob_store(), blob), ocr_page)
+        claim = first.claim
+        text = claim.text if claim else ""
+        fingerprint = fingerprints[0] if fingerprints else None
+        duplicate = duplicates[0] if duplicates else None
+        update = {"receipt_blob": {**blob, "pages": claim.pages}} if claim else {}
+        if first.more_claims or first.unread_pages:
+            update.update(
+                skipped_claims=first.more_claims,
+                unread_pages=first.unread_pages,
+                messages=[_skipped_message(first.more_claims, first.unread_pages)],
+            )
+    else:
+        text, fingerprint, duplicate = cached_ocr(state["receipt_image"], thread_id, state.get("employee_id"))
+        update = {"receipt_image": None}
+    if duplicate:
+        logger.info("Duplicate receipt detected (%s match, first seen %s)", duplicate["match"], duplicate["first_seen"])
+    return text, {
+        **update,
+        "ocr_text": text,
+        "ocr_complete": True,
+        "receipt_hash": fingerprint.sha256 if fingerprint else None,
+        "duplicate_receipt": duplicate,
+    }
+
+def _skipped_message(claims: int, pages: int) -> AIMessage:
+    skipped = []
+    if claims:
+        skipped.append(f"{claims} more receipt{'s' if claims > 1 else ''}")
+    if pages:
+        skipped.append(f"{pages} unread page{'s' if pages > 1 else ''}")
+    return AIMessage(
+        content=f"Only the first receipt in this document is claimed here (skipped: {' and '.join(skipped)}). "
+        "Upload the other receipts separately, or submit the whole document with `python -m src.batch`."
+    )
+
+def _extraction_message(fields: Dict[str, Any]) -> AIMessage:
+    return AIMessage(content=f"Extracted from receipt: Amount {fields.get('amount')} {fields.get('currency')}, Date {fields.get('expense_date')}, Merchant {fields.get('merchant')}")
+
+def _build_extraction_prompt(text: str) -> str:
+    """Prompt asking the LLM for the structured receipt fields"""
+    return f"""
         Extract from the receipt text:
         - Amount (float)
         - Currency (str, default "USD")
@@ -69,17 +122,113 @@ def receipt_processor_agent_node(state: ExpenseState) -> Command:
 
         Respond in JSON format with these exact keys.
         """
-        print("Sending prompt to LLM...")
-        response = llm.invoke([HumanMessage(content=prompt)])
-        print(f"LLM response received: {len(response.content)} characters")
-        
-        info = extract_json_from_llm_response(response.content)
-        print(f"Extracted info: {info}")
-        
-        state.update(info)
-        state["messages"].append(AIMessage(content=f"Extracted from receipt: Amount {state['amount']} {state['currency']}, Date {state['expense_date']}, Merchant {state['merchant']}"))
-        
-        print("=== RECEIPT PROCESSOR COMPLETE ===")
-        print(f"Next agent: supervisor")
-
-    return Command(goto="supervisor", update=state)
\ No newline at end of file
+
+def _extraction_update(info: Dict[str, Any]) -> Dict[str, Any]:
+    """State update from the LLM extraction result"""
+    logger.debug("Extracted info: %s", info)
+
+    return {**info, "extraction_path": "llm", "messages": [_extraction_message(info)]}
+
+def _build_fused_prompt(text: str) -> str:
+    """Single prompt covering field extraction, location and classification"""
+    return f"""
+        From the receipt text, extract:
+        - amount (float)
+        - currency (str, default "USD")
+        - expense_date (YYYY-MM-DD)
+        - merchant (str)
+        - pickup_location (str)
+        - dropoff_location (str)
+        - country (str): country where the trip took place
+        - city (str): city where the trip took place
+        - department (str): inferred department
+        - purpose (str): inferred business purpose
+        - confidence (0-100): confidence in department and purpose
+        - questions (list of str): clarification questions if confidence < {CLASSIFICATION_CONFIDENCE_THRESHOLD}
+
+        Text: {text}
+
+        Respond in JSON format with these exact keys.
+        """
+
+def _fused_update(info: Dict[str, Any], employee_id: Optional[str] = None) -> Dict[str, Any]:
+    """State update from a fused response, completing every stage it answered
+
+    Stages whose keys are missing from the response are left incomplete so the
+    supervisor still routes to the dedicated agent for them. ``employee_id``
+    adds the employee's past classifications to a clarification's options.
+    """
+    logger.debug("Extracted info (fused): %s", info)
+
+    fields = {key: info[key] for key in FIELD_KEYS if key in info}
+    update = {**fields, "extraction_path": "fused", "messages": [_extraction_message(fields)]}
+
+    stages = []
+    if info.get("country"):
+        stages.append(location_result(info["country"], info.get("city")))
+    if all(info.get(key) is not None for key in ("department", "purpose", "confidence")):
+        stages.append(classification_result(info, path="fused", employee_id=employee_id))
+    for stage in stages:
+        update["messages"] += stage.pop("messages")
+        update.update(stage)
+    return update
+
+def _template_update(text: str) -> Optional[Dict[str, Any]]:
+    """State update from a template parser; None means the LLM is needed"""
+    if not TEMPLATE_PARSERS_ENABLED:
+        return None
+    result = parse_receipt_text(text)
+    if result is None or not result.complete or result.confidence < TEMPLATE_PARSER_MIN_CONFIDENCE:
+        if result is not None:
+            logger.debug("Template parser %r incomplete (missing: %s, confidence: %s)", result.parser, result.missing_fields, result.confidence)
+        return None
+
+    return {
+        **result.fields,
+        "extraction_path": f"template:{result.parser}",
+        "extraction_confidence": result.confidence,
+        "messages": [_extraction_message(result.fields)],
+    }
+
+def _extraction_request(text: str, state: ExpenseState):
+    """Prompt, response schema and response handler for the configured extraction mode"""
+    if EXTRACTION_MODE == "fused":
+        return _build_fused_prompt(text), FUSED_SCHEMA, lambda info: _fused_update(info, state.get("employee_id"))
+    return _build_extraction_prompt(text), EXTRACTION_SCHEMA, _extraction_update
+
+def receipt_processor_agent_node(state: ExpenseState, config: RunnableConfig = None) -> Command:
+    """Extract structured data from receipt"""
+    if state.get("ocr_text"):
+        # Text was OCR'd upstream, e.g. by the batch engine, which also sets receipt_hash and duplicate_receipt
+        text, update = state["ocr_text"], {"ocr_complete": True}
+    elif state.get("receipt_blob") or state.get("receipt_image"):
+        text, update = _ocr_receipt(state, config)
+    else:
+        return Command(goto="supervisor")
+
+    extracted = _template_update(text)
+    if extracted is None:
+        # Use LLM to extract fields
+        prompt, schema, response_update = _extraction_request(text, state)
+        extracted = response_update(get_llm().invoke_json([HumanMessage(content=prompt)], schema))
+
+    messages = update.get("messages", []) + extracted.get("messages", [])
+    return Command(goto="supervisor", update={**update, **extracted, "messages": messages})
+
+async def areceipt_processor_agent_node(state: ExpenseState, config: RunnableConfig = None) -> Command:
+    """Async variant of receipt_processor_agent_node; OCR runs in a worker thread"""
+    if state.get("ocr_text"):
+        text, update = state["ocr_text"], {"ocr_complete": True}
+    elif state.get("receipt_blob") or state.get("receipt_image"):
+        # Tesseract is CPU-bound and blocking, keep it off the event loop
+        text, update = await asyncio.to_thread(_ocr_receipt, state, config)
+    else:
+        return Command(goto="supervisor")
+
+    extracted = _template_update(text)
+    if extracted is None:
+        prompt, schema, response_update = _extraction_request(text, state)
+        extracted = response_update(await get_llm().ainvoke_json([HumanMessage(content=prompt)], schema))
+
+    messages = update.get("messages", []) + extracted.get("messages", [])
+    return Command(goto="supervisor", update={**update, **extracted, "messages": messages})
@@ -1,47 +1,79 @@
 """Supervisor agent for orchestrating the expense reimbursement workflow"""
 
+import logging
+from typing import List, Tuple, Union
+
 from langgraph.types import Command
 from ..types.state import ExpenseState
+from ..config.settings import PARALLEL_ANALYSIS
+from ..utils.telemetry import get_telemetry
 
-def supervisor_agent(state: ExpenseState) -> Command:
-    """Central supervisor that routes to specialist agents"""
-    
-    print("=== SUPERVISOR DECISION MAKING ===")
-    print(f"OCR Complete: {state.get('ocr_complete', False)}")
-    print(f"Country Identified: {state.get('country_identified', False)}")
-    print(f"Department Confirmed: {state.get('department_confirmed', False)}")
-    print(f"Needs Clarification: {state.get('needs_clarification', False)}")
-    print(f"Rules Applied: {state.get('rules_applied', False)}")
-    print(f"Policy Violation: {state.get('policy_violation', False)}")
-    print(f"Approval Determined: {state.get('approval_determined', False)}")
-
-    # Determine next agent based on workflow state
+logger = logging.getLogger(__name__)
+
+# Every stage the supervisor can route to
+STAGES = [
+    "receipt_processor",
+    "location_analyst",
+    "hitl",
+    "classification",
+    "policy_engine",
+    "exception_handler",
+    "approval_router",
+    "finalize",
+]
+
+# Stages that only read the receipt processor's fields, so they can run as parallel branches
+ANALYSIS_STAGES = ["location_analyst", "classification"]
+
+def next_stage(state: ExpenseState) -> Tuple[str, str]:
+    """Next stage the claim needs, and why, from the workflow flags"""
     if not state.get("ocr_complete", False):
-        next_agent = "receipt_processor"
-        print("Routing to: RECEIPT_PROCESSOR (OCR needed)")
-    elif not state.get("country_identified", False):
-        next_agent = "location_analyst"
-        print("Routing to: LOCATION_ANALYST (country identification)")
-    elif not state.get("department_confirmed", False):
-        next_agent = "classification"
-        print("Routing to: CLASSIFICATION (department/purpose analysis)")
-    elif state.get("needs_clarification", False):
-        next_agent = "hitl"
-        print("Routing to: HITL (human clarification needed)")
-    elif not state.get("rules_applied", False):
-        next_agent = "policy_engine"
-        print("Routing to: POLICY_ENGINE (apply business rules)")
-    elif state.get("policy_violation", False):
-        next_agent = "exception_handler"
-        print("Routing to: EXCEPTION_HANDLER (policy violation)")
-    elif not state.get("approval_determined", False):
-        next_agent = "approval_router"
-        print("Routing to: APPROVAL_ROUTER (determine approval)")
-    else:
-        next_agent = "finalize"
-        print("Routing to: FINALIZE (complete workflow)")
-
-    state['current_agent'] = next_agent
-    print(f"Current agent set to: {next_agent}")
-    print("=== SUPERVISOR COMPLETE ===\n")
-    return Command(goto=next_agent, update=state)
\ No newline at end of file
+        return "receipt_processor", "OCR needed"
+    if not state.get("country_identified", False):
+        return "location_analyst", "country identification"
+    if state.get("needs_clarification", False):
+        return "hitl", "human clarification needed"
+    if not state.get("department_confirmed", False):
+        return "classification", "department/purpose analysis"
+    if not state.get("rules_applied", False):
+        return "policy_engine", "apply business rules"
+    if not state.get("exceptions_checked", False):
+        return "exception_handler", "exception checks"
+    if not state.get("approval_determined", False):
+        return "approval_router", "determine approval"
+    return "finalize", "complete workflow"
+
+def next_stages(state: ExpenseState, parallel: bool = PARALLEL_ANALYSIS) -> Tuple[List[str], str]:
+    """Stages to run next, and why; both analysis stages at once when neither has run"""
+    next_agent, reason = next_stage(state)
+    if (parallel and next_agent == "location_analyst"
+            and not state.get("department_confirmed", False) and not state.get("needs_clarification", False)):
+        return list(ANALYSIS_STAGES), "parallel country identification and department/purpose analysis"
+    return [next_agent], reason
+
+def _record_route(state: ExpenseState, next_agent: str, reason: str) -> None:
+    if logger.isEnabledFor(logging.DEBUG):
+        flags = ("ocr_complete", "country_identified", "department_confirmed", "needs_clarification",
+                 "rules_applied", "exceptions_checked", "policy_violation", "approval_determined")
+        logger.debug("Routing to %s (%s); %s", next_agent, reason, {flag: state.get(flag, False) for flag in flags})
+    get_telemetry().record_hop(next_agent)
+
+def supervisor_agent(state: ExpenseState, parallel: bool = PARALLEL_ANALYSIS) -> Command:
+    """Central supervisor that routes to specialist agents"""
+    next_agents, reason = next_stages(state, parallel)
+    for next_agent in next_agents:
+        _record_route(state, next_agent, reason)
+
+    goto = next_agents if len(next_agents) > 1 else next_agents[0]
+    return Command(goto=goto, update={"current_agent": "+".join(next_agents)})
+
+def route_to_next_stage(state: ExpenseState, parallel: bool = PARALLEL_ANALYSIS) -> Union[str, List[str]]:
+    """Supervisor routing as a conditional edge, used by the direct routing mode"""
+    next_agents, reason = next_stages(state, parallel)
+    for next_agent in next_agents:
+        _record_route(state, next_agent, reason)
+    return next_agents if len(next_agents) > 1 else next_agents[0]
+
+def analysis_join(state: ExpenseState) -> dict:
+    """Join point of the parallel analysis branches in direct routing; its out-edges pick the next stage"""
+    return {}
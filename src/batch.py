@@ -0,0 +1,322 @@
+"""Bulk receipt ingestion engine
+
+OCR is CPU-bound, so it runs across cores in a process pool. Each worker first
+copies its receipt into the blob store, then OCRs it page by page through the
+OCR cache, which fingerprints each page and spots receipts already submitted:
+PDFs and tall screenshots are streamed through ``document_ingest`` and may
+hold several claims (a monthly ride statement, say). The LLM stages are network-bound, so
+each claim is handed to a thread pool that drives the workflow with the text
+and the blob reference. Results are appended to a JSONL file as claims finish.
+
+Usage:
+    python -m src.batch tests/sample_data/receipts --output results.jsonl
+    python -m src.batch statements/ --output results.jsonl  # PDFs, one record per claim
+    python -m src.batch manifest.jsonl --output results.jsonl --ocr-workers 8
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config.settings import BATCH_LLM_WORKERS, BATCH_OCR_WORKERS, BLOB_STORE_PATH, DEFAULT_EMPLOYEE_ID
+from .types.state import create_initial_state
+from .utils.blob_store import BlobStore
+from .utils.document_ingest import DocumentClaim, Page, iter_document_claims, iter_pages
+from .utils.telemetry import configure_logging, get_telemetry
+
+RECEIPT_EXTENSIONS = (".png", ".jpg", ".jpeg", ".pdf")
+
+# State fields copied into each JSONL result record
+RESULT_FIELDS = [
+    "amount", "currency", "expense_date", "merchant", "pickup_location",
+    "dropoff_location", "country", "city", "department", "purpose",
+    "classification_confidence", "approval_status", "requires_manager_approval",
+    "violations", "cap_breaches", "extraction_path",
+]
+
+@dataclass
+class ReceiptJob:
+    """One receipt to ingest"""
+    path: str
+    employee_id: str = DEFAULT_EMPLOYEE_ID
+    thread_id: Optional[str] = None
+
+@dataclass
+class StageStats:
+    """Accumulated wall time for one pipeline stage"""
+    durations: List[float] = field(default_factory=list)
+
+    def add(self, seconds: float) -> None:
+        self.durations.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        if not self.durations:
+            return {"count": 0}
+        ordered = sorted(self.durations)
+        return {
+            "count": len(ordered),
+            "total_s": round(sum(ordered), 3),
+            "mean_s": round(sum(ordered) / len(ordered), 3),
+            "p50_s": round(ordered[len(ordered) // 2], 3),
+            "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max_s": round(ordered[-1], 3),
+        }
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch run"""
+    total: int = 0
+    completed: int = 0
+    needs_clarification: int = 0
+    errors: int = 0
+    wall_time_s: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """Receipts per second over the whole run"""
+        return self.total / self.wall_time_s if self.wall_time_s else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "needs_clarification": self.needs_clarification,
+            "errors": self.errors,
+            "wall_time_s": round(self.wall_time_s, 3),
+            "receipts_per_s": round(self.throughput, 3),
+            "stages": {name: stats.summary() for name, stats in self.stages.items()},
+        }
+
+def collect_jobs(source: str) -> List[ReceiptJob]:
+    """Expand a directory or manifest into receipt jobs
+
+    A directory contributes every png/jpg/jpeg/pdf inside it (sorted). A ``.jsonl``
+    manifest has one ``{"path": ..., "employee_id": ..., "thread_id": ...}``
+    object per line; any other manifest is one image path per line. Relative
+    manifest paths are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        return [
+            ReceiptJob(path=os.path.join(source, name))
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(RECEIPT_EXTENSIONS)
+        ]
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    jobs = []
+    with open(source, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if source.endswith(".jsonl"):
+                entry = json.loads(line)
+                job = ReceiptJob(
+                    path=entry["path"],
+                    employee_id=entry.get("employee_id", DEFAULT_EMPLOYEE_ID),
+                    thread_id=entry.get("thread_id"),
+                )
+            else:
+                job = ReceiptJob(path=line)
+            job.path = os.path.join(base_dir, job.path)
+            jobs.append(job)
+    return jobs
+
+def store_and_ocr(
+    path: str,
+    blob_root: str = BLOB_STORE_PATH,
+    thread_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+) -> Tuple[Dict[str, Any], List[DocumentClaim], List[Dict[str, Any]], float]:
+    """Copy a receipt file into the blob store and OCR it page by page through the OCR cache
+
+    Returns ``(blob, claims, receipts, seconds)``; ``receipts[i]`` holds the
+    ``receipt_hash`` and ``duplicate_receipt`` of ``claims[i]``, taken from
+    its pages as the receipt processor does for a single upload. Top-level so
+    it can run in a process pool; each worker opens its own cache connection.
+    """
+    from .utils.ocr_cache import cached_ocr
+
+    store = BlobStore(blob_root)
+    blob = store.put_file(path)
+    start = time.perf_counter()
+    page_receipts: Dict[int, Dict[str, Any]] = {}
+    current: List[int] = []
+
+    def numbered(pages: Iterator[Page]) -> Iterator[Page]:
+        # Remembers which page is being OCR'd; closing this closes the page reader
+        with closing(pages):
+            for page in pages:
+                current[:] = [page.number]
+                yield page
+
+    def ocr_page(image, steps=None) -> str:
+        text, fingerprint, duplicate = cached_ocr(image, thread_id, employee_id, steps=steps)
+        page_receipts[current[0]] = {"receipt_hash": fingerprint.sha256, "duplicate_receipt": duplicate}
+        return text
+
+    claims = list(iter_document_claims(numbered(iter_pages(store, blob)), ocr_page))
+    receipts = []
+    for claim in claims:
+        found = [page_receipts[number] for number in claim.pages if number in page_receipts]
+        receipts.append({
+            "receipt_hash": found[0]["receipt_hash"] if found else None,
+            "duplicate_receipt": next((page["duplicate_receipt"] for page in found if page["duplicate_receipt"]), None),
+        })
+    return blob, claims, receipts, time.perf_counter() - start
+
+def _run_workflow(app, job: ReceiptJob, thread_id: str, blob: Dict[str, Any], claim: DocumentClaim,
+                  receipt: Dict[str, Any]) -> Dict[str, Any]:
+    """Drive one OCR'd claim through the workflow, timing each node"""
+    config = {"configurable": {"thread_id": thread_id}}
+    initial_state = create_initial_state(
+        receipt_blob={**blob, "pages": claim.pages}, ocr_text=claim.text, employee_id=job.employee_id, **receipt
+    )
+
+    node_timings: Dict[str, float] = {}
+    start = last = time.perf_counter()
+    for update in app.stream(initial_state, config, stream_mode="updates"):
+        now = time.perf_counter()
+        for node in update:
+            node_timings[node] = node_timings.get(node, 0.0) + (now - last)
+        last = now
+    snapshot = app.get_state(config)
+    return {
+        "values": snapshot.values,
+        "interrupted": bool(snapshot.next),
+        "workflow_s": time.perf_counter() - start,
+        "node_timings": node_timings,
+    }
+
+def run_batch(
+    jobs: List[ReceiptJob],
+    output_path: str,
+    ocr_workers: Optional[int] = BATCH_OCR_WORKERS,
+    llm_workers: int = BATCH_LLM_WORKERS,
+    app=None,
+) -> BatchReport:
+    """Ingest receipts through the OCR process pool and the workflow thread pool
+
+    Each finished claim is appended to ``output_path`` as one JSON line, in
+    completion order; a document holding several claims runs each on its own
+    thread (``<thread_id>_<n>``). Receipts whose OCR fails are recorded as
+    errors and never reach the LLM stages.
+    """
+    if app is None:
+        from .workflow import get_expense_agent_system
+        app = get_expense_agent_system()
+
+    for index, job in enumerate(jobs):
+        if job.thread_id is None:
+            stem = os.path.splitext(os.path.basename(job.path))[0]
+            job.thread_id = f"batch_{index}_{stem}"
+
+    report = BatchReport(total=len(jobs))
+    report.stages = {"ocr": StageStats(), "workflow": StageStats()}
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    with open(output_path, "w") as out, \
+            ProcessPoolExecutor(max_workers=ocr_workers) as ocr_pool, \
+            ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+
+        def write_record(record: Dict[str, Any]) -> None:
+            with lock:
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                if record["status"] == "error":
+                    report.errors += 1
+                elif record["status"] == "needs_clarification":
+                    report.needs_clarification += 1
+                else:
+                    report.completed += 1
+
+        def on_workflow_done(job: ReceiptJob, thread_id: str, blob: Dict[str, Any], claim: DocumentClaim,
+                             ocr_s: float, future) -> None:
+            record = {"path": job.path, "thread_id": thread_id, "employee_id": job.employee_id,
+                      "blob_key": blob["key"], "pages": claim.pages}
+            try:
+                result = future.result()
+            except Exception as e:
+                record.update(status="error", stage="workflow", error=str(e))
+            else:
+                with lock:
+                    report.stages["workflow"].add(result["workflow_s"])
+                    for node, seconds in result["node_timings"].items():
+                        report.stages.setdefault(node, StageStats()).add(seconds)
+                values = result["values"]
+                record.update({name: values.get(name) for name in RESULT_FIELDS})
+                record["status"] = "needs_clarification" if result["interrupted"] else "completed"
+                record["timings"] = {"ocr_s": round(ocr_s, 3), "workflow_s": round(result["workflow_s"], 3)}
+            write_record(record)
+
+        blob_root = BlobStore().root
+        ocr_futures = {
+            ocr_pool.submit(store_and_ocr, job.path, blob_root, job.thread_id, job.employee_id): job for job in jobs
+        }
+        # The OCR workers have started; build the past-claim index while they run
+        from .utils.claim_classifier import warm_claim_classifier
+        warm_claim_classifier()
+        workflow_futures = []
+        for ocr_future in as_completed(ocr_futures):
+            job = ocr_futures[ocr_future]
+            try:
+                blob, claims, receipts, ocr_s = ocr_future.result()
+                if not claims:
+                    raise ValueError("No receipt text found")
+            except Exception as e:
+                write_record({"path": job.path, "thread_id": job.thread_id, "employee_id": job.employee_id,
+                              "status": "error", "stage": "ocr", "error": str(e)})
+                continue
+            with lock:
+                report.stages["ocr"].add(ocr_s)
+                report.total += len(claims) - 1
+            get_telemetry().record_ocr(ocr_s, "batch", thread_id=job.thread_id)
+            # Hand off to the LLM pool while the remaining OCR keeps the cores busy
+            for number, (claim, receipt) in enumerate(zip(claims, receipts), 1):
+                thread_id = job.thread_id if len(claims) == 1 else f"{job.thread_id}_{number}"
+                workflow_future = llm_pool.submit(_run_workflow, app, job, thread_id, blob, claim, receipt)
+                workflow_future.add_done_callback(
+                    lambda f, job=job, thread_id=thread_id, blob=blob, claim=claim, ocr_s=ocr_s:
+                        on_workflow_done(job, thread_id, blob, claim, ocr_s, f)
+                )
+                workflow_futures.append(workflow_future)
+
+        wait(workflow_futures)
+
+    report.wall_time_s = time.perf_counter() - start
+    get_telemetry().write_metrics()
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Bulk-ingest receipt images and PDFs through the expense workflow")
+    parser.add_argument("source", help="Directory of receipt images/PDFs, or a manifest (.jsonl or one path per line)")
+    parser.add_argument("--output", "-o", default="batch_results.jsonl", help="JSONL file for per-receipt results")
+    parser.add_argument("--ocr-workers", type=int, default=BATCH_OCR_WORKERS, help="OCR worker processes (default: CPU count)")
+    parser.add_argument("--llm-workers", type=int, default=BATCH_LLM_WORKERS, help="Threads for the LLM workflow stages")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    jobs = collect_jobs(args.source)
+    print(f"=== BATCH INGESTION: {len(jobs)} receipts ===")
+    report = run_batch(jobs, args.output, ocr_workers=args.ocr_workers, llm_workers=args.llm_workers)
+
+    summary = report.to_dict()
+    print(f"Completed: {summary['completed']}  Needs clarification: {summary['needs_clarification']}  Errors: {summary['errors']}")
+    print(f"Wall time: {summary['wall_time_s']}s  Throughput: {summary['receipts_per_s']} receipts/s")
+    print("Per-stage timings:")
+    for name, stats in summary["stages"].items():
+        print(f"  {name}: {stats}")
+    print(f"Results written to {args.output}")
+    return 0 if report.errors == 0 else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -7,9 +7,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # API Configuration
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found in .env file")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")  # Checked when the LLM client is first built
 
 # LLM Configuration
 LLM_MODEL = "z-ai/glm-4.5-air:free"
@@ -19,16 +17,137 @@ LLM_DEFAULT_HEADERS = {
     "X-Title": "Expense Reimbursement Agent",
 }
 
+# LLM Client Configuration (shared by every agent)
+LLM_MAX_CONNECTIONS = 20  # HTTP connections in the shared pool
+LLM_MAX_KEEPALIVE_CONNECTIONS = 10  # Idle connections kept open for reuse
+LLM_KEEPALIVE_EXPIRY_SECONDS = 30  # Idle connections are closed after this long
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))  # Token bucket refill rate
+LLM_BURST = 10  # Token bucket capacity
+LLM_REQUEST_TIMEOUT_SECONDS = 30  # Timeout for a single HTTP attempt
+LLM_CONNECT_TIMEOUT_SECONDS = 5  # Timeout for opening a connection
+LLM_CALL_DEADLINE_SECONDS = 90  # Budget per call, covering queueing, attempts and backoff
+LLM_MAX_RETRIES = 4  # Retries on 429, 5xx, timeouts and connection errors
+LLM_BACKOFF_BASE_SECONDS = 0.5  # First backoff ceiling, doubled per attempt (full jitter)
+LLM_BACKOFF_MAX_SECONDS = 20  # Upper bound for a single backoff
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() == "true"  # Ask the provider for a bare JSON object (response_format); dropped for a model whose provider rejects it
+LLM_JSON_MODE_RETRY_SECONDS = 3600  # How long a model that rejected JSON mode gets plain requests before JSON mode is tried again
+LLM_STREAM_JSON = True  # Only used when JSON mode is off and the response cache is disabled: stop reading a reply once its JSON object closes
+LLM_JSON_MAX_ATTEMPTS = 2  # Calls per JSON request; a reply failing its schema is re-asked with the error
+
+# LLM Response Cache Configuration
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"  # Set to "false" to bypass
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600  # Cached responses expire after a week
+LLM_CACHE_MAX_ENTRIES = 50000  # Rows kept in SQLite before LRU eviction
+LLM_CACHE_MEMORY_ENTRIES = 1024  # Entries kept in the in-process LRU tier
+
+# OCR Configuration
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+OCR_PREPROCESS_ENABLED = os.getenv("OCR_PREPROCESS_ENABLED", "true").lower() == "true"  # OpenCV cleanup before Tesseract
+OCR_PREPROCESS_STEPS = ["crop", "downscale", "grayscale", "deskew", "threshold"]  # Applied in this order
+OCR_TARGET_DPI = 300  # Resolution Tesseract is tuned for
+OCR_RECEIPT_WIDTH_INCHES = 3.15  # 80mm receipt paper; used to estimate the DPI of photos
+OCR_MAX_DESKEW_DEGREES = 15  # Larger estimated skews are treated as noise
+OCR_THRESHOLD_BLOCK_SIZE = 31  # Neighbourhood (odd, in pixels) for adaptive thresholding
+OCR_THRESHOLD_OFFSET = 15  # Subtracted from the local mean when thresholding
+
+# Receipt Blob Store Configuration
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", ".cache/blobs")  # Uploaded receipts, one file per sha256
+
+# Document Ingestion Configuration (multi-page PDFs and long receipts)
+INGEST_PDF_DPI = 300  # Resolution scanned PDF pages are rendered at for OCR
+INGEST_TEXT_LAYER_MIN_CHARS = 20  # PDF pages with at least this much embedded text skip OCR
+INGEST_TALL_IMAGE_ASPECT = 3.0  # Images taller than this many widths are OCR'd in tiles
+INGEST_TILE_ASPECT = 1.5  # Tile height, in image widths
+INGEST_TILE_OVERLAP = 0.1  # Fraction of each tile repeated in the next, so no line is cut in half
+INGEST_MAX_PAGES = 100  # Pages (or tiles) read from one document
+
+# OCR Cache / Duplicate Detection Configuration
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"  # Set to "false" to always run Tesseract
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", ".cache/ocr_cache.sqlite")
+OCR_CACHE_MAX_ENTRIES = 20000  # Receipts kept before LRU eviction
+OCR_CACHE_PHASH_DISTANCE = 24  # Max differing bits (of 256) for a near-duplicate candidate
+DUPLICATE_TEXT_SIMILARITY = 0.9  # OCR text similarity that confirms a near duplicate
+
+# Claim History / Anomaly Detection Configuration
+CLAIM_INDEX_ENABLED = os.getenv("CLAIM_INDEX_ENABLED", "true").lower() == "true"  # Set to "false" to skip history checks
+CLAIM_INDEX_PATH = os.getenv("CLAIM_INDEX_PATH", ".cache/claim_index.sqlite")
+NEAR_DUPLICATE_WINDOW_DAYS = 3  # Same-employee claims at most this many days apart are compared
+NEAR_DUPLICATE_AMOUNT_TOLERANCE = 0.05  # Relative amount difference still treated as the same expense
+NEAR_DUPLICATE_MAX_CANDIDATES = 200  # Cap on window rows inspected per claim, nearest days first
+ESCALATING_VIOLATION_SEVERITIES = ("high",)  # Violations that send a claim to a manager; others are only reported
+OUTLIER_MIN_SAMPLES = 20  # Claims a merchant or route needs before outliers are flagged
+OUTLIER_Z_THRESHOLD = 3.0  # Standard deviations above the typical (log) amount
+
+# Past-Claim Classifier Configuration
+CLAIM_CLASSIFIER_ENABLED = os.getenv("CLAIM_CLASSIFIER_ENABLED", "true").lower() == "true"  # Set to "false" to always ask the LLM
+CLAIM_CLASSIFIER_PATH = os.getenv("CLAIM_CLASSIFIER_PATH", ".cache/claim_classifier.sqlite")
+CLAIM_CLASSIFIER_HASH_DIM = 128  # Hashed feature buckets (power of two); 4 bytes each per distinct claim in memory
+CLAIM_CLASSIFIER_K = 10  # Nearest distinct claims consulted
+CLAIM_CLASSIFIER_MIN_SIMILARITY = 0.85  # Cosine similarity for a neighbour to count (in practice: same employee and route)
+CLAIM_CLASSIFIER_MIN_AGREEMENT = 0.95  # Share of neighbour claims that must agree on department and purpose
+CLAIM_CLASSIFIER_MIN_SUPPORT = 3  # Agreeing past claims needed before the LLM is skipped
+CLAIM_CLASSIFIER_RETRY_SECONDS = 300  # After a failed index build, claims go to the LLM this long before it is retried
+CLAIM_CLASSIFIER_MAX_PENDING = 10000  # Labels queued while the index builds; beyond this (or if the build fails) they are not learned
+
+# Gazetteer Configuration
+GAZETTEER_ENABLED = True  # Resolve countries offline before asking the LLM
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "gazetteer.json")
+GAZETTEER_LEARNED_PATH = os.getenv("GAZETTEER_LEARNED_PATH", ".cache/gazetteer_learned.jsonl")  # Memoized LLM answers
+
+# HITL Answer Matching Configuration
+HITL_LOCAL_MATCH_ENABLED = os.getenv("HITL_LOCAL_MATCH_ENABLED", "true").lower() == "true"  # Set to "false" to always read answers with the LLM
+HITL_VOCABULARY_PATH = os.path.join(os.path.dirname(__file__), "hitl_vocabulary.json")  # Known departments and purposes, with aliases
+HITL_MAX_OPTIONS = 3  # Numbered department/purpose choices offered with a clarification question
+HITL_MATCH_MIN_SCORE = 0.85  # Fuzzy similarity for a term to match (tolerates typos such as "Saels")
+HITL_MATCH_MARGIN = 0.1  # Another term of the same field scoring within this margin makes the answer ambiguous
+HITL_MATCH_MIN_COVERAGE = 0.6  # Share of the answer's content words the matched terms must account for
+HITL_MATCH_MAX_TOKENS = 12  # Longer answers always go to the LLM
+
 # Business Rules Configuration
-RULE_CHANGE_DATE = "2024-01-01"  # Date when approval rules changed
-OLD_RULE_THRESHOLD = 50  # Amount threshold before rule change
-NEW_RULE_THRESHOLD = 75  # Amount threshold after rule change
+POLICY_RULES_PATH = os.path.join(os.path.dirname(__file__), "policy_rules.json")  # Effective-dated thresholds
+DEFAULT_EXPENSE_CATEGORY = "ground_transport"  # Category used when a claim does not set one
+
+# Spend Caps Configuration
+SPEND_LEDGER_ENABLED = os.getenv("SPEND_LEDGER_ENABLED", "true").lower() == "true"  # Set to "false" to skip cap checks
+SPEND_LEDGER_PATH = os.getenv("SPEND_LEDGER_PATH", ".cache/spend_ledger.sqlite")
+EMPLOYEE_SPEND_CAPS_USD = {"daily": 250.0, "weekly": 750.0, "monthly": 2000.0}  # Per employee; omit a period to leave it uncapped
+DEPARTMENT_SPEND_CAPS_USD = {}  # Per department, e.g. {"monthly": 50000.0}
 
 # Agent Configuration
 CLASSIFICATION_CONFIDENCE_THRESHOLD = 90  # Minimum confidence for auto-classification
+# "sequential": separate LLM calls for extraction, location and classification
+# "fused": one LLM call returns fields, country/city and department/purpose
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "sequential")
+TEMPLATE_PARSERS_ENABLED = True  # Try the Uber/Lyft/taxi template parsers before the LLM
+TEMPLATE_PARSER_MIN_CONFIDENCE = 0.8  # Minimum parser confidence to skip LLM extraction
 
 # Workflow Configuration
 DEFAULT_EMPLOYEE_ID = "user_123"
+MAX_CONCURRENT_CLAIMS = 16  # Claims processed at once by the async runner
+# "supervisor": every specialist hands back to the supervisor node, which picks the next stage
+# "direct": the supervisor's routing runs as conditional edges, so specialists go straight to the next stage
+ROUTING_MODE = os.getenv("ROUTING_MODE", "supervisor")
+PARALLEL_ANALYSIS = os.getenv("PARALLEL_ANALYSIS", "true").lower() == "true"  # Run location analysis and classification as concurrent branches
+
+# Checkpointer Configuration
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")  # "sqlite" (persistent) or "memory"
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", ".cache/checkpoints.sqlite")
+CHECKPOINT_TTL_SECONDS = 3 * 24 * 3600  # Finished claims are evicted after three idle days
+CHECKPOINT_MAINTENANCE_INTERVAL = 500  # Checkpoint writes between automatic compaction/eviction runs
+
+# Telemetry Configuration
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"  # Metrics and per-claim traces
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")  # DEBUG shows every routing decision and OCR preview
+METRICS_PATH = os.getenv("METRICS_PATH", ".cache/metrics.prom")  # Prometheus text file, refreshed as claims finish
+METRICS_FLUSH_INTERVAL_SECONDS = 15  # Minimum time between metrics file rewrites
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve /metrics on this port when non-zero
+TRACE_PATH = os.getenv("TRACE_PATH", ".cache/traces.jsonl")  # One JSON record per finished claim
+TRACE_MAX_OPEN = 10000  # In-progress claim traces held in memory
+
+# Batch Ingestion Configuration
+BATCH_OCR_WORKERS = None  # Worker processes for OCR (None = one per CPU core)
+BATCH_LLM_WORKERS = 8  # Threads running the network-bound workflow stages
 
 # UI Configuration
 STREAMLIT_TITLE = "Expense Reimbursement Conversational Agent"
\ No newline at end of file
@@ -1,13 +1,22 @@
-from typing import TypedDict, Optional, Literal, List, Dict, Any
-from PIL import Image
+import operator
+from typing import Annotated, TypedDict, Optional, Literal, List, Dict, Any
 
 class ExpenseState(TypedDict):
-    """State schema for the expense reimbursement workflow"""
+    """State schema for the expense reimbursement workflow
+
+    Nodes return only the keys they changed. ``messages`` is append-only: a
+    node returns just its new messages and the reducer adds them to the list.
+    """
 
     # Receipt data
-    receipt_image: Optional[Image.Image]
+    receipt_blob: Optional[Dict]  # Blob store reference: {"key", "size", "content_type", "name"}; OCR adds the "pages" read
+    receipt_image: Optional[Any]  # Legacy in-memory PIL image; prefer receipt_blob, which keeps images out of checkpoints
     ocr_text: Optional[str]
     ocr_complete: bool
+    receipt_hash: Optional[str]  # sha256 of the decoded image pixels
+    duplicate_receipt: Optional[Dict]  # Earlier submission of the same receipt, if any
+    skipped_claims: int  # Further receipts seen in an uploaded document after the claimed one
+    unread_pages: int  # Pages of an uploaded document never read, which may hold more receipts
 
     # Extracted fields
     amount: Optional[float]
@@ -16,6 +25,9 @@ class ExpenseState(TypedDict):
     merchant: Optional[str]
     pickup_location: Optional[str]
     dropoff_location: Optional[str]
+    extraction_path: Optional[str]  # "template:<parser>", "llm" or "fused"
+    extraction_confidence: Optional[float]
+    expense_category: Optional[str]  # Policy category; DEFAULT_EXPENSE_CATEGORY when unset
 
     # Location analysis
     country: Optional[str]
@@ -26,11 +38,14 @@ class ExpenseState(TypedDict):
     department: Optional[str]
     purpose: Optional[str]
     classification_confidence: Optional[float]
+    classification_path: Optional[str]  # "knn" (similar past claims), "llm", "fused", "hitl" or "hitl_partial" (answer named one field)
     department_confirmed: bool
 
     # HITL
     needs_clarification: bool
     clarification_questions: List[str]
+    clarification_options: List[Dict]  # Numbered choices offered with the questions: {"department", "purpose"}
+    hitl_path: Optional[str]  # How the answer was read: "option", "fuzzy" (local) or "llm"
     user_provided_context: Optional[str]
 
     # Policy
@@ -38,13 +53,66 @@ class ExpenseState(TypedDict):
     applied_rule: Optional[Dict]
     requires_manager_approval: Optional[bool]
     approval_status: Optional[Literal["pending", "auto_approved", "requires_manager"]]
+    spend_to_date: Optional[Dict]  # USD already spent this day/week/month, per employee and department
+    cap_breaches: List[Dict]  # Spend caps this claim would exceed
 
     # Exceptions
     policy_violation: bool
     violations: List[Dict]
+    exceptions_checked: bool
 
     # Workflow control
     current_agent: Optional[str]
-    messages: List[Dict]
+    messages: Annotated[List[Any], operator.add]  # Chat messages; updates are appended
     employee_id: Optional[str]
-    approval_determined: bool
\ No newline at end of file
+    approval_determined: bool
+
+def create_initial_state(**overrides: Any) -> ExpenseState:
+    """Build an ExpenseState with every field at its starting value"""
+    state = ExpenseState(
+        receipt_blob=None,
+        receipt_image=None,
+        ocr_text=None,
+        ocr_complete=False,
+        receipt_hash=None,
+        duplicate_receipt=None,
+        skipped_claims=0,
+        unread_pages=0,
+        amount=None,
+        currency=None,
+        expense_date=None,
+        merchant=None,
+        pickup_location=None,
+        dropoff_location=None,
+        extraction_path=None,
+        extraction_confidence=None,
+        expense_category=None,
+        country=None,
+        city=None,
+        country_identified=False,
+        department=None,
+        purpose=None,
+        classification_confidence=None,
+        classification_path=None,
+        department_confirmed=False,
+        needs_clarification=False,
+        clarification_questions=[],
+        clarification_options=[],
+        hitl_path=None,
+        user_provided_context=None,
+        rules_applied=False,
+        applied_rule=None,
+        requires_manager_approval=None,
+        approval_status=None,
+        spend_to_date=None,
+        cap_breaches=[],
+        policy_violation=False,
+        violations=[],
+        exceptions_checked=False,
+        current_agent=None,
+        messages=[],
+        employee_id=None,
+        approval_determined=False
+    )
+    state.update(overrides)
+    return state
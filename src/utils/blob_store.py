@@ -0,0 +1,148 @@
+"""Content-addressed blob store for uploaded receipt images
+
+Receipt images never enter the graph state. Uploads are written once to local
+disk under the sha256 of their bytes, and the state carries a small reference
+(``blob_ref``) with the key and metadata. Every checkpoint therefore stores a
+few hundred bytes instead of a pickled image, and the same upload submitted
+twice is stored once.
+
+Images are decoded only when OCR runs: ``open_image`` memory-maps the file and
+hands PIL a lazy image, so the compressed bytes are never copied onto the heap
+and the decoded pixels live only as long as the ``with`` block.
+
+Layout: ``<BLOB_STORE_PATH>/<key[:2]>/<key>``. Writes go to a temporary file in
+the same directory and are renamed into place, so concurrent writers (threads
+or the batch OCR processes) never expose a partial blob.
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from ..config.settings import BLOB_STORE_PATH
+
+_CHUNK_SIZE = 1 << 20
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+def sniff_content_type(head: bytes) -> str:
+    """MIME type from a file's leading bytes"""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return "application/octet-stream"
+
+def blob_ref(key: str, size: int, content_type: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Reference to a stored blob, as carried in ``ExpenseState.receipt_blob``"""
+    return {"key": key, "size": size, "content_type": content_type, "name": name}
+
+class BlobStore:
+    """Immutable blobs on local disk, addressed by the sha256 of their content"""
+
+    def __init__(self, root: str = BLOB_STORE_PATH):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        """File holding blob ``key``"""
+        if len(key) != 64 or not all(c in "0123456789abcdef" for c in key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def _commit(self, tmp_path: str, key: str) -> None:
+        """Move a fully written temporary file into place, unless the blob already exists"""
+        target = self.path(key)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, target)
+
+    def _temp_file(self, key_prefix: str):
+        directory = os.path.join(self.root, key_prefix)
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=directory, prefix=".tmp-", delete=False)
+
+    def put_bytes(self, data: bytes, content_type: Optional[str] = None, name: Optional[str] = None) -> Dict[str, Any]:
+        """Store ``data``; returns its blob reference"""
+        if not data:
+            raise ValueError("Cannot store an empty blob")
+        key = hashlib.sha256(data).hexdigest()
+        if not self.exists(key):
+            with self._temp_file(key[:2]) as tmp:
+                tmp.write(data)
+            self._commit(tmp.name, key)
+        return blob_ref(key, len(data), content_type or sniff_content_type(data[:16]), name)
+
+    def put_file(self, path: str, content_type: Optional[str] = None, name: Optional[str] = None) -> Dict[str, Any]:
+        """Stream a file into the store in chunks; returns its blob reference"""
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        # The key is only known once the file is read, so stage it at the root
+        with open(path, "rb") as src, self._temp_file("") as tmp:
+            for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                if not head:
+                    head = chunk[:16]
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        if size == 0:
+            os.remove(tmp.name)
+            raise ValueError(f"Cannot store an empty blob: {path}")
+        key = digest.hexdigest()
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        self._commit(tmp.name, key)
+        return blob_ref(key, size, content_type or sniff_content_type(head), name or os.path.basename(path))
+
+    def read_bytes(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    @contextmanager
+    def open_image(self, key: str) -> Iterator[Any]:
+        """Memory-mapped, lazily decoded PIL image for blob ``key``
+
+        Pixels are decoded on first access (e.g. by OCR) and released, along
+        with the mapping, when the block exits.
+        """
+        # PIL is only needed by the nodes that decode images
+        from PIL import Image
+
+        with open(self.path(key), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            image = Image.open(mapped)
+            try:
+                yield image
+            finally:
+                image.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of blobs and bytes on disk"""
+        blobs = size = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.startswith(".tmp-"):
+                    blobs += 1
+                    size += os.path.getsize(os.path.join(directory, name))
+        return {"blobs": blobs, "bytes": size, "root": self.root}
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+def get_blob_store() -> BlobStore:
+    """Process-wide blob store at BLOB_STORE_PATH"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
@@ -0,0 +1,307 @@
+"""Pluggable, bounded checkpointer backends for the workflow
+
+``CHECKPOINT_BACKEND`` picks the saver. ``"sqlite"`` persists checkpoints so
+pending HITL conversations survive restarts, and it keeps storage bounded:
+
+- compaction drops every checkpoint but the latest for finished claims
+- finished threads idle for longer than ``CHECKPOINT_TTL_SECONDS`` are evicted
+- both run automatically every ``CHECKPOINT_MAINTENANCE_INTERVAL`` writes
+
+``"memory"`` keeps the previous in-process ``MemorySaver`` for tests and demos.
+
+Usage:
+    python -m src.utils.checkpointing report
+    python -m src.utils.checkpointing compact
+    python -m src.utils.checkpointing evict
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Sequence
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langchain_core.runnables import RunnableConfig
+
+from ..config.settings import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_DB_PATH,
+    CHECKPOINT_MAINTENANCE_INTERVAL,
+    CHECKPOINT_TTL_SECONDS,
+)
+from .telemetry import get_telemetry
+
+def _max_rss() -> Dict[str, int]:
+    """Peak resident memory of this process, or nothing where ``resource`` is unavailable (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return {}
+    return {"process_max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def checkpoint_is_finished(checkpoint: Checkpoint) -> bool:
+    """True when no node is scheduled to run after this checkpoint
+
+    LangGraph stores pending node triggers as ``branch:to:<node>`` channel
+    values; a claim that reached END (rather than pausing for HITL) has none.
+    """
+    return not any(key.startswith("branch:to:") for key in checkpoint.get("channel_values", {}))
+
+class BoundedSqliteSaver(SqliteSaver):
+    """SqliteSaver with async support, compaction and TTL eviction of finished threads"""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        ttl_seconds: Optional[float] = CHECKPOINT_TTL_SECONDS,
+        maintenance_interval: int = CHECKPOINT_MAINTENANCE_INTERVAL,
+        **kwargs: Any,
+    ):
+        super().__init__(conn, **kwargs)
+        self.ttl_seconds = ttl_seconds
+        self.maintenance_interval = maintenance_interval
+        self._puts_since_maintenance = 0
+
+    @classmethod
+    def from_path(cls, path: str = CHECKPOINT_DB_PATH, **kwargs: Any) -> "BoundedSqliteSaver":
+        """Open (or create) a checkpoint database file"""
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return cls(sqlite3.connect(path, check_same_thread=False), **kwargs)
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0,
+                compacted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS thread_activity_finished ON thread_activity (finished, updated_at);
+            """
+        )
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        telemetry = get_telemetry()
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at, finished, compacted) VALUES (?, ?, ?, 0)",
+                (thread_id, time.time(), int(checkpoint_is_finished(checkpoint))),
+            )
+            if telemetry.enabled:
+                cur.execute(
+                    "SELECT length(checkpoint) + length(metadata) FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, saved["configurable"]["checkpoint_ns"], saved["configurable"]["checkpoint_id"]),
+                )
+                row = cur.fetchone()
+                if row and row[0] is not None:
+                    telemetry.record_checkpoint(thread_id, row[0])
+        self._puts_since_maintenance += 1
+        if self.maintenance_interval and self._puts_since_maintenance >= self.maintenance_interval:
+            self._puts_since_maintenance = 0
+            self.run_maintenance()
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    def compact_finished(self) -> int:
+        """Keep only the latest checkpoint of each finished thread; returns rows removed"""
+        with self.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM checkpoints
+                WHERE thread_id IN (SELECT thread_id FROM thread_activity WHERE finished = 1 AND compacted = 0)
+                  AND checkpoint_id < (
+                      SELECT MAX(latest.checkpoint_id) FROM checkpoints AS latest
+                      WHERE latest.thread_id = checkpoints.thread_id
+                        AND latest.checkpoint_ns = checkpoints.checkpoint_ns
+                  )
+                """
+            )
+            removed = cur.rowcount
+            cur.execute(
+                """
+                DELETE FROM writes
+                WHERE thread_id IN (SELECT thread_id FROM thread_activity WHERE finished = 1 AND compacted = 0)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM checkpoints
+                      WHERE checkpoints.thread_id = writes.thread_id
+                        AND checkpoints.checkpoint_ns = writes.checkpoint_ns
+                        AND checkpoints.checkpoint_id = writes.checkpoint_id
+                  )
+                """
+            )
+            removed += cur.rowcount
+            cur.execute("UPDATE thread_activity SET compacted = 1 WHERE finished = 1")
+        return removed
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Delete finished threads idle for longer than the TTL; returns threads removed"""
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = (now or time.time()) - self.ttl_seconds
+        with self.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS expired_threads (thread_id TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM expired_threads")
+            cur.execute(
+                "INSERT INTO expired_threads SELECT thread_id FROM thread_activity WHERE finished = 1 AND updated_at < ?",
+                (cutoff,),
+            )
+            cur.execute("DELETE FROM checkpoints WHERE thread_id IN (SELECT thread_id FROM expired_threads)")
+            cur.execute("DELETE FROM writes WHERE thread_id IN (SELECT thread_id FROM expired_threads)")
+            cur.execute("DELETE FROM thread_activity WHERE thread_id IN (SELECT thread_id FROM expired_threads)")
+            return cur.rowcount
+
+    def run_maintenance(self) -> Dict[str, int]:
+        """Compact finished threads and evict expired ones"""
+        return {"compacted_rows": self.compact_finished(), "evicted_threads": self.evict_expired()}
+
+    def usage_report(self) -> Dict[str, Any]:
+        """Thread/checkpoint counts, stored bytes and database file size"""
+        with self.cursor(transaction=False) as cur:
+            threads, finished = cur.execute(
+                "SELECT COUNT(*), COALESCE(SUM(finished), 0) FROM thread_activity"
+            ).fetchone()
+            checkpoints, checkpoint_bytes = cur.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints"
+            ).fetchone()
+            writes, write_bytes = cur.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM writes"
+            ).fetchone()
+            (page_count,) = cur.execute("PRAGMA page_count").fetchone()
+            (page_size,) = cur.execute("PRAGMA page_size").fetchone()
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "finished_threads": finished,
+            "pending_threads": threads - finished,
+            "checkpoints": checkpoints,
+            "writes": writes,
+            "checkpoint_bytes": checkpoint_bytes,
+            "write_bytes": write_bytes,
+            "db_file_bytes": page_count * page_size,
+            **_max_rss(),
+        }
+
+    # SqliteSaver is sync-only; run its methods in a worker thread so the
+    # async workflow build can share the same backend.
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+def memory_usage_report(saver: MemorySaver) -> Dict[str, Any]:
+    """Usage report for the in-process MemorySaver backend"""
+    checkpoints = checkpoint_bytes = 0
+    for namespaces in saver.storage.values():
+        for entries in namespaces.values():
+            for checkpoint, metadata, _parent in entries.values():
+                checkpoints += 1
+                checkpoint_bytes += len(checkpoint[1]) + len(metadata[1])
+    write_bytes = sum(
+        len(write[2][1]) for writes in saver.writes.values() for write in writes.values()
+    )
+    return {
+        "backend": "memory",
+        "threads": len(saver.storage),
+        "checkpoints": checkpoints,
+        "writes": sum(len(writes) for writes in saver.writes.values()),
+        "checkpoint_bytes": checkpoint_bytes,
+        "write_bytes": write_bytes,
+        **_max_rss(),
+    }
+
+def checkpoint_usage_report(saver: BaseCheckpointSaver) -> Dict[str, Any]:
+    """Memory/disk usage report for any supported backend"""
+    if isinstance(saver, BoundedSqliteSaver):
+        return saver.usage_report()
+    if isinstance(saver, MemorySaver):
+        return memory_usage_report(saver)
+    return {"backend": type(saver).__name__}
+
+CHECKPOINTER_BACKENDS: Dict[str, Callable[[], BaseCheckpointSaver]] = {
+    "memory": MemorySaver,
+    "sqlite": BoundedSqliteSaver.from_path,
+}
+
+def register_checkpointer_backend(name: str, factory: Callable[[], BaseCheckpointSaver]) -> None:
+    """Make another saver selectable through CHECKPOINT_BACKEND"""
+    CHECKPOINTER_BACKENDS[name] = factory
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND) -> BaseCheckpointSaver:
+    """Build the checkpointer configured in settings"""
+    try:
+        factory = CHECKPOINTER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND '{backend}', expected one of {sorted(CHECKPOINTER_BACKENDS)}")
+    return factory()
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command-line maintenance for the SQLite checkpoint database"""
+    parser = argparse.ArgumentParser(description="Inspect and maintain the workflow checkpoint database")
+    parser.add_argument("command", choices=["report", "compact", "evict"])
+    parser.add_argument("--db", default=CHECKPOINT_DB_PATH, help="Checkpoint database path")
+    args = parser.parse_args(argv)
+
+    saver = BoundedSqliteSaver.from_path(args.db)
+    if args.command == "compact":
+        print(f"Removed {saver.compact_finished()} rows from finished threads")
+    elif args.command == "evict":
+        print(f"Evicted {saver.evict_expired()} expired threads")
+    print(json.dumps(saver.usage_report(), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
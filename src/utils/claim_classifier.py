@@ -0,0 +1,353 @@
+"""Nearest-neighbour department/purpose classifier built from past claims
+
+Department and purpose repeat: the same employee takes the same commute or
+airport run week after week. Finalized claims whose classification came from
+the LLM or from the employee are recorded here, and the classification agent
+asks ``predict`` before calling the LLM.
+
+- Features: hashed word unigrams and bigrams of the merchant, pickup and
+  dropoff, plus the employee id and a weekday bucket, folded into
+  ``CLAIM_CLASSIFIER_HASH_DIM`` signed buckets and L2-normalized. Each field
+  carries a fixed weight, so a long address cannot drown out the employee.
+  Receipts carry no time of day, so the weekday is the only time bucket.
+- Claims with identical features share one row holding per-label counts, so
+  a history of a million mostly repeated claims keeps one vector per
+  distinct (employee, merchant, route, weekday).
+- A query is one NumPy matrix-vector product (cosine similarity) and an
+  ``argpartition`` for the ``CLAIM_CLASSIFIER_K`` nearest rows. Two claims of
+  different employees share at most the other fields' weight, so when
+  ``CLAIM_CLASSIFIER_MIN_SIMILARITY`` is above that bound (as by default)
+  only the employee's own rows are scored; otherwise every row is. A
+  prediction is returned only when the neighbours above
+  ``CLAIM_CLASSIFIER_MIN_SIMILARITY`` agree on one (department, purpose) for
+  ``CLAIM_CLASSIFIER_MIN_AGREEMENT`` of their similarity-weighted claims,
+  backed by at least ``CLAIM_CLASSIFIER_MIN_SUPPORT`` of them.
+
+Claims are stored in SQLite. The in-memory index is rebuilt from a
+``GROUP BY`` and updated incrementally as claims finalize. The rebuild takes
+seconds on a large history, so ``warm_claim_classifier`` runs it on a
+background thread at app and batch start-up; until it finishes, claims are
+classified by the LLM and finalized labels are queued for the index (up to
+``CLAIM_CLASSIFIER_MAX_PENDING``). A failed build is not retried for
+``CLAIM_CLASSIFIER_RETRY_SECONDS``, and the labels queued for it are dropped.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..config.settings import (
+    CLAIM_CLASSIFIER_ENABLED,
+    CLAIM_CLASSIFIER_HASH_DIM,
+    CLAIM_CLASSIFIER_K,
+    CLAIM_CLASSIFIER_MAX_PENDING,
+    CLAIM_CLASSIFIER_MIN_AGREEMENT,
+    CLAIM_CLASSIFIER_MIN_SIMILARITY,
+    CLAIM_CLASSIFIER_MIN_SUPPORT,
+    CLAIM_CLASSIFIER_PATH,
+    CLAIM_CLASSIFIER_RETRY_SECONDS,
+)
+from .gazetteer import normalize_tokens
+from .policy_rules import normalize_expense_date
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each field in the claim vector
+FIELD_WEIGHTS = {"employee": 1.0, "pickup": 1.0, "dropoff": 1.0, "merchant": 0.5, "weekday": 0.5}
+_INITIAL_CAPACITY = 1024
+# Highest similarity two claims of different employees can reach (up to hash collisions)
+CROSS_EMPLOYEE_MAX_SIMILARITY = math.sqrt(1 - FIELD_WEIGHTS["employee"] ** 2 / sum(w * w for w in FIELD_WEIGHTS.values()))
+
+Label = Tuple[str, str]  # (department, purpose)
+
+class ClaimKey(NamedTuple):
+    """Normalized fields a claim is classified by"""
+    employee_id: str
+    merchant: str
+    pickup: str
+    dropoff: str
+    weekday: int  # 0 = Monday, -1 when the date is unknown
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ClaimKey":
+        try:
+            weekday = date.fromisoformat(normalize_expense_date(state.get("expense_date")) or "").weekday()
+        except ValueError:
+            weekday = -1
+        return cls(
+            employee_id=state.get("employee_id") or "",
+            merchant=" ".join(normalize_tokens(state.get("merchant") or "")),
+            pickup=" ".join(normalize_tokens(state.get("pickup_location") or "")),
+            dropoff=" ".join(normalize_tokens(state.get("dropoff_location") or "")),
+            weekday=weekday,
+        )
+
+class Prediction(NamedTuple):
+    """Department and purpose agreed on by a claim's nearest past claims"""
+    department: str
+    purpose: str
+    confidence: float  # Similarity-weighted share of neighbour claims agreeing, 0-100
+    support: int  # Neighbour claims with this label
+    similarity: float  # Cosine similarity of the nearest neighbour
+
+def _field_features(field: str, value: str) -> List[str]:
+    if field == "weekday":
+        weekday = int(value)
+        return [f"day {weekday}", "weekend" if weekday >= 5 else "workday"] if weekday >= 0 else []
+    if field == "employee":
+        return [value] if value else []
+    tokens = value.split()
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+@lru_cache(maxsize=65536)
+def _field_vector(field: str, value: str, dim: int) -> np.ndarray:
+    """Hashed features of one field; employees, addresses and weekdays repeat, so these are memoized"""
+    vector = np.zeros(dim, dtype=np.float32)
+    features = _field_features(field, value)
+    if features:
+        weight = FIELD_WEIGHTS[field] / len(features) ** 0.5
+        for feature in features:
+            # crc32 is stable across processes, unlike hash()
+            digest = zlib.crc32(f"{field}={feature}".encode("utf-8"))
+            vector[digest & (dim - 1)] += weight if digest & 0x80000000 else -weight
+    vector.flags.writeable = False
+    return vector
+
+def claim_vector(key: ClaimKey, dim: int = CLAIM_CLASSIFIER_HASH_DIM) -> np.ndarray:
+    """Unit-length hashed feature vector of a claim; ``dim`` must be a power of two"""
+    vector = (
+        _field_vector("employee", key.employee_id, dim)
+        + _field_vector("merchant", key.merchant, dim)
+        + _field_vector("pickup", key.pickup, dim)
+        + _field_vector("dropoff", key.dropoff, dim)
+        + _field_vector("weekday", str(key.weekday), dim)
+    )
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+class ClaimClassifier:
+    """Cosine kNN over hashed claim vectors, backed by a SQLite log of labelled claims"""
+
+    def __init__(
+        self,
+        path: str = CLAIM_CLASSIFIER_PATH,
+        dim: int = CLAIM_CLASSIFIER_HASH_DIM,
+        k: int = CLAIM_CLASSIFIER_K,
+        min_similarity: float = CLAIM_CLASSIFIER_MIN_SIMILARITY,
+        min_agreement: float = CLAIM_CLASSIFIER_MIN_AGREEMENT,
+        min_support: int = CLAIM_CLASSIFIER_MIN_SUPPORT,
+    ):
+        if dim <= 0 or dim & (dim - 1):
+            raise ValueError(f"Hash dimension must be a power of two, got {dim}")
+        self.path = path
+        self.dim = dim
+        self.k = k
+        self.min_similarity = min_similarity
+        self.min_agreement = min_agreement
+        self.min_support = min_support
+        self._per_employee = min_similarity > CROSS_EMPLOYEE_MAX_SIMILARITY
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS labelled_claims ("
+            "claim_id TEXT PRIMARY KEY, employee_id TEXT NOT NULL, merchant TEXT NOT NULL, pickup TEXT NOT NULL, "
+            "dropoff TEXT NOT NULL, weekday INTEGER NOT NULL, department TEXT NOT NULL, purpose TEXT NOT NULL, "
+            "recorded_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._reset_index()
+        self._load()
+
+    def _reset_index(self) -> None:
+        self._rows: Dict[ClaimKey, int] = {}
+        self._employee_rows: Dict[str, List[int]] = defaultdict(list)
+        self._labels: List[Dict[Label, int]] = []
+        self._vectors = np.zeros((_INITIAL_CAPACITY, self.dim), dtype=np.float32)
+        self._claims = 0
+
+    def _load(self) -> None:
+        """Rebuild the in-memory index from the stored claims, one row per distinct key and label"""
+        cursor = self._conn.execute(
+            "SELECT employee_id, merchant, pickup, dropoff, weekday, department, purpose, COUNT(*) "
+            "FROM labelled_claims GROUP BY employee_id, merchant, pickup, dropoff, weekday, department, purpose"
+        )
+        with self._lock:
+            for employee_id, merchant, pickup, dropoff, weekday, department, purpose, count in cursor:
+                self._add_locked(ClaimKey(employee_id, merchant, pickup, dropoff, weekday), (department, purpose), count)
+
+    def _add_locked(self, key: ClaimKey, label: Label, count: int = 1) -> None:
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._labels)
+            if row == len(self._vectors):
+                grown = np.zeros((2 * len(self._vectors), self.dim), dtype=np.float32)
+                grown[:row] = self._vectors
+                self._vectors = grown
+            self._vectors[row] = claim_vector(key, self.dim)
+            self._rows[key] = row
+            self._employee_rows[key.employee_id].append(row)
+            self._labels.append({})
+        labels = self._labels[row]
+        labels[label] = labels.get(label, 0) + count
+        self._claims += count
+
+    def record_many(self, claims: Iterable[Tuple[str, ClaimKey, str, str]]) -> int:
+        """Add (claim_id, key, department, purpose) tuples in one transaction; returns how many were new"""
+        added = 0
+        now = time.time()
+        with self._lock:
+            for claim_id, key, department, purpose in claims:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO labelled_claims "
+                    "(claim_id, employee_id, merchant, pickup, dropoff, weekday, department, purpose, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (claim_id, *key, department, purpose, now),
+                )
+                if cursor.rowcount == 1:
+                    self._add_locked(key, (department, purpose))
+                    added += 1
+            self._conn.commit()
+        return added
+
+    def record(self, claim_id: str, key: ClaimKey, department: str, purpose: str) -> bool:
+        """Add one labelled claim; False when the claim id is already recorded"""
+        return self.record_many([(claim_id, key, department, purpose)]) == 1
+
+    def predict(self, key: ClaimKey) -> Optional[Prediction]:
+        """Department and purpose of the nearest past claims, or None when they do not agree"""
+        query = claim_vector(key, self.dim)
+        with self._lock:
+            if self._per_employee and key.employee_id:
+                rows = np.array(self._employee_rows.get(key.employee_id, ()), dtype=np.intp)
+                scores = self._vectors[rows] @ query
+            else:
+                rows = None
+                scores = self._vectors[:len(self._labels)] @ query
+            size = len(scores)
+            if size == 0:
+                return None
+            k = min(self.k, size)
+            nearest = np.argpartition(scores, size - k)[size - k:]
+            nearest = nearest[scores[nearest] >= self.min_similarity]
+            if len(nearest) == 0:
+                return None
+
+            weights: Dict[Label, float] = defaultdict(float)
+            support: Dict[Label, int] = defaultdict(int)
+            for index in nearest:
+                similarity = float(scores[index])
+                row = int(rows[index]) if rows is not None else int(index)
+                for label, count in self._labels[row].items():
+                    weights[label] += similarity * count
+                    support[label] += count
+        best = max(weights, key=weights.get)
+        agreement = weights[best] / sum(weights.values())
+        if agreement < self.min_agreement or support[best] < self.min_support:
+            return None
+        return Prediction(best[0], best[1], round(agreement * 100, 1), support[best], round(float(scores[nearest].max()), 3))
+
+    def employee_labels(self, employee_id: str, limit: int = 3) -> List[Label]:
+        """The employee's most frequent (department, purpose) labels"""
+        counts: Dict[Label, int] = defaultdict(int)
+        with self._lock:
+            for row in self._employee_rows.get(employee_id, ()):
+                for label, count in self._labels[row].items():
+                    counts[label] += count
+        return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+    def stats(self) -> Dict[str, int]:
+        """Labelled claims, distinct claim vectors and index memory"""
+        with self._lock:
+            return {"claims": self._claims, "distinct": len(self._labels), "index_bytes": int(self._vectors.nbytes)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM labelled_claims")
+            self._conn.commit()
+            self._reset_index()
+
+_classifier: Optional[ClaimClassifier] = None
+_classifier_lock = threading.Lock()
+_warmup: Optional[threading.Thread] = None
+_pending: List[Tuple[str, ClaimKey, str, str]] = []  # Labels finalized while the index was building
+_failed_at: Optional[float] = None  # Monotonic time of the last failed build
+
+def _build_classifier() -> None:
+    global _classifier, _failed_at
+    start = time.perf_counter()
+    try:
+        classifier = ClaimClassifier()
+    except Exception as e:
+        with _classifier_lock:
+            _failed_at = time.monotonic()
+            dropped = len(_pending)
+            _pending.clear()
+        logger.warning(
+            "Building the past-claim classifier failed, retrying in %ss (%d queued labels dropped): %s",
+            CLAIM_CLASSIFIER_RETRY_SECONDS, dropped, e,
+        )
+        return
+    with _classifier_lock:
+        _classifier = classifier
+        pending = _pending[:]
+        _pending.clear()
+    if pending:
+        classifier.record_many(pending)
+    logger.info("Past-claim classifier ready in %.1fs: %s", time.perf_counter() - start, classifier.stats())
+
+def warm_claim_classifier() -> Optional[threading.Thread]:
+    """Build the process-wide classifier on a background thread
+
+    None when it is disabled, already built, or its last build failed less
+    than ``CLAIM_CLASSIFIER_RETRY_SECONDS`` ago.
+    """
+    global _warmup
+    if not CLAIM_CLASSIFIER_ENABLED:
+        return None
+    with _classifier_lock:
+        if _classifier is not None:
+            return None
+        if _failed_at is not None and time.monotonic() - _failed_at < CLAIM_CLASSIFIER_RETRY_SECONDS:
+            return None
+        if _warmup is None or not _warmup.is_alive():
+            _warmup = threading.Thread(target=_build_classifier, name="claim-classifier-warmup", daemon=True)
+            _warmup.start()
+        return _warmup
+
+def get_claim_classifier(wait: bool = True) -> Optional[ClaimClassifier]:
+    """Process-wide classifier, or None when CLAIM_CLASSIFIER_ENABLED is off or the build failed
+
+    With ``wait=False`` a classifier that is still being built is not waited
+    for: the warm-up is started if needed and None is returned.
+    """
+    thread = warm_claim_classifier()
+    if thread is not None and wait:
+        thread.join()
+    return _classifier
+
+def record_classification(claim_id: str, key: ClaimKey, department: str, purpose: str) -> None:
+    """Add a finalized label, queueing it while the index is still being built"""
+    if not CLAIM_CLASSIFIER_ENABLED:
+        return
+    with _classifier_lock:
+        classifier = _classifier
+        if classifier is None and len(_pending) < CLAIM_CLASSIFIER_MAX_PENDING:
+            _pending.append((claim_id, key, department, purpose))
+    if classifier is not None:
+        classifier.record(claim_id, key, department, purpose)
+    else:
+        warm_claim_classifier()
@@ -0,0 +1,276 @@
+"""Indexed claim history for duplicate and anomaly checks
+
+Every processed claim is recorded in SQLite, and each check is answered from
+an index rather than a scan, so its cost stays O(log n) as history grows:
+
+- exact duplicates: B-tree index on (employee_id, merchant, date, amount, currency)
+- near duplicates: index on (employee_id, day); only the employee's claims
+  inside ``NEAR_DUPLICATE_WINDOW_DAYS`` are read, nearest days first, and
+  compared, amounts only within the same currency. The same route on another
+  day is a repeat trip (a daily commute), not a duplicate
+- amount outliers: per-merchant and per-route running mean/variance of the
+  log USD amount (Welford's algorithm), one row per group, updated in place
+
+A claim is keyed by its thread id, so re-running a thread never matches
+against itself.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from ..config.settings import (
+    CLAIM_INDEX_ENABLED,
+    CLAIM_INDEX_PATH,
+    NEAR_DUPLICATE_AMOUNT_TOLERANCE,
+    NEAR_DUPLICATE_MAX_CANDIDATES,
+    NEAR_DUPLICATE_WINDOW_DAYS,
+    OUTLIER_MIN_SAMPLES,
+    OUTLIER_Z_THRESHOLD,
+)
+from .policy_rules import get_policy_table, normalize_expense_date
+
+_SPACES = re.compile(r"\s+")
+
+def _normalize_text(value: Optional[str]) -> str:
+    return _SPACES.sub(" ", (value or "").strip().casefold())
+
+class ClaimRecord(NamedTuple):
+    """The fields of a claim that the history checks look at"""
+    claim_id: str
+    employee_id: str
+    merchant: str
+    expense_date: Optional[str]  # ISO date
+    amount_cents: Optional[int]
+    currency: str
+    route: Optional[str]  # "pickup -> dropoff", normalized
+    amount_usd: Optional[float]
+
+    @property
+    def day(self) -> Optional[int]:
+        return date.fromisoformat(self.expense_date).toordinal() if self.expense_date else None
+
+    @property
+    def groups(self) -> List[str]:
+        """Amount-distribution groups this claim belongs to"""
+        groups = [f"merchant:{self.merchant}"] if self.merchant else []
+        if self.route:
+            groups.append(f"route:{self.route}")
+        return groups
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], claim_id: Optional[str] = None) -> "ClaimRecord":
+        amount = state.get("amount")
+        currency = (state.get("currency") or "USD").upper()
+        pickup, dropoff = _normalize_text(state.get("pickup_location")), _normalize_text(state.get("dropoff_location"))
+        try:
+            expense_date = normalize_expense_date(state.get("expense_date"))
+            date.fromisoformat(expense_date or "")
+        except ValueError:
+            expense_date = None
+        return cls(
+            claim_id=claim_id or uuid.uuid4().hex,
+            employee_id=state.get("employee_id") or "",
+            merchant=_normalize_text(state.get("merchant")),
+            expense_date=expense_date,
+            amount_cents=round(float(amount) * 100) if amount is not None else None,
+            currency=currency,
+            route=f"{pickup} -> {dropoff}" if pickup and dropoff else None,
+            amount_usd=get_policy_table().convert(float(amount), currency, "USD") if amount is not None else None,
+        )
+
+class OutlierFinding(NamedTuple):
+    """An amount far above its merchant's or route's history"""
+    group: str
+    z_score: float
+    typical_amount_usd: float
+    samples: int
+
+class ClaimIndex:
+    """SQLite claim history with exact/near duplicate lookups and streaming amount statistics"""
+
+    def __init__(
+        self,
+        path: str = CLAIM_INDEX_PATH,
+        window_days: int = NEAR_DUPLICATE_WINDOW_DAYS,
+        amount_tolerance: float = NEAR_DUPLICATE_AMOUNT_TOLERANCE,
+        max_candidates: int = NEAR_DUPLICATE_MAX_CANDIDATES,
+        min_samples: int = OUTLIER_MIN_SAMPLES,
+        z_threshold: float = OUTLIER_Z_THRESHOLD,
+    ):
+        self.path = path
+        self.window_days = window_days
+        self.amount_tolerance = amount_tolerance
+        self.max_candidates = max_candidates
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS claims ("
+            "claim_id TEXT PRIMARY KEY, employee_id TEXT NOT NULL, merchant TEXT NOT NULL, expense_date TEXT, "
+            "day INTEGER, amount_cents INTEGER, currency TEXT NOT NULL, route TEXT, recorded_at REAL NOT NULL)"
+        )
+        # Superseded by claims_exact_currency: 45.00 EUR and 45.00 USD are different claims
+        self._conn.execute("DROP INDEX IF EXISTS claims_exact")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS claims_exact_currency "
+            "ON claims (employee_id, merchant, expense_date, amount_cents, currency)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS claims_window ON claims (employee_id, day)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS amount_stats ("
+            "group_key TEXT PRIMARY KEY, count INTEGER NOT NULL, mean REAL NOT NULL, m2 REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def find_exact(self, record: ClaimRecord) -> Optional[Dict[str, Any]]:
+        """Earlier claim by the same employee with the same merchant, date, amount and currency"""
+        if record.expense_date is None or record.amount_cents is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT claim_id, expense_date, amount_cents, currency, recorded_at FROM claims "
+                "WHERE employee_id = ? AND merchant = ? AND expense_date = ? AND amount_cents = ? AND currency = ? "
+                "AND claim_id != ? LIMIT 1",
+                (record.employee_id, record.merchant, record.expense_date, record.amount_cents, record.currency,
+                 record.claim_id),
+            ).fetchone()
+        return self._match(row) if row else None
+
+    def find_near(self, record: ClaimRecord) -> List[Dict[str, Any]]:
+        """Same-employee claims for the same merchant and route with a similar amount in the same currency
+
+        Claims without a route on either side are compared across the whole
+        window; two claims for the same route only match on the same day.
+        """
+        day = record.day
+        if day is None or record.amount_cents is None or not record.merchant:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT claim_id, expense_date, amount_cents, currency, recorded_at, route FROM claims "
+                "WHERE employee_id = ? AND merchant = ? AND day BETWEEN ? AND ? AND claim_id != ? "
+                "ORDER BY ABS(day - ?) LIMIT ?",
+                (record.employee_id, record.merchant, day - self.window_days, day + self.window_days, record.claim_id,
+                 day, self.max_candidates),
+            ).fetchall()
+        tolerance = max(abs(record.amount_cents) * self.amount_tolerance, 1)
+        matches = []
+        for *row, route in rows:
+            if row[3] != record.currency or row[2] is None:
+                continue
+            same_day = row[1] == record.expense_date
+            if record.route and route and (route != record.route or not same_day):
+                continue
+            exact = same_day and row[2] == record.amount_cents
+            if not exact and abs(row[2] - record.amount_cents) <= tolerance:
+                matches.append(self._match(row))
+        return matches
+
+    def find_outliers(self, record: ClaimRecord) -> List[OutlierFinding]:
+        """Groups in which this amount sits more than ``z_threshold`` deviations above the mean"""
+        if not record.amount_usd or record.amount_usd <= 0:
+            return []
+        value = math.log(record.amount_usd)
+        findings = []
+        with self._lock:
+            for group in record.groups:
+                row = self._conn.execute(
+                    "SELECT count, mean, m2 FROM amount_stats WHERE group_key = ?", (group,)
+                ).fetchone()
+                if row is None or row[0] < self.min_samples:
+                    continue
+                count, mean, m2 = row
+                std = math.sqrt(m2 / (count - 1))
+                if std > 0 and (value - mean) / std > self.z_threshold:
+                    findings.append(OutlierFinding(group, round((value - mean) / std, 2), round(math.exp(mean), 2), count))
+        return findings
+
+    def record(self, record: ClaimRecord, update_stats: bool = True) -> bool:
+        """Add a claim to the history; False when the claim id is already recorded"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO claims "
+                "(claim_id, employee_id, merchant, expense_date, day, amount_cents, currency, route, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (record.claim_id, record.employee_id, record.merchant, record.expense_date, record.day,
+                 record.amount_cents, record.currency, record.route, time.time()),
+            )
+            inserted = cursor.rowcount == 1
+            if inserted and update_stats and record.amount_usd and record.amount_usd > 0:
+                for group in record.groups:
+                    self._update_stats_locked(group, math.log(record.amount_usd))
+            self._conn.commit()
+        return inserted
+
+    def _update_stats_locked(self, group: str, value: float) -> None:
+        """Welford update of one group's running mean and sum of squared deviations"""
+        row = self._conn.execute("SELECT count, mean, m2 FROM amount_stats WHERE group_key = ?", (group,)).fetchone()
+        count, mean, m2 = row or (0, 0.0, 0.0)
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO amount_stats (group_key, count, mean, m2) VALUES (?, ?, ?, ?)",
+            (group, count, mean, m2),
+        )
+
+    def check(self, record: ClaimRecord) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], List[OutlierFinding]]:
+        """Run every check, then record the claim
+
+        Outlying amounts are kept out of the running statistics, so a burst of
+        inflated claims cannot shift what counts as typical.
+        """
+        exact = self.find_exact(record)
+        near = self.find_near(record)
+        outliers = self.find_outliers(record)
+        self.record(record, update_stats=not outliers)
+        return exact, near, outliers
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            claims = self._conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+            groups = self._conn.execute("SELECT COUNT(*) FROM amount_stats").fetchone()[0]
+        return {"claims": claims, "amount_groups": groups}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM claims")
+            self._conn.execute("DELETE FROM amount_stats")
+            self._conn.commit()
+
+    @staticmethod
+    def _match(row: Tuple) -> Dict[str, Any]:
+        claim_id, expense_date, amount_cents, currency, recorded_at = row
+        return {
+            "claim_id": claim_id,
+            "expense_date": expense_date,
+            "amount": amount_cents / 100,
+            "currency": currency,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(recorded_at)),
+        }
+
+_index: Optional[ClaimIndex] = None
+_index_lock = threading.Lock()
+
+def get_claim_index() -> Optional[ClaimIndex]:
+    """Process-wide claim history, or None when CLAIM_INDEX_ENABLED is off"""
+    global _index
+    if not CLAIM_INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = ClaimIndex()
+        return _index
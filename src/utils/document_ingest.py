@@ -0,0 +1,279 @@
+"""Streaming page-by-page ingestion of multi-page PDFs and long receipts
+
+Hotel folios and monthly ride statements arrive as multi-page PDFs or very
+tall screenshots. Instead of loading and OCRing the whole document up front:
+
+- ``iter_pages`` yields one page at a time: PDF pages are rendered on demand
+  (or read from the embedded text layer, skipping OCR), and tall images are
+  cut into overlapping tiles. Each page image is closed before the next one
+  is produced, so memory holds one page regardless of document length.
+  Rendered pages and tiles skip the photo-only preprocessing steps (crop to
+  the receipt, downscale from an estimated receipt width): a page is already
+  at ``INGEST_PDF_DPI`` and a tile is a slice of a longer receipt.
+- ``iter_document_claims`` OCRs those pages lazily and splits the text into
+  claims. A new claim starts when a field line (a date, pickup or dropoff)
+  repeats once the current claim has an amount, a date and a merchant, found
+  by layout-independent patterns, so folios and statements split and stop
+  early too. With ``max_claims`` the remaining pages are never rendered or
+  OCR'd once the last wanted claim is complete.
+- ``read_first_claim`` stops after the first claim the same way, and reports
+  the receipts already seen after it and the pages left unread, so a caller
+  that keeps one claim can say what it skipped.
+
+A tall image is still decoded once (PNG has no partial decode); only its
+tiles are OCR'd separately.
+"""
+
+import logging
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ..config.settings import (
+    INGEST_MAX_PAGES,
+    INGEST_PDF_DPI,
+    INGEST_TALL_IMAGE_ASPECT,
+    INGEST_TEXT_LAYER_MIN_CHARS,
+    INGEST_TILE_ASPECT,
+    INGEST_TILE_OVERLAP,
+    OCR_PREPROCESS_STEPS,
+)
+from .blob_store import BlobStore
+from .receipt_parsers import COMMON_PATTERNS, DOCUMENT_REQUIRED_FIELDS, GENERIC_PATTERNS, PARSERS, document_fields
+
+logger = logging.getLogger(__name__)
+
+PDF_CONTENT_TYPE = "application/pdf"
+
+# A repeat of one of these lines, once the current claim is complete, starts the next claim
+BOUNDARY_FIELDS = ["expense_date", "pickup_location", "dropoff_location"]
+# Crop and downscale assume a photographed 80mm receipt; pages and tiles only get the cleanup steps
+PAGE_PREPROCESS_STEPS = [step for step in OCR_PREPROCESS_STEPS if step not in ("crop", "downscale")]
+_MAX_OVERLAP_LINES = 12
+
+@dataclass
+class Page:
+    """One PDF page or image tile; carries either an image to OCR or embedded text"""
+    number: int  # 1-based
+    image: Optional[Any] = None  # PIL image
+    text: Optional[str] = None
+    overlaps_previous: bool = False  # Tiles repeat the bottom of the previous tile
+    preprocess_steps: Optional[List[str]] = None  # None: the full photo pipeline (OCR_PREPROCESS_STEPS)
+    count: Optional[int] = None  # Pages (or tiles) in the document, up to max_pages
+
+@dataclass
+class DocumentClaim:
+    """Text of one receipt found in a document, and the pages it came from"""
+    text: str
+    pages: List[int]
+    complete: bool  # Amount, date and merchant were all found
+
+@dataclass
+class FirstClaim:
+    """The first claim of a document, and what was left after it"""
+    claim: Optional[DocumentClaim]
+    more_claims: int = 0  # Further receipts already started on the pages read
+    unread_pages: int = 0  # Pages after the last one read
+
+def is_pdf(blob: Dict[str, Any]) -> bool:
+    return blob.get("content_type") == PDF_CONTENT_TYPE
+
+def _iter_pdf_pages(path: str, max_pages: int) -> Iterator[Page]:
+    # pypdfium2 is only needed once a PDF is uploaded
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        count = min(len(pdf), max_pages)
+        for index in range(count):
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                if len(text.strip()) >= INGEST_TEXT_LAYER_MIN_CHARS:
+                    yield Page(index + 1, text=text, count=count)
+                    continue
+                # Scanned page: render it in grayscale, which is all Tesseract needs
+                image = page.render(scale=INGEST_PDF_DPI / 72, grayscale=True).to_pil()
+                try:
+                    yield Page(index + 1, image=image, preprocess_steps=PAGE_PREPROCESS_STEPS, count=count)
+                finally:
+                    image.close()
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+def _iter_tiles(image: Any, max_pages: int) -> Iterator[Page]:
+    width, height = image.size
+    if height <= width * INGEST_TALL_IMAGE_ASPECT:
+        yield Page(1, image=image, count=1)
+        return
+
+    tile_height = int(width * INGEST_TILE_ASPECT)
+    step = max(1, int(tile_height * (1 - INGEST_TILE_OVERLAP)))
+    count = min(max_pages, 1 + max(0, -(-(height - tile_height) // step)))
+    top = 0
+    for number in range(1, max_pages + 1):
+        bottom = min(height, top + tile_height)
+        tile = image.crop((0, top, width, bottom))
+        try:
+            yield Page(
+                number, image=tile, overlaps_previous=number > 1, preprocess_steps=PAGE_PREPROCESS_STEPS, count=count
+            )
+        finally:
+            tile.close()
+        if bottom >= height:
+            break
+        top += step
+
+def iter_pages(store: BlobStore, blob: Dict[str, Any], max_pages: int = INGEST_MAX_PAGES) -> Iterator[Page]:
+    """Pages of a stored PDF, tiles of a tall image, or a regular image as one page"""
+    if is_pdf(blob):
+        yield from _iter_pdf_pages(store.path(blob["key"]), max_pages)
+    else:
+        with store.open_image(blob["key"]) as image:
+            yield from _iter_tiles(image, max_pages)
+
+def _drop_overlap(previous: List[str], lines: List[str]) -> List[str]:
+    """Lines of a tile without the leading lines already read at the bottom of the previous tile"""
+    previous = [line.strip() for line in previous[-_MAX_OVERLAP_LINES:]]
+    stripped = [line.strip() for line in lines]
+    for size in range(min(len(previous), len(lines)), 0, -1):
+        if previous[-size:] == stripped[:size]:
+            return lines[size:]
+    return lines
+
+def _line_field(line: str) -> Optional[str]:
+    for patterns in (COMMON_PATTERNS, GENERIC_PATTERNS):
+        for key, pattern in patterns.items():
+            if pattern.search(line):
+                return key
+    return None
+
+def _is_complete(text: str) -> bool:
+    return document_fields(text).issuperset(DOCUMENT_REQUIRED_FIELDS)
+
+@dataclass
+class ClaimSegmenter:
+    """Splits a stream of page texts into per-receipt claims"""
+    lines: List[Tuple[int, str]] = field(default_factory=list)  # (page, line) of the current claim
+    seen: Set[str] = field(default_factory=set)
+    last_field_line: int = -1  # Index of the current claim's last field line
+    closed: int = 0  # Claims split off so far
+
+    def _text(self, lines: List[Tuple[int, str]]) -> str:
+        return "\n".join(line for _, line in lines)
+
+    def _claim(self, lines: List[Tuple[int, str]]) -> DocumentClaim:
+        text = self._text(lines)
+        pages = sorted({page for page, _ in lines})
+        return DocumentClaim(text=text, pages=pages, complete=_is_complete(text))
+
+    def current_complete(self) -> bool:
+        return _is_complete(self._text(self.lines))
+
+    def _split_point(self) -> int:
+        """Where the next claim starts within the lines after the current claim's last field
+
+        At the first line that looks like a receipt header, else at the last
+        blank line, else right after the field. Trailing lines (trip IDs,
+        footers) stay with their receipt; the next receipt's header moves on.
+        """
+        tail = range(self.last_field_line + 1, len(self.lines))
+        for index in tail:
+            if any(parser.header.search(self.lines[index][1]) for parser in PARSERS):
+                return index
+        blanks = [index for index in tail if not self.lines[index][1].strip()]
+        return blanks[-1] if blanks else self.last_field_line + 1
+
+    def feed(self, page: int, text: str, overlaps_previous: bool = False) -> List[DocumentClaim]:
+        """Add one page of text; returns the claims it closed"""
+        lines = text.splitlines()
+        if overlaps_previous:
+            lines = _drop_overlap([line for _, line in self.lines], lines)
+
+        closed = []
+        for line in lines:
+            key = _line_field(line)
+            if key in BOUNDARY_FIELDS and key in self.seen and self.current_complete():
+                split = self._split_point()
+                closed.append(self._claim(self.lines[:split]))
+                self.lines = self.lines[split:]
+                self.seen.clear()
+                self.closed += 1
+            self.lines.append((page, line))
+            if key is not None:
+                self.seen.add(key)
+                self.last_field_line = len(self.lines) - 1
+        return closed
+
+    def flush(self) -> Optional[DocumentClaim]:
+        """The claim still open at the end of the document, if it has any text
+
+        After earlier claims, text without an amount is a trailer (payments,
+        footers), not a claim of its own.
+        """
+        lines, self.lines = self.lines, []
+        self.seen.clear()
+        self.last_field_line = -1
+        closed, self.closed = self.closed, 0
+        if not any(line.strip() for _, line in lines):
+            return None
+        claim = self._claim(lines)
+        if closed and "amount" not in document_fields(claim.text):
+            return None
+        return claim
+
+def iter_document_claims(
+    pages: Iterable[Page],
+    ocr: Callable[[Any], str],
+    max_claims: Optional[int] = None,
+) -> Iterator[DocumentClaim]:
+    """OCR ``pages`` lazily and yield each claim as soon as it is known
+
+    ``ocr(image, steps=...)`` turns a page image into text, with ``steps``
+    the page's preprocessing pipeline; pages with embedded text skip it.
+    Once ``max_claims`` claims are out (the last one complete), no further
+    page is read.
+    """
+    segmenter = ClaimSegmenter()
+    emitted = 0
+    with closing(iter(pages)) as page_iter:
+        for page in page_iter:
+            text = page.text if page.text is not None else ocr(page.image, steps=page.preprocess_steps)
+            for claim in segmenter.feed(page.number, text, page.overlaps_previous):
+                yield claim
+                emitted += 1
+                if max_claims is not None and emitted >= max_claims:
+                    return
+            if max_claims is not None and emitted == max_claims - 1 and segmenter.current_complete():
+                logger.debug("All required fields found by page %d; skipping the remaining pages", page.number)
+                break
+    claim = segmenter.flush()
+    if claim is not None:
+        yield claim
+
+def read_first_claim(pages: Iterable[Page], ocr: Callable[[Any], str]) -> FirstClaim:
+    """OCR ``pages`` up to the end of the first claim, and count what it leaves behind
+
+    Reads as little as ``iter_document_claims(..., max_claims=1)``. Receipts
+    that started on the pages read are counted in ``more_claims``; pages
+    never read (known from ``Page.count``) in ``unread_pages``, which may hold
+    further receipts.
+    """
+    segmenter = ClaimSegmenter()
+    last, count = 0, None
+    with closing(iter(pages)) as page_iter:
+        for page in page_iter:
+            last, count = page.number, page.count
+            text = page.text if page.text is not None else ocr(page.image, steps=page.preprocess_steps)
+            closed = segmenter.feed(page.number, text, page.overlaps_previous)
+            if closed:
+                started = any(line.strip() for _, line in segmenter.lines)
+                return FirstClaim(closed[0], len(closed) - 1 + started, max(0, (count or last) - last))
+            if segmenter.current_complete():
+                logger.debug("All required fields found by page %d; skipping the remaining pages", page.number)
+                break
+    return FirstClaim(segmenter.flush(), 0, max(0, (count or last) - last))
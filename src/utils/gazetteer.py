@@ -0,0 +1,188 @@
+"""Offline gazetteer for resolving trip locations to a country and city
+
+Cities, aliases, landmarks, country names and IATA airport codes from
+``src/config/gazetteer.json`` are indexed by their normalized token sequence,
+so resolving a location string is a handful of dict lookups over its
+n-grams. City names that are also everyday words ("Nice", "Phoenix") only
+count when another place in the trip agrees on their country. Answers the
+location analyst gets from the LLM are mapped to a known country and
+memoized per (pickup, dropoff) pair, so repeated routes skip the network.
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ..config.settings import GAZETTEER_LEARNED_PATH, GAZETTEER_PATH
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_IATA = re.compile(r"\b[A-Z]{3}\b")
+_AIRPORT_CONTEXT = re.compile(r"airport|terminal|intl|international|\(", re.IGNORECASE)
+
+class Place(NamedTuple):
+    """A resolved location"""
+    city: Optional[str]
+    country: str
+    source: str  # "city", "alias", "landmark", "country", "airport" or "learned"
+    common_word: bool = False  # Needs another place in the trip to confirm it
+
+def normalize_tokens(text: str) -> Tuple[str, ...]:
+    """Lowercase, strip accents and punctuation, and split into tokens"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return tuple(token for token in _NON_ALNUM.split(text.lower()) if token)
+
+def _pair_key(pickup: Optional[str], dropoff: Optional[str]) -> str:
+    return " ".join(normalize_tokens(pickup or "")) + "|" + " ".join(normalize_tokens(dropoff or ""))
+
+_EMPTY_PAIR = _pair_key(None, None)  # No route at all; never memoized, it would match every such claim
+
+class Gazetteer:
+    """Normalized-token index of places, plus memoized LLM answers"""
+
+    def __init__(self, path: str = GAZETTEER_PATH, learned_path: Optional[str] = GAZETTEER_LEARNED_PATH):
+        self.learned_path = learned_path
+        self._names: Dict[Tuple[str, ...], List[Place]] = {}
+        self._airports: Dict[str, Place] = {}
+        self._learned: Dict[str, Place] = {}
+        self._countries: Dict[Tuple[str, ...], str] = {}  # Normalized name or alias -> canonical name
+        self._country_codes: Dict[str, str] = {}  # ISO code -> canonical name
+        self._lock = threading.Lock()
+        self.max_ngram = 1
+
+        with open(path, "r") as f:
+            data = json.load(f)
+        for entry in data.get("countries", []):
+            for name in [entry["name"], *entry.get("aliases", ())]:
+                self._countries[normalize_tokens(name)] = entry["name"]
+                self.add_name(name, Place(None, entry["name"], "country"))
+            for code in entry.get("codes", ()):
+                self._country_codes[code.upper()] = entry["name"]
+        for section, source in (("cities", "city"), ("aliases", "alias"), ("landmarks", "landmark")):
+            for entry in data.get(section, []):
+                self.add_name(entry["name"], Place(entry.get("city"), entry["country"], source, entry.get("common_word", False)))
+        for entry in data.get("airports", []):
+            self._airports[entry["iata"].upper()] = Place(entry.get("city"), entry["country"], "airport")
+
+        if learned_path and os.path.exists(learned_path):
+            lines = 0
+            with open(learned_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        lines += 1
+                        entry = json.loads(line)
+                        # Entries written before answers were validated may hold free text
+                        country = self.canonical_country(entry["country"])
+                        if country is not None and entry["key"] != _EMPTY_PAIR:
+                            self._learned[entry["key"]] = Place(entry.get("city"), country, "learned")
+            if lines > len(self._learned):
+                self._write_learned()
+
+    def add_name(self, name: str, place: Place) -> None:
+        """Index a place name under its normalized tokens"""
+        tokens = normalize_tokens(name)
+        if not tokens:
+            return
+        candidates = self._names.setdefault(tokens, [])
+        for index, existing in enumerate(candidates):
+            if existing.country == place.country:
+                # "Singapore" the city is more specific than "Singapore" the country
+                if existing.city is None and place.city is not None:
+                    candidates[index] = place
+                break
+        else:
+            candidates.append(place)
+        self.max_ngram = max(self.max_ngram, len(tokens))
+
+    def canonical_country(self, text: Optional[str]) -> Optional[str]:
+        """Known country named in ``text`` ("UK", "United Kingdom.", "The country is France"), or None"""
+        if not text:
+            return None
+        code = text.strip().strip(".").upper()
+        if code in self._country_codes:
+            return self._country_codes[code]
+        tokens = normalize_tokens(text)
+        found = set()
+        for size in range(min(self.max_ngram, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                country = self._countries.get(tokens[start:start + size])
+                if country is not None:
+                    found.add(country)
+        return found.pop() if len(found) == 1 else None
+
+    def candidates(self, text: Optional[str]) -> List[Place]:
+        """Every indexed place mentioned in ``text``, longest names first"""
+        if not text:
+            return []
+        tokens = normalize_tokens(text)
+        found: List[Place] = []
+        for size in range(min(self.max_ngram, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                found.extend(self._names.get(tokens[start:start + size], ()))
+        # All-caps three-letter tokens are IATA codes only in an airport-like context
+        # or in mixed-case text (fully upper-case OCR lines are full of 3-letter words)
+        if not text.isupper() or _AIRPORT_CONTEXT.search(text):
+            for code in _IATA.findall(text):
+                if code in self._airports:
+                    found.append(self._airports[code])
+        return found
+
+    def resolve(self, pickup: Optional[str], dropoff: Optional[str]) -> Optional[Place]:
+        """Return a confident match for the trip, or None to fall back to the LLM
+
+        A match is confident when every place found in the pickup and dropoff
+        strings agrees on one country. Common-word city names are dropped
+        unless another place found agrees with them, so "Nice restaurant"
+        alone is left to the LLM.
+        """
+        learned = self._learned.get(_pair_key(pickup, dropoff))
+        if learned is not None:
+            return learned
+
+        # Prefer the dropoff's city when both ends resolve
+        found = self.candidates(dropoff) + self.candidates(pickup)
+        confirmed = {place.country for place in found if not place.common_word}
+        found = [place for place in found if not place.common_word or place.country in confirmed]
+        if not found or len({place.country for place in found}) != 1:
+            return None
+        # A country name alone is less specific than any city, and a common-word name is the weakest city
+        return min(found, key=lambda place: (place.city is None, place.common_word))
+
+    def _write_learned(self) -> None:
+        """Rewrite the learned file with one line per pair, dropping repeats and unknown countries"""
+        tmp_path = f"{self.learned_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for key, place in self._learned.items():
+                f.write(json.dumps({"key": key, "country": place.country, "city": place.city}) + "\n")
+        os.replace(tmp_path, self.learned_path)
+
+    def remember(self, pickup: Optional[str], dropoff: Optional[str], country: str, city: Optional[str] = None) -> None:
+        """Memoize an LLM answer for this (pickup, dropoff) pair; only known countries are kept"""
+        country = self.canonical_country(country)
+        if country is None:
+            return
+        key = _pair_key(pickup, dropoff)
+        if key == _EMPTY_PAIR:
+            return
+        place = Place(city, country, "learned")
+        with self._lock:
+            if self._learned.get(key) == place:
+                return
+            self._learned[key] = place
+            if self.learned_path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.learned_path)), exist_ok=True)
+                with open(self.learned_path, "a") as f:
+                    f.write(json.dumps({"key": key, "country": country, "city": city}) + "\n")
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    """Process-wide gazetteer, loaded on first use"""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer()
+        return _gazetteer
@@ -0,0 +1,213 @@
+"""Local reading of HITL clarification answers
+
+Most answers to "which department and purpose?" are a number from the
+offered options ("2"), a department ("Sales"), a purpose ("client meeting")
+or both. ``AnswerMatcher`` reads those without an LLM round trip:
+
+- a bare option number or ordinal ("1", "#2", "the second one") picks one of
+  the numbered ``clarification_options``
+- otherwise every department and purpose in ``src/config/hitl_vocabulary.json``
+  (names and aliases), plus the options themselves, is compared with the
+  answer's word n-grams, exactly or by ``difflib`` similarity for typos
+
+A match is only trusted when it is unambiguous (no other term of the same
+field scores within ``HITL_MATCH_MARGIN``) and the matched terms account for
+``HITL_MATCH_MIN_COVERAGE`` of the answer's content words. Anything else
+("Sales, but really it was for the hiring event in Paris") returns None and
+the HITL agent asks the LLM.
+"""
+
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..config.settings import (
+    HITL_MATCH_MARGIN,
+    HITL_MATCH_MAX_TOKENS,
+    HITL_MATCH_MIN_COVERAGE,
+    HITL_MATCH_MIN_SCORE,
+    HITL_MAX_OPTIONS,
+    HITL_VOCABULARY_PATH,
+)
+from .gazetteer import normalize_tokens
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("department", "purpose")
+_OPTION_NUMBER = re.compile(r"(?:option|number|no\.?|#)?\s*(\d{1,2})\s*[.)]?", re.IGNORECASE)
+_ORDINALS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5}
+_OPTION_FILLER = {"the", "option", "number", "one", "please"}
+# Words that carry no department or purpose; they do not count against coverage
+STOPWORDS = {
+    "a", "an", "the", "it", "its", "s", "was", "is", "were", "for", "to", "of", "and", "in", "on", "at", "my",
+    "our", "we", "i", "me", "this", "that", "trip", "ride", "department", "dept", "purpose", "team", "please",
+    "yes", "yeah", "just", "with", "by", "business", "work", "im", "am", "from", "as",
+}
+
+class AnswerMatch(NamedTuple):
+    """Department and/or purpose read from an answer without the LLM"""
+    department: Optional[str]
+    purpose: Optional[str]
+    path: str  # "option" or "fuzzy"
+
+class _Term(NamedTuple):
+    tokens: Tuple[str, ...]
+    field: str
+    value: str  # Canonical name
+
+def format_options(options: Sequence[Dict[str, str]]) -> str:
+    """Numbered option list appended to a clarification question"""
+    lines = [f"{number}. {option['department']} - {option['purpose']}" for number, option in enumerate(options, 1)]
+    return "Reply with a number, or describe the department and purpose:\n" + "\n".join(lines)
+
+def clarification_options(
+    employee_id: Optional[str],
+    department: Optional[str],
+    purpose: Optional[str],
+    limit: int = HITL_MAX_OPTIONS,
+) -> List[Dict[str, str]]:
+    """The classifier's guess first, then the employee's most frequent past classifications"""
+    options: List[Dict[str, str]] = []
+    candidates: List[Tuple[Optional[str], Optional[str]]] = [(department, purpose)]
+    if employee_id:
+        # NumPy loads with the classifier index, only when a claim needs clarification
+        from .claim_classifier import get_claim_classifier
+
+        try:
+            classifier = get_claim_classifier(wait=False)
+            if classifier is not None:
+                candidates.extend(classifier.employee_labels(employee_id, limit))
+        except Exception as e:
+            logger.warning("Reading past classifications failed: %s", e)
+    for candidate_department, candidate_purpose in candidates:
+        option = {"department": candidate_department, "purpose": candidate_purpose}
+        if candidate_department and candidate_purpose and option not in options:
+            options.append(option)
+    return options[:limit]
+
+class AnswerMatcher:
+    """Matches clarification answers against option numbers and the department/purpose vocabulary"""
+
+    def __init__(
+        self,
+        path: str = HITL_VOCABULARY_PATH,
+        min_score: float = HITL_MATCH_MIN_SCORE,
+        margin: float = HITL_MATCH_MARGIN,
+        min_coverage: float = HITL_MATCH_MIN_COVERAGE,
+        max_tokens: int = HITL_MATCH_MAX_TOKENS,
+    ):
+        self.min_score = min_score
+        self.margin = margin
+        self.min_coverage = min_coverage
+        self.max_tokens = max_tokens
+        with open(path, "r") as f:
+            data = json.load(f)
+        self._terms: List[_Term] = []
+        for field in FIELDS:
+            for entry in data.get(f"{field}s", []):
+                self._terms.extend(self._field_terms(field, entry["name"], entry.get("aliases", ())))
+
+    @staticmethod
+    def _field_terms(field: str, value: str, aliases: Iterable[str] = ()) -> List[_Term]:
+        terms = []
+        for name in [value, *aliases]:
+            tokens = normalize_tokens(name)
+            if tokens:
+                terms.append(_Term(tokens, field, value))
+        return terms
+
+    def _option_number(self, answer: str, tokens: Tuple[str, ...]) -> Optional[int]:
+        match = _OPTION_NUMBER.fullmatch(answer.strip())
+        if match:
+            return int(match.group(1))
+        words = [token for token in tokens if token not in _OPTION_FILLER]
+        if len(words) == 1 and words[0] in _ORDINALS:
+            return _ORDINALS[words[0]]
+        return None
+
+    def _score(self, window: Tuple[str, ...], term: _Term) -> float:
+        if window == term.tokens:
+            return 1.0
+        a, b = " ".join(window), " ".join(term.tokens)
+        matcher = SequenceMatcher(None, a, b)
+        if matcher.real_quick_ratio() < self.min_score or matcher.quick_ratio() < self.min_score:
+            return 0.0
+        return matcher.ratio()
+
+    def _term_matches(self, tokens: Tuple[str, ...], terms: List[_Term]) -> List[Tuple[float, _Term, range]]:
+        """Best-scoring span of the answer for every term that matches anywhere"""
+        matches = []
+        for term in terms:
+            size = len(term.tokens)
+            best: Optional[Tuple[float, _Term, range]] = None
+            for start in range(len(tokens) - size + 1):
+                score = self._score(tokens[start:start + size], term)
+                if score >= self.min_score and (best is None or score > best[0]):
+                    best = (score, term, range(start, start + size))
+            if best is not None:
+                matches.append(best)
+        # A term inside a longer matched term ("development" in "business development") is not a separate mention
+        return [
+            match for match in matches
+            if not any(
+                len(other[2]) > len(match[2]) and match[2].start >= other[2].start and match[2].stop <= other[2].stop
+                for other in matches
+            )
+        ]
+
+    def match(self, answer: str, options: Sequence[Dict[str, str]] = ()) -> Optional[AnswerMatch]:
+        """Department and purpose from ``answer``; None when the LLM should read it"""
+        tokens = normalize_tokens(str(answer))
+        if not tokens or len(tokens) > self.max_tokens:
+            return None
+
+        number = self._option_number(str(answer), tokens)
+        if number is not None:
+            if 1 <= number <= len(options):
+                option = options[number - 1]
+                return AnswerMatch(option.get("department"), option.get("purpose"), "option")
+            return None
+
+        terms = list(self._terms)
+        for option in options:
+            for field in FIELDS:
+                if option.get(field):
+                    terms.extend(self._field_terms(field, option[field]))
+        matches = self._term_matches(tokens, terms)
+
+        found: Dict[str, Optional[str]] = {field: None for field in FIELDS}
+        covered = set()
+        for field in FIELDS:
+            scores: Counter = Counter()
+            for score, term, span in matches:
+                if term.field == field:
+                    scores[term.value] = max(scores[term.value], score)
+                    covered.update(span)
+            ranked = scores.most_common(2)
+            if not ranked:
+                continue
+            if len(ranked) > 1 and ranked[1][1] >= ranked[0][1] - self.margin:
+                return None
+            found[field] = ranked[0][0]
+        if not any(found.values()):
+            return None
+
+        content = [index for index, token in enumerate(tokens) if token not in STOPWORDS]
+        if content and sum(index in covered for index in content) / len(content) < self.min_coverage:
+            return None
+        return AnswerMatch(found["department"], found["purpose"], "fuzzy")
+
+_matcher: Optional[AnswerMatcher] = None
+_matcher_lock = threading.Lock()
+
+def get_answer_matcher() -> AnswerMatcher:
+    """Process-wide matcher, loaded on first use"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = AnswerMatcher()
+        return _matcher
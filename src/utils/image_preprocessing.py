@@ -0,0 +1,130 @@
+"""OpenCV preprocessing applied to receipt images before Tesseract
+
+Phone photos arrive at 12 megapixels with background around the receipt,
+uneven lighting and a slight tilt. Tesseract's runtime grows with pixel count
+and its accuracy drops on all three, so each image goes through the steps in
+``OCR_PREPROCESS_STEPS``:
+
+- ``crop``: crop to the largest receipt-like contour
+- ``downscale``: shrink to ``OCR_TARGET_DPI`` (never upscales)
+- ``grayscale``: drop the color channels
+- ``deskew``: rotate the text lines back to horizontal
+- ``threshold``: adaptive (local) binarization to even out lighting
+"""
+
+from typing import Callable, Dict, Optional, Sequence
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ..config.settings import (
+    OCR_MAX_DESKEW_DEGREES,
+    OCR_PREPROCESS_STEPS,
+    OCR_RECEIPT_WIDTH_INCHES,
+    OCR_TARGET_DPI,
+    OCR_THRESHOLD_BLOCK_SIZE,
+    OCR_THRESHOLD_OFFSET,
+)
+
+# Contour detection runs on a copy no larger than this
+_DETECTION_SIZE = 600
+
+def _gray(array: np.ndarray) -> np.ndarray:
+    return array if array.ndim == 2 else cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+
+def crop_to_receipt(array: np.ndarray, min_area_ratio: float = 0.2) -> np.ndarray:
+    """Crop to the bounding box of the largest contour, if it looks like the receipt"""
+    height, width = array.shape[:2]
+    scale = min(1.0, _DETECTION_SIZE / max(height, width))
+    small = cv2.resize(_gray(array), None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    edges = cv2.Canny(cv2.GaussianBlur(small, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, np.ones((5, 5), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return array
+
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    area_ratio = (w * h) / float(small.shape[0] * small.shape[1])
+    # Skip when the "receipt" is a speck of noise or already fills the frame
+    if area_ratio < min_area_ratio or area_ratio > 0.95:
+        return array
+    x0, y0 = int(x / scale), int(y / scale)
+    x1, y1 = int((x + w) / scale), int((y + h) / scale)
+    return array[y0:y1, x0:x1]
+
+def downscale_to_dpi(
+    array: np.ndarray,
+    target_dpi: int = OCR_TARGET_DPI,
+    source_dpi: Optional[float] = None,
+) -> np.ndarray:
+    """Shrink to ``target_dpi``
+
+    Phone photos rarely carry meaningful DPI metadata, so by default the
+    source resolution is estimated from the (cropped) receipt width.
+    """
+    width = array.shape[1]
+    source_dpi = source_dpi or width / OCR_RECEIPT_WIDTH_INCHES
+    scale = target_dpi / source_dpi
+    if scale >= 1.0:
+        return array
+    return cv2.resize(array, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def to_grayscale(array: np.ndarray) -> np.ndarray:
+    """Convert RGB to a single luminance channel"""
+    return _gray(array)
+
+def estimate_skew(array: np.ndarray) -> float:
+    """Angle in degrees (counter-clockwise) that the text is rotated by"""
+    ink = cv2.threshold(_gray(array), 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    # Join characters into line-shaped blobs; each line's orientation is a skew sample
+    lines = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (25, 3)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    max_thickness = 0.05 * max(ink.shape)
+    angles, weights = [], []
+    for contour in contours:
+        (_, _), (w, h), angle = cv2.minAreaRect(contour)
+        if max(w, h) < 40 or max(w, h) < 3 * min(w, h) or min(w, h) > max_thickness:
+            continue  # Too short, too square or too thick (background, borders) to be a text line
+        # Orientation of the long side, folded into [-45, 45)
+        angle = angle if w >= h else angle - 90
+        angles.append((angle + 45) % 90 - 45)
+        weights.append(max(w, h))
+    if not angles:
+        return 0.0
+    # Image rows grow downwards, so minAreaRect angles are clockwise
+    return -float(np.average(angles, weights=weights))
+
+def deskew(array: np.ndarray, max_degrees: float = OCR_MAX_DESKEW_DEGREES) -> np.ndarray:
+    """Rotate so text lines are horizontal; tiny or implausible angles are ignored"""
+    angle = estimate_skew(array)
+    if abs(angle) < 0.3 or abs(angle) > max_degrees:
+        return array
+    height, width = array.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+    return cv2.warpAffine(array, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def adaptive_threshold(
+    array: np.ndarray,
+    block_size: int = OCR_THRESHOLD_BLOCK_SIZE,
+    offset: int = OCR_THRESHOLD_OFFSET,
+) -> np.ndarray:
+    """Binarize against the local neighbourhood so shadows do not swallow text"""
+    return cv2.adaptiveThreshold(
+        _gray(array), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, offset
+    )
+
+PREPROCESS_STEPS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "crop": crop_to_receipt,
+    "downscale": downscale_to_dpi,
+    "grayscale": to_grayscale,
+    "deskew": deskew,
+    "threshold": adaptive_threshold,
+}
+
+def preprocess_for_ocr(image: Image.Image, steps: Sequence[str] = OCR_PREPROCESS_STEPS) -> Image.Image:
+    """Apply the configured preprocessing steps, in order, to a PIL image"""
+    array = np.asarray(image.convert("RGB"))
+    for step in steps:
+        array = PREPROCESS_STEPS[step](array)
+    return Image.fromarray(array)
@@ -0,0 +1,557 @@
+"""Shared LLM client used by every agent
+
+One ``ChatOpenAI`` instance serves the whole process, so all agents share:
+
+- a bounded keep-alive HTTP connection pool (``LLM_MAX_CONNECTIONS``)
+- a token-bucket rate limiter (``LLM_REQUESTS_PER_SECOND``, ``LLM_BURST``),
+  applied after the response cache so cache hits are never throttled
+- jittered exponential backoff on 429s, 5xx responses, timeouts and
+  connection errors, honouring ``Retry-After``
+- a per-call deadline covering queueing, every attempt and the backoff sleeps
+- counters for in-flight requests, retries and rate-limiter queue wait
+
+Agents call ``get_llm().invoke(messages)`` or ``await get_llm().ainvoke(messages)``,
+or ``invoke_json(messages, schema)`` / ``ainvoke_json`` when they expect a JSON
+object back. Those ask the provider for JSON mode (``LLM_JSON_MODE``); a
+model whose provider rejects ``response_format`` gets plain requests for
+``LLM_JSON_MODE_RETRY_SECONDS``, then JSON mode is tried again. JSON-mode replies end with the object, so they are
+invoked (and cached) rather than streamed. Without JSON mode and without a
+response cache to consult, the reply is streamed and reading stops as soon as
+the object's closing brace arrives. A reply that fails the
+agent's schema is re-asked with the validation error, up to
+``LLM_JSON_MAX_ATTEMPTS`` calls, before ``LLMOutputError`` is raised.
+The OpenAI/httpx stack is only imported when the client is first built.
+"""
+
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from ..config.settings import (
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_BASE_URL,
+    LLM_BURST,
+    LLM_CALL_DEADLINE_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_DEFAULT_HEADERS,
+    LLM_JSON_MAX_ATTEMPTS,
+    LLM_JSON_MODE,
+    LLM_JSON_MODE_RETRY_SECONDS,
+    LLM_KEEPALIVE_EXPIRY_SECONDS,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_MODEL,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+    LLM_REQUESTS_PER_SECOND,
+    LLM_STREAM_JSON,
+    OPENROUTER_API_KEY,
+)
+from .llm_json import JSONObjectScanner, JSONSchema, LLMOutputError, parse_llm_json
+from .telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Monotonic deadline of the call in progress, read by the rate limiter
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_call_deadline", default=None)
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call could not complete within its deadline"""
+
+class LLMMetrics:
+    """Thread-safe counters shared by the rate limiter and the client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {
+            "requests": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "deadline_exceeded": 0,
+            "queued": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "malformed_outputs": 0,  # JSON replies that failed their schema
+            "json_early_exits": 0,  # Streamed replies closed at the JSON object's closing brace
+            "json_mode_fallbacks": 0,  # Providers that rejected response_format
+        }
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["in_flight"] += 1
+            self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.counters["in_flight"])
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self.counters["in_flight"] -= 1
+
+    def record_queue_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.counters["queued"] += 1
+            self.counters["queue_wait_seconds_total"] += seconds
+            self.counters["queue_wait_seconds_max"] = max(self.counters["queue_wait_seconds_max"], seconds)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["queue_wait_seconds_avg"] = (
+            round(stats["queue_wait_seconds_total"] / stats["queued"], 4) if stats["queued"] else 0.0
+        )
+        return stats
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """Token bucket refilled at ``rate`` tokens/second, holding at most ``capacity``
+
+    Tokens are reserved up front (the balance may go negative), so concurrent
+    callers queue in arrival order and each sleeps only for its own share.
+    """
+
+    def __init__(self, rate: float, capacity: int, metrics: Optional[LLMMetrics] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.metrics = metrics or LLMMetrics()
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, blocking: bool) -> Optional[float]:
+        """Take a token and return how long to wait for it, or None if not taken"""
+        now = time.monotonic()
+        with self._lock:
+            self._refill_locked(now)
+            if self._tokens < 1 and not blocking:
+                return None
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            deadline = _deadline.get()
+            if deadline is not None and now + wait > deadline:
+                self.metrics.increment("deadline_exceeded")
+                raise LLMDeadlineExceeded(f"Rate limiter wait of {wait:.1f}s exceeds the call deadline")
+            self._tokens -= 1
+        if wait > 0:
+            self.metrics.record_queue_wait(wait)
+        return wait
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        wait = self._reserve(blocking)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        wait = self._reserve(blocking)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+def _is_retryable(error: BaseException) -> bool:
+    import httpx
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, httpx.TimeoutException, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+# What a 400/422 says when the provider refuses JSON mode itself, rather than the prompt or its size
+_JSON_MODE_REJECTION = re.compile(r"response_format|json_object|unsupported parameter", re.IGNORECASE)
+
+def _rejects_json_mode(error: BaseException) -> bool:
+    """Whether the provider refused the request because of ``response_format``"""
+    if getattr(error, "status_code", None) not in (400, 422):
+        return False
+    return _JSON_MODE_REJECTION.search(str(error)) is not None
+
+def _model_name(model: Any) -> str:
+    return str(getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__)
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Server-requested delay from a Retry-After header, if any"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+async def _close_at_loop_shutdown(model: Any) -> AsyncIterator[None]:
+    """Parked at its ``yield`` until the loop's ``shutdown_asyncgens`` (run by
+    ``asyncio.run``) closes it, which closes the model's async HTTP pool"""
+    try:
+        yield
+    finally:
+        client = getattr(model, "http_async_client", None)
+        if client is not None:
+            await client.aclose()
+
+def _record_call(seconds: float, response: Any, error: Optional[str]) -> None:
+    """Report latency and token usage to telemetry, attributed to the running node"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    get_telemetry().record_llm_call(seconds, usage.get("input_tokens"), usage.get("output_tokens"), error)
+
+class LLMClient:
+    """Wraps a chat model with retries, backoff and per-call deadlines
+
+    ``async_model_factory`` builds a model for each event loop, because pooled
+    async HTTP connections cannot be reused across loops (``asyncio.run``
+    per batch). Its ``http_async_client`` is closed when that loop shuts down. ``json_mode`` asks for OpenAI's ``response_format``; a model
+    whose provider rejects it is sent plain requests for
+    ``json_mode_retry_seconds``, after which JSON mode is tried again.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        async_model_factory: Optional[Callable[[], Any]] = None,
+        metrics: Optional[LLMMetrics] = None,
+        max_retries: int = LLM_MAX_RETRIES,
+        deadline_seconds: float = LLM_CALL_DEADLINE_SECONDS,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+        json_mode: bool = False,
+        json_mode_retry_seconds: float = LLM_JSON_MODE_RETRY_SECONDS,
+        stream_json: bool = LLM_STREAM_JSON,
+    ):
+        self.model = model
+        self.metrics = metrics or LLMMetrics()
+        self.max_retries = max_retries
+        self.deadline_seconds = deadline_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.json_mode = json_mode
+        self.json_mode_retry_seconds = json_mode_retry_seconds
+        self.stream_json = stream_json
+        self._async_model_factory = async_model_factory
+        # Loop -> (model, generator that closes the model's pool at loop shutdown)
+        self._async_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Any, AsyncIterator[None]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._json_mode_rejected: Dict[str, float] = {}  # Model name -> monotonic time JSON mode was rejected
+
+    async def _async_model(self) -> Any:
+        if self._async_model_factory is None:
+            return self.model
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_models.get(loop)
+            created = entry is None
+            if created:
+                model = self._async_model_factory()
+                entry = self._async_models[loop] = (model, _close_at_loop_shutdown(model))
+        if created:
+            await entry[1].__anext__()  # Registers it with the loop; runs to the yield without suspending
+        return entry[0]
+
+    def _backoff(self, attempt: int, error: BaseException, deadline: float) -> float:
+        """Delay before the next attempt; raises if the error is final or time is up"""
+        if not _is_retryable(error) or attempt >= self.max_retries:
+            self.metrics.increment("failures")
+            raise error
+        status = getattr(error, "status_code", None)
+        if status == 429:
+            self.metrics.increment("rate_limited")
+        elif status is not None:
+            self.metrics.increment("server_errors")
+        else:
+            self.metrics.increment("timeouts")
+
+        # Full jitter spreads retries from concurrent callers apart
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        delay = max(delay, _retry_after(error) or 0.0)
+        if time.monotonic() + delay >= deadline:
+            self.metrics.increment("deadline_exceeded")
+            self.metrics.increment("failures")
+            raise LLMDeadlineExceeded(f"LLM call deadline reached after {attempt + 1} attempts") from error
+        self.metrics.increment("retries")
+        logger.warning("LLM call failed (%s), retrying in %.1fs", type(error).__name__, delay)
+        return delay
+
+    def invoke(self, messages: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            response = self._invoke(messages, **kwargs)
+        except Exception as error:
+            _record_call(time.perf_counter() - start, None, type(error).__name__)
+            raise
+        _record_call(time.perf_counter() - start, response, None)
+        return response
+
+    async def ainvoke(self, messages: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await self._ainvoke(messages, **kwargs)
+        except Exception as error:
+            _record_call(time.perf_counter() - start, None, type(error).__name__)
+            raise
+        _record_call(time.perf_counter() - start, response, None)
+        return response
+
+    def _invoke(self, messages: Any, **kwargs: Any) -> Any:
+        return self._with_retries(lambda: self.model.invoke(messages, **kwargs))
+
+    async def _ainvoke(self, messages: Any, **kwargs: Any) -> Any:
+        model = await self._async_model()
+        return await self._awith_retries(lambda: model.ainvoke(messages, **kwargs))
+
+    def _with_retries(self, call: Callable[[], Any]) -> Any:
+        deadline = time.monotonic() + self.deadline_seconds
+        token = _deadline.set(deadline)
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.metrics.request_started()
+                try:
+                    return call()
+                except LLMDeadlineExceeded:
+                    raise
+                except Exception as error:
+                    delay = self._backoff(attempt, error, deadline)
+                finally:
+                    self.metrics.request_finished()
+                time.sleep(delay)
+        finally:
+            _deadline.reset(token)
+
+    async def _awith_retries(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        deadline = time.monotonic() + self.deadline_seconds
+        token = _deadline.set(deadline)
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.metrics.request_started()
+                try:
+                    remaining = deadline - time.monotonic()
+                    return await asyncio.wait_for(call(), timeout=remaining)
+                except LLMDeadlineExceeded:
+                    raise
+                except Exception as error:
+                    delay = self._backoff(attempt, error, deadline)
+                finally:
+                    self.metrics.request_finished()
+                await asyncio.sleep(delay)
+        finally:
+            _deadline.reset(token)
+
+    def _json_strategy(self, model: Any) -> Tuple[bool, Dict[str, Any]]:
+        """Whether to stream the reply, and the call's extra arguments
+
+        A JSON-mode reply is just the object, so there is nothing to cut
+        short. A cached model is invoked rather than streamed, because
+        streaming skips the response cache and a cache hit beats any early
+        exit. Streaming therefore only applies with both turned off.
+        """
+        if self.json_mode_enabled(model):
+            return False, {"response_format": {"type": "json_object"}}
+        return self.stream_json and not getattr(model, "cache", None), {}
+
+    def json_mode_enabled(self, model: Any = None) -> bool:
+        """Whether requests to ``model`` (default: the sync model) ask for JSON mode"""
+        if not self.json_mode:
+            return False
+        rejected = self._json_mode_rejected.get(_model_name(model if model is not None else self.model))
+        return rejected is None or time.monotonic() - rejected >= self.json_mode_retry_seconds
+
+    def _disable_json_mode(self, model: Any, error: BaseException) -> None:
+        name = _model_name(model)
+        with self._lock:
+            if not self.json_mode_enabled(model):
+                return
+            self._json_mode_rejected[name] = time.monotonic()
+        self.metrics.increment("json_mode_fallbacks")
+        logger.warning(
+            "Provider rejected JSON mode for %s, sending plain requests for %ss: %s", name, self.json_mode_retry_seconds, error
+        )
+
+    def _json_call(self, messages: List[Any], **kwargs: Any) -> Any:
+        """One JSON request, dropping JSON mode if the provider does not support it"""
+        stream, extra = self._json_strategy(self.model)
+        if stream:
+            return self._with_retries(lambda: self._stream_json(self.model, messages, **kwargs))
+        try:
+            return self._invoke(messages, **extra, **kwargs)
+        except Exception as error:
+            if not extra or not _rejects_json_mode(error):
+                raise
+            self._disable_json_mode(self.model, error)
+        return self._json_call(messages, **kwargs)
+
+    async def _ajson_call(self, model: Any, messages: List[Any], **kwargs: Any) -> Any:
+        stream, extra = self._json_strategy(model)
+        if stream:
+            return await self._awith_retries(lambda: self._astream_json(model, messages, **kwargs))
+        try:
+            return await self._awith_retries(lambda: model.ainvoke(messages, **extra, **kwargs))
+        except Exception as error:
+            if not extra or not _rejects_json_mode(error):
+                raise
+            self._disable_json_mode(model, error)
+        return await self._ajson_call(model, messages, **kwargs)
+
+    def _stream_json(self, model: Any, messages: List[Any], **kwargs: Any) -> Any:
+        """Stream a reply only until its first JSON object closes"""
+        scanner = JSONObjectScanner()
+        response = None
+        stream = model.stream(messages, **kwargs)
+        try:
+            for chunk in stream:
+                response = chunk if response is None else response + chunk
+                if scanner.feed(chunk.text) is not None:
+                    self.metrics.increment("json_early_exits")
+                    break
+        finally:
+            stream.close()
+        return response
+
+    async def _astream_json(self, model: Any, messages: List[Any], **kwargs: Any) -> Any:
+        scanner = JSONObjectScanner()
+        response = None
+        stream = model.astream(messages, **kwargs)
+        try:
+            async for chunk in stream:
+                response = chunk if response is None else response + chunk
+                if scanner.feed(chunk.text) is not None:
+                    self.metrics.increment("json_early_exits")
+                    break
+        finally:
+            await stream.aclose()
+        return response
+
+    def _reask(self, messages: List[Any], response: Any, error: LLMOutputError, attempt: int) -> List[Any]:
+        """Conversation asking the model to correct a malformed reply; raises once attempts run out"""
+        self.metrics.increment("malformed_outputs")
+        if attempt + 1 >= LLM_JSON_MAX_ATTEMPTS:
+            raise error
+        logger.warning("Malformed LLM JSON reply, asking again: %s", error)
+        return messages + [
+            AIMessage(content=response.text if response is not None else ""),
+            HumanMessage(content=f"That reply is invalid ({error}). Respond with only the corrected JSON object."),
+        ]
+
+    def invoke_json(self, messages: List[Any], schema: Optional[JSONSchema] = None, **kwargs: Any) -> Dict[str, Any]:
+        """The JSON object the model replies with, validated against ``schema``"""
+        for attempt in range(LLM_JSON_MAX_ATTEMPTS):
+            start = time.perf_counter()
+            try:
+                response = self._json_call(messages, **kwargs)
+            except Exception as error:
+                _record_call(time.perf_counter() - start, None, type(error).__name__)
+                raise
+            _record_call(time.perf_counter() - start, response, None)
+            try:
+                return parse_llm_json(response.text if response is not None else "", schema)
+            except LLMOutputError as error:
+                messages = self._reask(messages, response, error, attempt)
+
+    async def ainvoke_json(self, messages: List[Any], schema: Optional[JSONSchema] = None, **kwargs: Any) -> Dict[str, Any]:
+        """Async variant of invoke_json"""
+        model = await self._async_model()
+        for attempt in range(LLM_JSON_MAX_ATTEMPTS):
+            start = time.perf_counter()
+            try:
+                response = await self._ajson_call(model, messages, **kwargs)
+            except Exception as error:
+                _record_call(time.perf_counter() - start, None, type(error).__name__)
+                raise
+            _record_call(time.perf_counter() - start, response, None)
+            try:
+                return parse_llm_json(response.text if response is not None else "", schema)
+            except LLMOutputError as error:
+                messages = self._reask(messages, response, error, attempt)
+
+    def stats(self) -> Dict[str, float]:
+        """In-flight, retry and queue-wait counters"""
+        return self.metrics.stats()
+
+def _http_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+def _http_timeout():
+    import httpx
+
+    return httpx.Timeout(LLM_REQUEST_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+def create_llm_client() -> LLMClient:
+    """Build the pooled, rate-limited OpenRouter client from settings"""
+    if not OPENROUTER_API_KEY:
+        raise ValueError("OPENROUTER_API_KEY not found in .env file")
+
+    import httpx
+    from langchain_openai import ChatOpenAI
+
+    from .llm_cache import get_llm_cache
+
+    metrics = LLMMetrics()
+    rate_limiter = TokenBucketRateLimiter(LLM_REQUESTS_PER_SECOND, LLM_BURST, metrics)
+    http_client = httpx.Client(limits=_http_limits(), timeout=_http_timeout())
+
+    def build_model(async_client: Optional["httpx.AsyncClient"] = None) -> ChatOpenAI:
+        return ChatOpenAI(
+            model=LLM_MODEL,
+            base_url=LLM_BASE_URL,
+            api_key=OPENROUTER_API_KEY,
+            default_headers=LLM_DEFAULT_HEADERS,
+            timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+            max_retries=0,  # LLMClient owns retries
+            http_client=http_client,
+            http_async_client=async_client,
+            rate_limiter=rate_limiter,
+            cache=get_llm_cache() or False,
+        )
+
+    return LLMClient(
+        build_model(),
+        async_model_factory=lambda: build_model(httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout())),
+        metrics=metrics,
+        json_mode=LLM_JSON_MODE,
+    )
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+def get_llm() -> LLMClient:
+    """Process-wide LLM client, built on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_llm_client()
+        return _client
+
+def set_llm(model: Any) -> LLMClient:
+    """Replace the shared client, e.g. with a fake chat model in tests and benchmarks"""
+    global _client
+    with _client_lock:
+        _client = model if isinstance(model, LLMClient) else LLMClient(model)
+        return _client
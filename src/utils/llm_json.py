@@ -0,0 +1,189 @@
+"""Schema-validated JSON extraction from LLM output
+
+Agents ask the model for one JSON object. Replies may wrap it in a markdown
+fence, surround it with prose or stop short of it, so extraction:
+
+- finds the first balanced ``{...}`` in one pass: ``JSONDecoder.raw_decode``
+  for a complete reply, or ``JSONObjectScanner`` while a reply is streaming,
+  which reports the object as soon as its closing brace arrives so the rest
+  of the stream never has to be read
+- validates it against the calling agent's ``JSONSchema``, coercing
+  near-misses ("45.67" or "$45.67" for a float, "92%" for an int, a single
+  string for a list) and raising ``LLMOutputError`` for anything else, so a
+  bad reply is re-asked by the client instead of surfacing later as a
+  ``KeyError`` in the agent
+"""
+
+import copy
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+_DECODER = json.JSONDecoder()
+_SCAN = re.compile(r'[{}"\\]')
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?|-?\.\d+")
+
+class LLMOutputError(ValueError):
+    """LLM output holding no JSON object, or one that fails its schema"""
+
+def _decode_from(text: str, start: int) -> Optional[Dict[str, Any]]:
+    """The first JSON object starting at or after ``start``, or None"""
+    index = text.find("{", start)
+    while index != -1:
+        try:
+            value, _ = _DECODER.raw_decode(text, index)
+        except json.JSONDecodeError:
+            index = text.find("{", index + 1)
+            continue
+        if isinstance(value, dict):
+            return value
+        index = text.find("{", index + 1)
+    return None
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """First JSON object in ``text``; raises LLMOutputError if there is none"""
+    value = _decode_from(text, 0)
+    if value is None:
+        raise LLMOutputError(f"No JSON object in LLM output: {text[:200]!r}")
+    return value
+
+class JSONObjectScanner:
+    """Incremental brace-balanced scanner for the first JSON object in a stream of text chunks"""
+
+    def __init__(self):
+        self.text = ""
+        self.result: Optional[Dict[str, Any]] = None
+        self._pos = 0  # Next character to scan
+        self._start = -1  # Opening brace of the current candidate
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add a chunk; returns the object once its closing brace has arrived"""
+        if self.result is not None:
+            return self.result
+        self.text += chunk
+        text = self.text
+        while True:
+            match = _SCAN.search(text, self._pos)
+            if match is None:
+                self._pos = len(text)
+                return None
+            char, self._pos = match.group(), match.end()
+            if self._in_string:
+                if char == "\\":
+                    if self._pos >= len(text):
+                        # The escaped character has not arrived yet
+                        self._pos -= 1
+                        return None
+                    self._pos += 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._start != -1
+            elif char == "{":
+                if self._start == -1:
+                    self._start = self._pos - 1
+                self._depth += 1
+            elif char == "}" and self._start != -1:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads(text[self._start:self._pos])
+                    except json.JSONDecodeError:
+                        # Not JSON after all (e.g. braces in prose); look for the next object
+                        self._pos, self._start = self._start + 1, -1
+                        continue
+                    if isinstance(value, dict):
+                        self.result = value
+                        return value
+                    self._start = -1
+
+    def finish(self) -> Dict[str, Any]:
+        """The object found so far; raises LLMOutputError if the stream ended without one"""
+        if self.result is not None:
+            return self.result
+        return parse_json_object(self.text)
+
+def first_json_object(chunks: Iterable[str]) -> Dict[str, Any]:
+    """Consume ``chunks`` only until the first JSON object closes"""
+    scanner = JSONObjectScanner()
+    for chunk in chunks:
+        value = scanner.feed(chunk)
+        if value is not None:
+            return value
+    return scanner.finish()
+
+def _to_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError("expected a number, got a boolean")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match:
+            return float(match.group().replace(",", ""))
+    raise ValueError(f"expected a number, got {value!r}")
+
+def _to_int(value: Any) -> int:
+    return int(round(_to_number(value)))
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"expected a string, got {type(value).__name__}")
+    return str(value).strip()
+
+def _to_str_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value.strip()] if value.strip() else []
+    if isinstance(value, (list, tuple)):
+        return [_to_str(item) for item in value if item not in (None, "")]
+    raise ValueError(f"expected a list of strings, got {value!r}")
+
+_COERCERS = {float: _to_number, int: _to_int, str: _to_str, list: _to_str_list}
+
+@dataclass(frozen=True)
+class SchemaField:
+    """Expected type of one key; ``list`` means a list of strings"""
+    kind: type
+    required: bool = False
+    default: Any = None  # Copied into each result, so a mutable default is never shared
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+@dataclass(frozen=True)
+class JSONSchema:
+    """Keys an agent expects in the model's JSON reply"""
+    name: str
+    fields: Dict[str, SchemaField]
+
+    def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerced copy of ``data`` holding only the schema's keys; raises LLMOutputError listing every problem"""
+        result: Dict[str, Any] = {}
+        problems = []
+        for key, spec in self.fields.items():
+            value = data.get(key)
+            if value is None or value == "":
+                if spec.required:
+                    problems.append(f"{key} is missing")
+                elif spec.default is not None or key in data:
+                    result[key] = copy.copy(spec.default)
+                continue
+            try:
+                value = _COERCERS[spec.kind](value)
+            except ValueError as error:
+                problems.append(f"{key}: {error}")
+                continue
+            if spec.minimum is not None and value < spec.minimum or spec.maximum is not None and value > spec.maximum:
+                problems.append(f"{key}: {value} outside [{spec.minimum}, {spec.maximum}]")
+                continue
+            result[key] = value
+        if problems:
+            raise LLMOutputError(f"{self.name} reply failed validation: {'; '.join(problems)}")
+        return result
+
+def parse_llm_json(text: str, schema: Optional[JSONSchema] = None) -> Dict[str, Any]:
+    """First JSON object in ``text``, validated against ``schema`` when given"""
+    value = parse_json_object(text)
+    return schema.validate(value) if schema is not None else value
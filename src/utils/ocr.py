@@ -0,0 +1,65 @@
+"""OCR helpers shared by the receipt processor and the batch ingestion engine"""
+
+import logging
+import time
+from typing import Optional, Sequence
+
+import pytesseract
+from PIL import Image
+
+from ..config.settings import OCR_PREPROCESS_ENABLED, TESSERACT_CMD
+from .image_preprocessing import preprocess_for_ocr
+from .telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Configure pytesseract to use the correct path
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+# Text used when Tesseract is unavailable so the demo flow keeps working
+MOCK_OCR_TEXT = """
+        UBER RECEIPT
+        Date: 2025-10-30
+        Amount: $45.67
+        Merchant: Uber
+        Pickup: Downtown Office
+        Dropoff: Airport Terminal 3
+        """
+
+def prepare_image(
+    image: Image.Image,
+    preprocess: bool = OCR_PREPROCESS_ENABLED,
+    steps: Optional[Sequence[str]] = None,
+) -> Image.Image:
+    """Apply the OpenCV preprocessing pipeline (``steps``, default the full photo pipeline), keeping the original image if it fails"""
+    if not preprocess:
+        return image
+    try:
+        return preprocess_for_ocr(image) if steps is None else preprocess_for_ocr(image, steps)
+    except Exception as e:
+        logger.warning("Image preprocessing failed, using original image: %s", e)
+        return image
+
+def extract_text(
+    image: Image.Image,
+    preprocess: bool = OCR_PREPROCESS_ENABLED,
+    steps: Optional[Sequence[str]] = None,
+) -> str:
+    """Run Tesseract on an image; raises if OCR fails"""
+    return pytesseract.image_to_string(prepare_image(image, preprocess, steps))
+
+def run_ocr(image: Image.Image, steps: Optional[Sequence[str]] = None) -> str:
+    """Run Tesseract on the receipt image, falling back to mock text on failure"""
+    start = time.perf_counter()
+    try:
+        # Use pytesseract for text extraction
+        text = extract_text(image, steps=steps)
+        source = "tesseract"
+        logger.debug("OCR extracted %d characters: %r", len(text), text[:200])
+    except Exception as e:
+        # Fallback: Use mock OCR data if Tesseract fails
+        logger.warning("Tesseract failed, using mock OCR data: %s", e)
+        text = MOCK_OCR_TEXT
+        source = "fallback"
+    get_telemetry().record_ocr(time.perf_counter() - start, source)
+    return text
@@ -0,0 +1,306 @@
+"""Content-addressed OCR cache with duplicate-receipt detection
+
+Every receipt image is fingerprinted twice:
+
+- ``sha256`` of the decoded pixels: an exact repeat (Streamlit rerun,
+  resubmission, re-saved file) reuses the cached OCR text and skips Tesseract
+- a 256-bit difference hash (dHash): survives resizing and re-compression,
+  so a re-encoded copy of a known receipt is found as a near duplicate
+
+Receipts printed from one template (two Uber trips, say) are perceptually
+almost identical, so a dHash match alone is never trusted. The image is still
+OCR'd and the match only counts when the text agrees, including every number
+on the receipt.
+
+Each entry also records the preprocessing pipeline its text came from; after
+``OCR_PREPROCESS_STEPS`` (or ``OCR_PREPROCESS_ENABLED``, ``OCR_TARGET_DPI``)
+changes, a cached image is OCR'd again and its text replaced, while its
+fingerprint and first submitter are kept.
+
+Entries live in SQLite and are trimmed to ``OCR_CACHE_MAX_ENTRIES`` by least
+recent access. Each entry remembers the claim (thread) that first submitted
+it, so a match from a different claim is reported as a duplicate.
+"""
+
+import difflib
+import hashlib
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ..config.settings import (
+    DUPLICATE_TEXT_SIMILARITY,
+    OCR_CACHE_ENABLED,
+    OCR_CACHE_MAX_ENTRIES,
+    OCR_CACHE_PATH,
+    OCR_CACHE_PHASH_DISTANCE,
+    OCR_PREPROCESS_ENABLED,
+    OCR_PREPROCESS_STEPS,
+    OCR_TARGET_DPI,
+)
+from .ocr import MOCK_OCR_TEXT, run_ocr
+from .telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+_HASH_SIZE = 16  # dHash grid; 16x16 comparisons = 256 bits
+_NUMBERS = re.compile(r"\d+(?:[.,:/-]\d+)*")
+
+class ReceiptFingerprint(NamedTuple):
+    """Exact and perceptual hashes of a receipt image"""
+    sha256: str
+    phash: int
+
+class OCRCacheEntry(NamedTuple):
+    """A cached OCR result and the claim that first submitted the image"""
+    sha256: str
+    phash: int
+    text: str
+    thread_id: Optional[str]
+    employee_id: Optional[str]
+    first_seen: float
+    pipeline: str
+
+def difference_hash(image: Image.Image, size: int = _HASH_SIZE) -> int:
+    """Perceptual hash: sign of horizontal brightness gradients on a small grayscale copy"""
+    pixels = np.asarray(image.convert("L").resize((size + 1, size), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def fingerprint_image(image: Image.Image) -> ReceiptFingerprint:
+    """Hash the decoded pixels, so the same picture in another container still matches"""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return ReceiptFingerprint(digest.hexdigest(), difference_hash(image))
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def pipeline_key(steps: Optional[Sequence[str]] = None) -> str:
+    """The preprocessing a cached text was produced with; ``steps`` as passed to ``run_ocr``"""
+    if not OCR_PREPROCESS_ENABLED:
+        return "raw"
+    return f"{','.join(OCR_PREPROCESS_STEPS if steps is None else steps)}@{OCR_TARGET_DPI}dpi"
+
+def texts_match(a: str, b: str, min_similarity: float = DUPLICATE_TEXT_SIMILARITY) -> bool:
+    """True when two OCR texts read as the same receipt
+
+    Numbers (amounts, dates, times, transaction IDs) must agree exactly; the
+    remaining text only needs to be similar to tolerate OCR noise.
+    """
+    if _NUMBERS.findall(a) != _NUMBERS.findall(b):
+        return False
+    normalized_a, normalized_b = " ".join(a.lower().split()), " ".join(b.lower().split())
+    return difflib.SequenceMatcher(None, normalized_a, normalized_b).ratio() >= min_similarity
+
+class OCRCache:
+    """SQLite-backed OCR results keyed by content hash, with LRU eviction"""
+
+    def __init__(
+        self,
+        path: str = OCR_CACHE_PATH,
+        max_entries: int = OCR_CACHE_MAX_ENTRIES,
+        phash_distance: int = OCR_CACHE_PHASH_DISTANCE,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.phash_distance = phash_distance
+        self._lock = threading.Lock()
+        self.counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            "sha256 TEXT PRIMARY KEY, phash TEXT NOT NULL, text TEXT NOT NULL, thread_id TEXT, "
+            "employee_id TEXT, first_seen REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ocr_cache)")}
+        if "pipeline" not in columns:
+            # Rows from before the pipeline was recorded are re-OCR'd on their next hit
+            self._conn.execute("ALTER TABLE ocr_cache ADD COLUMN pipeline TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_access ON ocr_cache (last_access)")
+        self._conn.commit()
+
+        # Perceptual hashes are scanned in memory; the rows stay on disk
+        self._phashes: Dict[str, int] = {}
+        self._last_rowid = 0
+        self._load_new_locked()
+
+    def _load_new_locked(self) -> None:
+        """Pick up perceptual hashes written since the last scan, e.g. by batch OCR worker processes"""
+        for rowid, sha256, phash in self._conn.execute(
+            "SELECT rowid, sha256, phash FROM ocr_cache WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)
+        ):
+            self._phashes[sha256] = int(phash, 16)
+            self._last_rowid = rowid
+
+    def _row_to_entry(self, row: Tuple) -> OCRCacheEntry:
+        sha256, phash, text, thread_id, employee_id, first_seen, pipeline = row
+        return OCRCacheEntry(sha256, int(phash, 16), text, thread_id, employee_id, first_seen, pipeline)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def get(self, sha256: str) -> Optional[OCRCacheEntry]:
+        """Exact lookup; refreshes the entry's LRU position"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, phash, text, thread_id, employee_id, first_seen, pipeline FROM ocr_cache WHERE sha256 = ?",
+                (sha256,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE ocr_cache SET last_access = ? WHERE sha256 = ?", (time.time(), sha256))
+            self._conn.commit()
+            return self._row_to_entry(row)
+
+    def similar(self, phash: int, exclude: Optional[str] = None) -> List[Tuple[int, OCRCacheEntry]]:
+        """Entries whose perceptual hash is within ``phash_distance``, closest first"""
+        with self._lock:
+            self._load_new_locked()
+            close = sorted(
+                (hamming_distance(phash, other), sha256)
+                for sha256, other in self._phashes.items()
+                if sha256 != exclude and hamming_distance(phash, other) <= self.phash_distance
+            )
+            results = []
+            for distance, sha256 in close:
+                row = self._conn.execute(
+                    "SELECT sha256, phash, text, thread_id, employee_id, first_seen, pipeline FROM ocr_cache WHERE sha256 = ?",
+                    (sha256,),
+                ).fetchone()
+                if row is not None:
+                    results.append((distance, self._row_to_entry(row)))
+            return results
+
+    def put(
+        self,
+        fingerprint: ReceiptFingerprint,
+        text: str,
+        thread_id: Optional[str] = None,
+        employee_id: Optional[str] = None,
+        pipeline: str = "",
+    ) -> None:
+        """Store an OCR result; the first submitter of an image is kept, its text and pipeline are replaced"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ocr_cache (sha256, phash, text, thread_id, employee_id, first_seen, last_access, pipeline) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET text = excluded.text, pipeline = excluded.pipeline, "
+                "last_access = excluded.last_access",
+                (fingerprint.sha256, format(fingerprint.phash, "x"), text, thread_id, employee_id, now, now, pipeline),
+            )
+            self._phashes[fingerprint.sha256] = fingerprint.phash
+            self.counters["writes"] += 1
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        """Drop the least recently accessed rows over the size limit"""
+        overflow = len(self._phashes) - self.max_entries
+        if overflow <= 0:
+            return
+        evicted = [
+            sha256 for (sha256,) in self._conn.execute(
+                "SELECT sha256 FROM ocr_cache ORDER BY last_access LIMIT ?", (overflow,)
+            )
+        ]
+        self._conn.executemany("DELETE FROM ocr_cache WHERE sha256 = ?", [(sha256,) for sha256 in evicted])
+        for sha256 in evicted:
+            self._phashes.pop(sha256, None)
+        self.counters["evictions"] += len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._phashes.clear()
+            self._conn.execute("DELETE FROM ocr_cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the number of cached receipts"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._phashes)
+        lookups = stats["exact_hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["exact_hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+def _duplicate_info(entry: OCRCacheEntry, match: str, distance: int) -> Dict[str, Any]:
+    return {
+        "match": match,
+        "receipt_hash": entry.sha256,
+        "distance": distance,
+        "thread_id": entry.thread_id,
+        "employee_id": entry.employee_id,
+        "first_seen": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(entry.first_seen)),
+    }
+
+def cached_ocr(
+    image: Image.Image,
+    thread_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    cache: Optional[OCRCache] = None,
+    steps: Optional[Sequence[str]] = None,
+) -> Tuple[str, ReceiptFingerprint, Optional[Dict[str, Any]]]:
+    """OCR ``image`` through the cache; ``steps`` overrides the preprocessing pipeline
+
+    Returns ``(text, fingerprint, duplicate)``. ``duplicate`` describes the
+    earlier submission when this image (exactly, or a re-encoded copy) was
+    already submitted by another claim, else None.
+    """
+    start = time.perf_counter()
+    cache = cache or get_ocr_cache()
+    fingerprint = fingerprint_image(image)
+    if cache is None:
+        return run_ocr(image, steps), fingerprint, None
+
+    pipeline = pipeline_key(steps)
+    entry = cache.get(fingerprint.sha256)
+    duplicate = _duplicate_info(entry, "exact", 0) if entry is not None and entry.thread_id != thread_id else None
+    if entry is not None and entry.pipeline == pipeline:
+        logger.debug("OCR cache hit (exact) for %s", fingerprint.sha256[:12])
+        cache.increment("exact_hits")
+        get_telemetry().record_ocr(time.perf_counter() - start, "cache")
+        return entry.text, fingerprint, duplicate
+
+    # A miss, or an image cached under other preprocessing: same receipt, stale text
+    cache.increment("misses")
+    text = run_ocr(image, steps)
+    if text == MOCK_OCR_TEXT:
+        # Tesseract failed; do not pin the placeholder to this image
+        return text, fingerprint, duplicate
+
+    if entry is None:
+        for distance, candidate in cache.similar(fingerprint.phash, exclude=fingerprint.sha256):
+            if candidate.thread_id != thread_id and texts_match(text, candidate.text):
+                cache.increment("near_hits")
+                duplicate = _duplicate_info(candidate, "near", distance)
+                break
+    cache.put(fingerprint, text, thread_id, employee_id, pipeline)
+    return text, fingerprint, duplicate
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Process-wide OCR cache, or None when OCR_CACHE_ENABLED is off"""
+    global _cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
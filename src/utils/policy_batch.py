@@ -0,0 +1,274 @@
+"""Vectorized policy evaluation for re-scoring historical claims
+
+``evaluate_policy_batch`` applies the same decision as
+``PolicyTable.evaluate`` to whole columns of claims in one NumPy pass:
+
+- text columns (country, department, category, currency, dates) are
+  factorized, so each distinct value is normalized or parsed once
+- rows are grouped by lookup key; each key's rule intervals are searched for
+  all of its rows at once with ``np.searchsorted``, most specific key first
+- amounts are converted to each matched rule's currency with vectorized FX
+  rates, rounded to cents and compared against the rule threshold
+
+Usage (re-score a batch results file against the current rules):
+    python -m src.utils.policy_batch batch_results.jsonl --output rescored.jsonl
+
+Re-scoring only replays the threshold. Records that carry ``violations``
+(duplicates, outliers) or ``cap_breaches`` stay with a manager whatever the
+new threshold says, and are counted separately.
+"""
+
+import argparse
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config.settings import DEFAULT_EXPENSE_CATEGORY, ESCALATING_VIOLATION_SEVERITIES, POLICY_RULES_PATH
+from .policy_rules import PolicyRule, PolicyTable, get_policy_table, lookup_keys, normalize_expense_date
+
+AUTO_APPROVED = "auto_approved"
+REQUIRES_MANAGER = "requires_manager"
+
+@dataclass
+class BatchPolicyResult:
+    """Per-row outcome of a batch evaluation"""
+    approval_status: np.ndarray  # "auto_approved" or "requires_manager"
+    rule_index: np.ndarray  # index into ``rules``, -1 when no rule covers the row
+    amount_in_rule_currency: np.ndarray  # NaN when there is no rule, amount or exchange rate
+    threshold: np.ndarray  # matched rule's threshold in its currency, NaN when unmatched
+    rules: List[PolicyRule]
+
+    def __len__(self) -> int:
+        return len(self.approval_status)
+
+    @property
+    def auto_approved(self) -> np.ndarray:
+        return self.approval_status == AUTO_APPROVED
+
+    def rule_ids(self) -> np.ndarray:
+        """Matched rule id per row (None when unmatched)"""
+        ids = np.array([rule.id for rule in self.rules] + [None], dtype=object)
+        return ids[self.rule_index]
+
+    def applied_rule(self, row: int) -> Dict[str, Any]:
+        """One row's rule in the shape of ExpenseState.applied_rule (without the reason)"""
+        index = int(self.rule_index[row])
+        applied = self.rules[index].to_dict() if index >= 0 else {"id": None}
+        amount = float(self.amount_in_rule_currency[row])
+        applied["amount_in_rule_currency"] = None if np.isnan(amount) else amount
+        return applied
+
+    def summary(self) -> Dict[str, int]:
+        """Row counts per approval status and per matched rule"""
+        statuses, status_counts = np.unique(self.approval_status, return_counts=True)
+        indices, rule_counts = np.unique(self.rule_index, return_counts=True)
+        summary = {str(status): int(count) for status, count in zip(statuses, status_counts)}
+        for index, count in zip(indices, rule_counts):
+            summary[f"rule:{self.rules[index].id if index >= 0 else None}"] = int(count)
+        return summary
+
+def _factorize(values: Any, size: int, transform: Callable[[Optional[str]], Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Row codes into a list of ``transform``ed distinct values; a scalar applies to every row"""
+    if values is None or isinstance(values, str):
+        return np.zeros(size, dtype=np.intp), [transform(values)]
+    # A dict pass over the column beats sorting a million strings with np.unique
+    index: Dict[Any, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(value, len(index)) for value in np.asarray(values).tolist()), dtype=np.intp, count=size
+    )
+    # Missing values (None, NaN, "") reach ``transform`` as None
+    return codes, [transform(None if value is None or value != value or value == "" else str(value)) for value in index]
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """Round like the builtin ``round(value, 2)``, which resolves near-ties exactly"""
+    rounded = np.round(values, 2)
+    with np.errstate(invalid="ignore"):
+        near_tie = np.abs(values * 100 - np.floor(values * 100) - 0.5) < 1e-6
+    for row in np.flatnonzero(near_tie):
+        rounded[row] = round(float(values[row]), 2)
+    return rounded
+
+def _as_amounts(amounts: Any) -> np.ndarray:
+    array = np.asarray(amounts)
+    if array.dtype == object:
+        array = np.array([np.nan if value is None else float(value) for value in array])
+    return array.astype(np.float64, copy=False)
+
+def _as_dates(dates: Any, size: int) -> np.ndarray:
+    """Dates as datetime64[D]; missing or unparseable dates become NaT"""
+    array = np.asarray(dates) if dates is not None and not isinstance(dates, str) else None
+    if array is not None and np.issubdtype(array.dtype, np.datetime64):
+        return array.astype("datetime64[D]")
+
+    def parse(value: Optional[str]) -> np.datetime64:
+        iso = normalize_expense_date(value)
+        try:
+            return np.datetime64(iso, "D") if iso else np.datetime64("NaT", "D")
+        except ValueError:
+            return np.datetime64("NaT", "D")
+
+    codes, parsed = _factorize(dates, size, parse)
+    return np.array(parsed, dtype="datetime64[D]")[codes]
+
+class _CompiledTable:
+    """PolicyTable intervals as NumPy arrays, grouped by lookup key"""
+
+    def __init__(self, table: PolicyTable):
+        self.rules = table.rules
+        self.key_ids: Dict[Tuple[str, str, str], int] = {}
+        self.starts: List[np.ndarray] = []
+        self.ends: List[np.ndarray] = []
+        self.indices: List[np.ndarray] = []
+
+        grouped: Dict[Tuple[str, str, str], List[int]] = {}
+        for index, rule in enumerate(self.rules):
+            grouped.setdefault(rule.key, []).append(index)
+        for key, indices in grouped.items():
+            indices.sort(key=lambda index: self.rules[index].effective_from)
+            self.key_ids[key] = len(self.starts)
+            self.starts.append(np.array([self.rules[i].effective_from for i in indices], dtype="datetime64[D]"))
+            self.ends.append(np.array([self.rules[i].effective_to or "9999-12-31" for i in indices], dtype="datetime64[D]"))
+            self.indices.append(np.array(indices, dtype=np.intp))
+
+        # Trailing sentinel so that rule_index -1 gathers NaN
+        self.thresholds = np.array([rule.threshold for rule in self.rules] + [np.nan])
+        self.rates_to_usd = np.array(
+            [table.fx_rates_to_usd.get(rule.currency.upper(), np.nan) for rule in self.rules] + [np.nan]
+        )
+
+def evaluate_policy_batch(
+    amounts: Any,
+    expense_dates: Any,
+    currencies: Any = None,
+    countries: Any = None,
+    departments: Any = None,
+    categories: Any = DEFAULT_EXPENSE_CATEGORY,
+    table: Optional[PolicyTable] = None,
+) -> BatchPolicyResult:
+    """Evaluate many claims at once; matches ``PolicyTable.evaluate`` row for row
+
+    Every argument is a column (list or array) of equal length, or a scalar
+    applied to all rows. Dates may be strings or a datetime64 array.
+    """
+    table = table or get_policy_table()
+    compiled = _CompiledTable(table)
+    amounts = _as_amounts(amounts)
+    size = len(amounts)
+    dates = _as_dates(expense_dates, size)
+
+    # One code per distinct (country, department, category) combination
+    country_codes, country_values = _factorize(countries, size, lambda value: value)
+    department_codes, department_values = _factorize(departments, size, lambda value: value)
+    category_codes, category_values = _factorize(categories, size, lambda value: value)
+    combined = (country_codes * len(department_values) + department_codes) * len(category_values) + category_codes
+    combos = np.flatnonzero(np.bincount(combined))
+    combo_lookup = np.full(combined.max() + 1 if size else 0, -1, dtype=np.intp)
+    combo_lookup[combos] = np.arange(len(combos))
+    combo_codes = combo_lookup[combined]
+
+    # key_levels[level, combo]: compiled key id of the combo's level-th most specific key, or -1
+    combo_keys = []
+    for combo in combos:
+        combo, category = divmod(int(combo), len(category_values))
+        country, department = divmod(combo, len(department_values))
+        keys = lookup_keys(country_values[country], department_values[department], category_values[category])
+        combo_keys.append([compiled.key_ids.get(key, -1) for key in keys])
+    levels = max(len(keys) for keys in combo_keys) if combo_keys else 0
+    key_levels = np.full((levels, len(combos)), -1, dtype=np.intp)
+    for combo, keys in enumerate(combo_keys):
+        key_levels[:len(keys), combo] = keys
+
+    rule_index = np.full(size, -1, dtype=np.intp)
+    unresolved = ~np.isnat(dates)
+    for level in range(levels):
+        row_keys = key_levels[level][combo_codes]
+        for key_id in np.unique(key_levels[level]):
+            if key_id < 0:
+                continue
+            rows = np.flatnonzero(unresolved & (row_keys == key_id))
+            if not len(rows):
+                continue
+            row_dates = dates[rows]
+            position = np.searchsorted(compiled.starts[key_id], row_dates, side="right") - 1
+            covered = position >= 0
+            position = np.maximum(position, 0)
+            covered &= row_dates < compiled.ends[key_id][position]
+            rule_index[rows[covered]] = compiled.indices[key_id][position[covered]]
+            unresolved[rows[covered]] = False
+
+    currency_codes, from_rates = _factorize(
+        currencies, size, lambda value: table.fx_rates_to_usd.get((value or "USD").upper(), np.nan)
+    )
+    converted = _round_cents(amounts * np.array(from_rates)[currency_codes] / compiled.rates_to_usd[rule_index])
+    threshold = compiled.thresholds[rule_index]
+    with np.errstate(invalid="ignore"):
+        auto = (rule_index >= 0) & (converted <= threshold)
+    return BatchPolicyResult(
+        approval_status=np.where(auto, AUTO_APPROVED, REQUIRES_MANAGER),
+        rule_index=rule_index,
+        amount_in_rule_currency=np.where(rule_index >= 0, converted, np.nan),
+        threshold=threshold,
+        rules=compiled.rules,
+    )
+
+def rescore_records(records: Iterable[Dict[str, Any]], table: Optional[PolicyTable] = None) -> BatchPolicyResult:
+    """Evaluate claim records (e.g. batch ingestion results) against ``table``"""
+    records = list(records)
+
+    def column(name: str) -> List[Any]:
+        return [record.get(name) for record in records]
+
+    return evaluate_policy_batch(
+        column("amount"),
+        column("expense_date"),
+        currencies=column("currency"),
+        countries=column("country"),
+        departments=column("department"),
+        categories=[record.get("expense_category") or DEFAULT_EXPENSE_CATEGORY for record in records],
+        table=table,
+    )
+
+def held_for_review(records: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Rows sent to a manager for reasons other than the threshold (high-severity violations or spend-cap breaches)"""
+    return np.array([
+        bool(record.get("cap_breaches"))
+        or any(violation.get("severity") in ESCALATING_VIOLATION_SEVERITIES for violation in record.get("violations") or ())
+        for record in records
+    ], dtype=bool)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Re-score processed claims against the current policy rules")
+    parser.add_argument("results", help="JSONL claim records, e.g. the output of python -m src.batch")
+    parser.add_argument("--rules", default=POLICY_RULES_PATH, help="Policy rules file")
+    parser.add_argument("--output", "-o", help="Write each record with its new approval status to this JSONL file")
+    args = parser.parse_args(argv)
+
+    with open(args.results, "r") as f:
+        records = [record for record in map(json.loads, filter(str.strip, f)) if record.get("status", "completed") == "completed"]
+    result = rescore_records(records, PolicyTable.from_file(args.rules))
+
+    held = held_for_review(records)
+    result.approval_status = np.where(held, REQUIRES_MANAGER, result.approval_status)
+    previous = np.array([record.get("approval_status") or "" for record in records])
+    changed = int(np.count_nonzero(previous != result.approval_status))
+    print(f"=== POLICY RE-SCORE: {len(records)} claims ===")
+    print(f"Decisions changed: {changed}")
+    print(f"Kept with a manager for violations or spend caps: {int(np.count_nonzero(held))}")
+    print(json.dumps(result.summary(), indent=2))
+
+    if args.output:
+        rule_ids = result.rule_ids()
+        with open(args.output, "w") as f:
+            for row, record in enumerate(records):
+                record = dict(record, previous_approval_status=record.get("approval_status"))
+                record["approval_status"] = str(result.approval_status[row])
+                record["applied_rule_id"] = rule_ids[row]
+                f.write(json.dumps(record) + "\n")
+        print(f"Re-scored records written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
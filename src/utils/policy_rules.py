@@ -0,0 +1,204 @@
+"""Effective-dated approval policy table
+
+Rules in ``src/config/policy_rules.json`` give an auto-approval threshold for
+a (country, department, expense category) key over a half-open date interval
+``[effective_from, effective_to)``; ``"*"`` matches anything. The table is
+compiled once into, per key, a sorted list of interval starts, so a lookup is
+at most eight dict probes (most specific key first) plus one bisect each.
+
+Countries are mapped to the gazetteer's canonical names on both sides
+("UK", "United Kingdom." and "united kingdom" hit the same rules). Amounts are
+converted to the rule's currency with the table's ``fx_rates_to_usd`` before
+comparing against the threshold.
+"""
+
+import bisect
+import json
+import re
+import threading
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config.settings import DEFAULT_EXPENSE_CATEGORY, POLICY_RULES_PATH
+from .gazetteer import get_gazetteer
+
+WILDCARD = "*"
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# Sorts after every real date, so open-ended intervals never end
+_OPEN_END = "9999-12-31"
+
+@dataclass(frozen=True)
+class PolicyRule:
+    """One effective-dated threshold"""
+    id: str
+    country: str
+    department: str
+    category: str
+    effective_from: str
+    effective_to: Optional[str]
+    threshold: float
+    currency: str
+    description: str = ""
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return (_normalize(canonical_country(self.country)), _normalize(self.department), _normalize(self.category))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass(frozen=True)
+class PolicyDecision:
+    """Outcome of evaluating one claim against the table"""
+    approval_status: str  # "auto_approved" or "requires_manager"
+    rule: Optional[PolicyRule]
+    amount_in_rule_currency: Optional[float]
+    reason: str
+
+    def applied_rule(self) -> Dict[str, Any]:
+        """The matched rule as recorded in ExpenseState.applied_rule"""
+        applied = self.rule.to_dict() if self.rule else {"id": None}
+        applied["amount_in_rule_currency"] = self.amount_in_rule_currency
+        applied["reason"] = self.reason
+        return applied
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or WILDCARD).strip().casefold() or WILDCARD
+
+def canonical_country(country: Optional[str]) -> Optional[str]:
+    """Country as named in the gazetteer ("UK" -> "United Kingdom"); unknown names are kept as given"""
+    if not country or country.strip() == WILDCARD:
+        return country
+    return get_gazetteer().canonical_country(country) or country
+
+def normalize_expense_date(expense_date: Optional[str]) -> Optional[str]:
+    """ISO date string for lookups, or None when the date is missing, unparseable or not a real date"""
+    if not expense_date:
+        return None
+    expense_date = str(expense_date).strip()
+    if _ISO_DATE.match(expense_date):
+        try:
+            date.fromisoformat(expense_date)
+        except ValueError:
+            return None
+        return expense_date
+    from .receipt_parsers import normalize_date
+    return normalize_date(expense_date)
+
+def lookup_keys(country: Optional[str], department: Optional[str], category: Optional[str]) -> List[Tuple[str, str, str]]:
+    """Candidate keys from most to least specific (country beats department beats category)"""
+    countries = [_normalize(canonical_country(country)), WILDCARD]
+    departments = [_normalize(department), WILDCARD]
+    categories = [_normalize(category), WILDCARD]
+    keys = []
+    for c in countries:
+        for d in departments:
+            for g in categories:
+                key = (c, d, g)
+                if key not in keys:
+                    keys.append(key)
+    return keys
+
+class PolicyTable:
+    """Rules compiled into a per-key sorted interval index"""
+
+    def __init__(self, rules: Iterable[PolicyRule], fx_rates_to_usd: Dict[str, float]):
+        self.rules = list(rules)
+        self.fx_rates_to_usd = {code.upper(): float(rate) for code, rate in fx_rates_to_usd.items()}
+        self._starts: Dict[Tuple[str, str, str], List[str]] = {}
+        self._intervals: Dict[Tuple[str, str, str], List[PolicyRule]] = {}
+
+        grouped: Dict[Tuple[str, str, str], List[PolicyRule]] = {}
+        for rule in self.rules:
+            grouped.setdefault(rule.key, []).append(rule)
+        for key, rules in grouped.items():
+            rules.sort(key=lambda rule: rule.effective_from)
+            for previous, current in zip(rules, rules[1:]):
+                if (previous.effective_to or _OPEN_END) > current.effective_from:
+                    raise ValueError(f"Policy rules {previous.id} and {current.id} overlap for {key}")
+            self._starts[key] = [rule.effective_from for rule in rules]
+            self._intervals[key] = rules
+
+    @classmethod
+    def from_file(cls, path: str = POLICY_RULES_PATH) -> "PolicyTable":
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls((PolicyRule(**rule) for rule in data["rules"]), data.get("fx_rates_to_usd", {"USD": 1.0}))
+
+    def _find_in_key(self, key: Tuple[str, str, str], expense_date: str) -> Optional[PolicyRule]:
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        index = bisect.bisect_right(starts, expense_date) - 1
+        if index < 0:
+            return None
+        rule = self._intervals[key][index]
+        return rule if expense_date < (rule.effective_to or _OPEN_END) else None
+
+    def find_rule(
+        self,
+        expense_date: Optional[str],
+        country: Optional[str] = None,
+        department: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> Optional[PolicyRule]:
+        """Most specific rule in force on ``expense_date``"""
+        expense_date = normalize_expense_date(expense_date)
+        if expense_date is None:
+            return None
+        for key in lookup_keys(country, department, category):
+            rule = self._find_in_key(key, expense_date)
+            if rule is not None:
+                return rule
+        return None
+
+    def convert(self, amount: float, from_currency: Optional[str], to_currency: str) -> Optional[float]:
+        """Convert via USD; None when either rate is unknown"""
+        from_rate = self.fx_rates_to_usd.get((from_currency or "USD").upper())
+        to_rate = self.fx_rates_to_usd.get(to_currency.upper())
+        if from_rate is None or to_rate is None:
+            return None
+        return amount * from_rate / to_rate
+
+    def evaluate(
+        self,
+        amount: Optional[float],
+        currency: Optional[str],
+        expense_date: Optional[str],
+        country: Optional[str] = None,
+        department: Optional[str] = None,
+        category: Optional[str] = DEFAULT_EXPENSE_CATEGORY,
+    ) -> PolicyDecision:
+        """Decide auto-approval; anything the table cannot judge goes to a manager"""
+        rule = self.find_rule(expense_date, country, department, category)
+        if rule is None:
+            return PolicyDecision("requires_manager", None, None, "No policy rule covers this claim's date")
+        if amount is None:
+            return PolicyDecision("requires_manager", rule, None, "Amount missing")
+        converted = self.convert(float(amount), currency, rule.currency)
+        if converted is None:
+            return PolicyDecision("requires_manager", rule, None, f"No exchange rate for {currency}")
+        converted = round(converted, 2)
+        if converted <= rule.threshold:
+            return PolicyDecision("auto_approved", rule, converted, f"Amount ≤ {rule.threshold} {rule.currency}")
+        return PolicyDecision("requires_manager", rule, converted, f"Amount > {rule.threshold} {rule.currency}")
+
+_table: Optional[PolicyTable] = None
+_table_lock = threading.Lock()
+
+def get_policy_table() -> PolicyTable:
+    """Process-wide policy table, compiled on first use"""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = PolicyTable.from_file()
+        return _table
+
+def reload_policy_table(path: str = POLICY_RULES_PATH) -> PolicyTable:
+    """Recompile the table after the rules file changes"""
+    global _table
+    table = PolicyTable.from_file(path)
+    with _table_lock:
+        _table = table
+    return table
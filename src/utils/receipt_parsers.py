@@ -0,0 +1,182 @@
+"""Deterministic template parsers for common ride receipts
+
+Uber, Lyft and taxi receipts are laid out as labelled lines ("Date: ...",
+"Pickup: ...") under a merchant header. Each parser pairs a precompiled
+header pattern with field patterns and returns the same keys the LLM
+extraction prompt asks for, plus a confidence score. The receipt processor
+only falls back to the LLM when no parser produces every required field.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Match, Optional, Pattern, Set, Union
+
+_FLAGS = re.IGNORECASE | re.MULTILINE
+
+# Fields a template result must contain to skip the LLM
+REQUIRED_FIELDS = ["amount", "currency", "expense_date", "merchant", "pickup_location", "dropoff_location"]
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "₹": "INR"}
+
+_MONEY = r"(?P<currency>[$€£₹]|USD|EUR|GBP|INR)?\s*(?P<value>\d[\d,]*\.\d{2})"
+
+# Patterns shared by every ride template
+COMMON_PATTERNS: Dict[str, Pattern] = {
+    "amount": re.compile(rf"^\s*(?:amount|fare|trip fare)\s*:?\s*{_MONEY}", _FLAGS),
+    "total": re.compile(rf"^\s*total\s*:?\s*{_MONEY}", _FLAGS),
+    "expense_date": re.compile(r"^\s*date\s*:?\s*(?P<value>.+?)\s*$", _FLAGS),
+    "merchant": re.compile(r"^\s*merchant\s*:?\s*(?P<value>.+?)\s*$", _FLAGS),
+    "pickup_location": re.compile(r"^\s*(?:(?:pickup|pick-up|pick up)\s*:?|from\s*:)\s*(?P<value>.+?)\s*$", _FLAGS),
+    "dropoff_location": re.compile(r"^\s*(?:(?:dropoff|drop-off|drop off)\s*:?|to\s*:)\s*(?P<value>.+?)\s*$", _FLAGS),
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d.%m.%Y", "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y"]
+
+# Fields every claim in a document needs, whatever its layout (ride receipt, hotel folio, statement)
+DOCUMENT_REQUIRED_FIELDS = ["amount", "expense_date", "merchant"]
+
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+
+_WORD = re.compile(r"[a-z]{2}", re.IGNORECASE)
+
+# Layout-independent patterns: a money amount on a total-like line, and a date anywhere in a line
+GENERIC_PATTERNS: Dict[str, Pattern] = {
+    "amount": re.compile(rf"\b(?:amount|fare|total|amount due|grand total)\b[^\n\d$€£₹]*{_MONEY}", _FLAGS),
+    "expense_date": re.compile(
+        rf"\b(?:\d{{4}}-\d{{2}}-\d{{2}}|\d{{1,2}}[/.]\d{{1,2}}[/.]\d{{4}}|{_MONTH}\s+\d{{1,2}},?\s+\d{{4}}|\d{{1,2}}\s+{_MONTH}\s+\d{{4}})\b",
+        _FLAGS,
+    ),
+}
+
+def normalize_date(raw: str) -> Optional[str]:
+    """Convert a receipt date to YYYY-MM-DD, or None if unrecognised"""
+    raw = raw.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+@dataclass
+class ParseResult:
+    """Fields extracted by a template parser"""
+    parser: str
+    fields: Dict[str, object]
+    confidence: float
+
+    @property
+    def missing_fields(self) -> List[str]:
+        return [name for name in REQUIRED_FIELDS if self.fields.get(name) in (None, "")]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing_fields
+
+@dataclass
+class ReceiptParser:
+    """Template parser for one merchant layout
+
+    ``header`` identifies the layout; ``merchant`` is either a fixed name or a
+    callable deriving it from the header match. ``patterns`` override entries
+    in COMMON_PATTERNS for layouts that label fields differently.
+    """
+    name: str
+    header: Pattern
+    merchant: Union[str, Callable[[Match], str]]
+    patterns: Dict[str, Pattern] = field(default_factory=dict)
+
+    def _pattern(self, key: str) -> Pattern:
+        return self.patterns.get(key, COMMON_PATTERNS[key])
+
+    def parse(self, text: str) -> Optional[ParseResult]:
+        """Parse ``text`` or return None when the header does not match"""
+        header_match = self.header.search(text)
+        if not header_match:
+            return None
+
+        fields: Dict[str, object] = {}
+        confidence = 1.0
+
+        money = self._pattern("amount").search(text)
+        if not money:
+            # Some layouts only print a total
+            money = self._pattern("total").search(text)
+            confidence -= 0.1
+        if money:
+            fields["amount"] = float(money.group("value").replace(",", ""))
+            symbol = money.group("currency")
+            if symbol:
+                fields["currency"] = CURRENCY_SYMBOLS.get(symbol, symbol.upper())
+            else:
+                fields["currency"] = "USD"
+                confidence -= 0.1
+
+        date_match = self._pattern("expense_date").search(text)
+        if date_match:
+            fields["expense_date"] = normalize_date(date_match.group("value"))
+
+        merchant_match = self._pattern("merchant").search(text)
+        if merchant_match:
+            fields["merchant"] = merchant_match.group("value")
+        elif callable(self.merchant):
+            fields["merchant"] = self.merchant(header_match)
+        else:
+            fields["merchant"] = self.merchant
+
+        for key in ("pickup_location", "dropoff_location"):
+            match = self._pattern(key).search(text)
+            if match:
+                fields[key] = match.group("value")
+
+        result = ParseResult(parser=self.name, fields=fields, confidence=0.0)
+        found = len(REQUIRED_FIELDS) - len(result.missing_fields)
+        result.confidence = round(max(0.0, confidence) * found / len(REQUIRED_FIELDS), 3)
+        return result
+
+PARSERS: List[ReceiptParser] = [
+    ReceiptParser(name="uber", header=re.compile(r"\buber\b", _FLAGS), merchant="Uber"),
+    ReceiptParser(name="lyft", header=re.compile(r"\blyft\b", _FLAGS), merchant="Lyft"),
+    ReceiptParser(
+        name="taxi",
+        header=re.compile(r"^\s*(?P<name>[a-z][a-z ]*?\b(?:taxi|cab))\b", _FLAGS),
+        merchant=lambda match: match.group("name").strip().title(),
+    ),
+]
+
+def document_fields(text: str) -> Set[str]:
+    """DOCUMENT_REQUIRED_FIELDS present in ``text``, found without a template
+
+    The merchant is a "Merchant:" line, a known template header, or else a
+    line of text that is not a date, amount or route line (folios and
+    statements print the hotel's or provider's name above their entries).
+    """
+    found = {key for key, pattern in GENERIC_PATTERNS.items() if pattern.search(text)}
+    if COMMON_PATTERNS["merchant"].search(text) or any(parser.header.search(text) for parser in PARSERS):
+        found.add("merchant")
+    else:
+        field_patterns = [*COMMON_PATTERNS.values(), *GENERIC_PATTERNS.values()]
+        for line in text.splitlines():
+            if _WORD.search(line) and not any(pattern.search(line) for pattern in field_patterns):
+                found.add("merchant")
+                break
+    return found
+
+def register_parser(parser: ReceiptParser, first: bool = False) -> None:
+    """Add a parser to the registry; ``first`` gives it priority over the built-ins"""
+    if first:
+        PARSERS.insert(0, parser)
+    else:
+        PARSERS.append(parser)
+
+def parse_receipt_text(text: str) -> Optional[ParseResult]:
+    """Run the registered parsers and return the most confident result"""
+    best: Optional[ParseResult] = None
+    for parser in PARSERS:
+        result = parser.parse(text)
+        if result and (best is None or result.confidence > best.confidence):
+            best = result
+            if result.complete and result.confidence >= 1.0:
+                break
+    return best
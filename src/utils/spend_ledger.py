@@ -0,0 +1,238 @@
+"""Incrementally maintained spend totals for cap enforcement
+
+Finalized claims are appended to a SQLite ledger, and in the same transaction
+the matching running totals are incremented: one row per (scope, subject,
+period), where scope is ``employee`` or ``department`` and period is the
+claim's day (``D:2025-03-14``), ISO week by its Monday (``W:2025-03-10``) or
+month (``M:2025-03``). "Spent so far this period" is then a primary-key read,
+whatever the size of the ledger.
+
+Amounts are stored in USD cents, so totals stay exact and ``check`` can
+compare them against the ledger without tolerances.
+
+Usage:
+    python -m src.utils.spend_ledger check
+    python -m src.utils.spend_ledger rebuild
+    python -m src.utils.spend_ledger report --employee emp_42 --date 2025-03-14
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..config.settings import (
+    DEPARTMENT_SPEND_CAPS_USD,
+    EMPLOYEE_SPEND_CAPS_USD,
+    SPEND_LEDGER_ENABLED,
+    SPEND_LEDGER_PATH,
+)
+
+PERIODS = ("daily", "weekly", "monthly")
+SCOPES = ("employee", "department")
+
+def period_keys(expense_date: str) -> Dict[str, str]:
+    """Aggregate keys of the day, ISO week and month containing ``expense_date``"""
+    day = date.fromisoformat(expense_date)
+    monday = day - timedelta(days=day.weekday())
+    return {"daily": f"D:{day.isoformat()}", "weekly": f"W:{monday.isoformat()}", "monthly": f"M:{expense_date[:7]}"}
+
+# The same keys computed in SQL, for rebuilds and consistency checks
+_SQL_PERIOD_KEYS = {
+    "daily": "'D:' || expense_date",
+    "weekly": "'W:' || date(expense_date, 'weekday 0', '-6 days')",
+    "monthly": "'M:' || substr(expense_date, 1, 7)",
+}
+_SQL_SUBJECTS = {"employee": "employee_id", "department": "department"}
+
+def _expected_totals_sql() -> str:
+    """SELECT of (scope, subject, period, total_cents, claims) recomputed from the ledger"""
+    parts = [
+        f"SELECT '{scope}', {subject}, {key}, SUM(amount_cents), COUNT(*) FROM spend_ledger "
+        f"WHERE {subject} IS NOT NULL AND {subject} != '' GROUP BY {subject}, {key}"
+        for scope, subject in _SQL_SUBJECTS.items()
+        for key in _SQL_PERIOD_KEYS.values()
+    ]
+    return " UNION ALL ".join(parts)
+
+class SpendLedger:
+    """SQLite ledger of finalized claims plus per-period running totals"""
+
+    def __init__(self, path: str = SPEND_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spend_ledger ("
+            "claim_id TEXT PRIMARY KEY, employee_id TEXT, department TEXT, expense_date TEXT NOT NULL, "
+            "amount_cents INTEGER NOT NULL, recorded_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spend_totals ("
+            "scope TEXT NOT NULL, subject TEXT NOT NULL, period TEXT NOT NULL, "
+            "total_cents INTEGER NOT NULL, claims INTEGER NOT NULL, PRIMARY KEY (scope, subject, period))"
+        )
+        self._conn.commit()
+
+    def _apply_locked(self, employee_id: Optional[str], department: Optional[str], expense_date: str, cents: int, sign: int) -> None:
+        keys = period_keys(expense_date).values()
+        rows = [
+            (scope, subject, key, sign * cents, sign)
+            for scope, subject in (("employee", employee_id), ("department", department))
+            if subject
+            for key in keys
+        ]
+        self._conn.executemany(
+            "INSERT INTO spend_totals (scope, subject, period, total_cents, claims) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (scope, subject, period) DO UPDATE SET "
+            "total_cents = total_cents + excluded.total_cents, claims = claims + excluded.claims",
+            rows,
+        )
+
+    def record_claim(
+        self,
+        claim_id: str,
+        employee_id: Optional[str],
+        department: Optional[str],
+        expense_date: str,
+        amount_usd: float,
+    ) -> bool:
+        """Add a finalized claim and bump its totals; False if the claim was already recorded"""
+        cents = round(amount_usd * 100)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO spend_ledger (claim_id, employee_id, department, expense_date, amount_cents, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (claim_id, employee_id, department, expense_date, cents, time.time()),
+            )
+            inserted = cursor.rowcount == 1
+            if inserted:
+                self._apply_locked(employee_id, department, expense_date, cents, +1)
+            self._conn.commit()
+        return inserted
+
+    def remove_claim(self, claim_id: str) -> bool:
+        """Take a claim back out (e.g. rejected by a manager); False if it was not recorded"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT employee_id, department, expense_date, amount_cents FROM spend_ledger WHERE claim_id = ?",
+                (claim_id,),
+            ).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM spend_ledger WHERE claim_id = ?", (claim_id,))
+            self._apply_locked(*row, -1)
+            self._conn.commit()
+        return True
+
+    def spent(self, scope: str, subject: Optional[str], expense_date: str) -> Dict[str, float]:
+        """USD spent by ``subject`` in the day, week and month containing ``expense_date``"""
+        keys = period_keys(expense_date)
+        totals = dict.fromkeys(PERIODS, 0.0)
+        if not subject:
+            return totals
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT period, total_cents FROM spend_totals WHERE scope = ? AND subject = ? AND period IN (?, ?, ?)",
+                (scope, subject, *keys.values()),
+            ).fetchall()
+        by_key = dict(rows)
+        for period, key in keys.items():
+            totals[period] = by_key.get(key, 0) / 100
+        return totals
+
+    def check_caps(
+        self,
+        employee_id: Optional[str],
+        department: Optional[str],
+        expense_date: str,
+        amount_usd: float,
+        employee_caps: Dict[str, float] = EMPLOYEE_SPEND_CAPS_USD,
+        department_caps: Dict[str, float] = DEPARTMENT_SPEND_CAPS_USD,
+    ) -> Tuple[Dict[str, Dict[str, float]], List[Dict[str, Any]]]:
+        """Spend to date per scope, and every cap this claim would push over"""
+        spend = {}
+        breaches = []
+        for scope, subject, caps in (("employee", employee_id, employee_caps), ("department", department, department_caps)):
+            if not subject:
+                continue
+            spend[scope] = self.spent(scope, subject, expense_date)
+            for period, cap in caps.items():
+                projected = round(spend[scope][period] + amount_usd, 2)
+                if projected > cap:
+                    breaches.append({"scope": scope, "subject": subject, "period": period, "cap_usd": cap,
+                                     "spent_usd": spend[scope][period], "projected_usd": projected})
+        return spend, breaches
+
+    def rebuild(self) -> int:
+        """Recompute every total from the ledger; returns the number of total rows"""
+        with self._lock:
+            self._conn.execute("DELETE FROM spend_totals")
+            self._conn.execute(
+                f"INSERT INTO spend_totals (scope, subject, period, total_cents, claims) {_expected_totals_sql()}"
+            )
+            self._conn.commit()
+            return self._conn.execute("SELECT COUNT(*) FROM spend_totals").fetchone()[0]
+
+    def check(self, limit: int = 20) -> Dict[str, Any]:
+        """Compare the running totals with sums recomputed from the ledger"""
+        expected = f"SELECT * FROM ({_expected_totals_sql()})"
+        stored = "SELECT scope, subject, period, total_cents, claims FROM spend_totals WHERE claims != 0"
+        with self._lock:
+            missing = self._conn.execute(f"{expected} EXCEPT {stored} LIMIT ?", (limit,)).fetchall()
+            unexpected = self._conn.execute(f"{stored} EXCEPT {expected} LIMIT ?", (limit,)).fetchall()
+            claims = self._conn.execute("SELECT COUNT(*) FROM spend_ledger").fetchone()[0]
+        return {
+            "consistent": not missing and not unexpected,
+            "claims": claims,
+            "expected_but_not_stored": missing,
+            "stored_but_not_expected": unexpected,
+        }
+
+_ledger: Optional[SpendLedger] = None
+_ledger_lock = threading.Lock()
+
+def get_spend_ledger() -> Optional[SpendLedger]:
+    """Process-wide spend ledger, or None when SPEND_LEDGER_ENABLED is off"""
+    global _ledger
+    if not SPEND_LEDGER_ENABLED:
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = SpendLedger()
+        return _ledger
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command-line maintenance for the spend ledger"""
+    parser = argparse.ArgumentParser(description="Check, rebuild or query the spend totals")
+    parser.add_argument("command", choices=["check", "rebuild", "report"])
+    parser.add_argument("--db", default=SPEND_LEDGER_PATH, help="Spend ledger database path")
+    parser.add_argument("--employee", help="Employee to report on")
+    parser.add_argument("--department", help="Department to report on")
+    parser.add_argument("--date", default=date.today().isoformat(), help="Date whose periods to report (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    ledger = SpendLedger(args.db)
+    if args.command == "rebuild":
+        print(f"Rebuilt {ledger.rebuild()} total rows from the ledger")
+    elif args.command == "report":
+        report = {}
+        if args.employee:
+            report["employee"] = ledger.spent("employee", args.employee, args.date)
+        if args.department:
+            report["department"] = ledger.spent("department", args.department, args.date)
+        print(json.dumps(report, indent=2))
+        return 0
+    result = ledger.check()
+    print(json.dumps(result, indent=2))
+    return 0 if result["consistent"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
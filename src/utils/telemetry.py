@@ -0,0 +1,444 @@
+"""Structured instrumentation for the expense workflow
+
+Replaces ad-hoc ``print`` diagnostics with three outputs:
+
+- metrics: counters and histograms held in memory and exported in the
+  Prometheus text format, to ``METRICS_PATH`` (rewritten at most every
+  ``METRICS_FLUSH_INTERVAL_SECONDS`` as claims finish) and, when
+  ``METRICS_PORT`` is set, over HTTP at ``/metrics``
+- per-claim traces: node spans, LLM calls with token counts, OCR timings,
+  checkpoint sizes and supervisor hops, tagged with the claim's
+  ``thread_id``, appended to ``TRACE_PATH`` as one JSON line per claim
+- logging: remaining diagnostics go through ``logging`` at ``LOG_LEVEL``
+
+Metrics are labelled by node / call site, not by thread id, so their
+cardinality stays bounded; per-claim detail lives in the traces.
+
+Nodes are wrapped with ``instrument_node`` when the graph is built. The
+wrapper makes the claim's trace current (a ContextVar, so OCR worker threads
+and LLM tasks inherit it), which lets the LLM client and OCR helpers record
+against the right claim without being passed the thread id.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..config.settings import (
+    LOG_LEVEL,
+    METRICS_FLUSH_INTERVAL_SECONDS,
+    METRICS_PATH,
+    METRICS_PORT,
+    TELEMETRY_ENABLED,
+    TRACE_MAX_OPEN,
+    TRACE_PATH,
+)
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Exceptions LangGraph uses for control flow; a span ending in one is not an error
+_CONTROL_FLOW = {"GraphInterrupt", "NodeInterrupt", "ParentCommand", "GraphBubbleUp"}
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# (type, help) of every exported metric
+METRICS = {
+    "expense_node_duration_seconds": ("histogram", "Wall time of each workflow node"),
+    "expense_node_errors_total": ("counter", "Workflow node invocations that raised"),
+    "expense_supervisor_hops_total": ("counter", "Supervisor routing decisions by destination"),
+    "expense_ocr_duration_seconds": ("histogram", "OCR time per receipt by source (tesseract, cache, fallback)"),
+    "expense_llm_duration_seconds": ("histogram", "LLM call latency by call site, including retries"),
+    "expense_llm_calls_total": ("counter", "LLM calls by call site and outcome"),
+    "expense_llm_tokens_total": ("counter", "LLM tokens by call site and kind (prompt, completion)"),
+    "expense_hitl_answers_total": ("counter", "Clarification answers by how they were read (option, fuzzy, llm)"),
+    "expense_checkpoint_bytes": ("histogram", "Serialized size of each checkpoint written"),
+    "expense_claims_total": ("counter", "Claims whose trace was closed, by status"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class MetricsRegistry:
+    """Thread-safe counters and fixed-bucket histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = SECONDS_BUCKETS, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            buckets = self._buckets.setdefault(name, buckets)
+            row = self._histograms.setdefault(name, {}).get(key)
+            if row is None:
+                row = self._histograms[name][key] = [0.0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    row[index] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counter values and histogram sum/count per labelled series"""
+        with self._lock:
+            snapshot: Dict[str, Dict[str, Any]] = {}
+            for name, series in self._counters.items():
+                snapshot[name] = {_format_labels(key) or "total": value for key, value in series.items()}
+            for name, series in self._histograms.items():
+                snapshot[name] = {
+                    _format_labels(key) or "total": {"count": int(row[-1]), "sum": round(row[-2], 6)}
+                    for key, row in series.items()
+                }
+        return snapshot
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in METRICS.items():
+                counters = self._counters.get(name, {})
+                histograms = self._histograms.get(name, {})
+                if not counters and not histograms:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(counters.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+                buckets = self._buckets.get(name, ())
+                for key, row in sorted(histograms.items()):
+                    cumulative = 0.0
+                    for bound, count in zip(buckets, row):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative:g}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {row[-1]:g}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {row[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {row[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+class ClaimTrace:
+    """Everything recorded for one claim (thread)"""
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.hops = 0
+        self.nodes: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.ocr: List[Dict[str, Any]] = []
+        self.checkpoint_bytes: List[int] = []
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._started) * 1000, 2)
+
+    def to_dict(self, status: str) -> Dict[str, Any]:
+        return {
+            "thread_id": self.thread_id,
+            "status": status,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duration_ms": self.elapsed_ms(),
+            "supervisor_hops": self.hops,
+            "nodes": self.nodes,
+            "llm_calls": self.llm_calls,
+            "llm_tokens": {
+                "prompt": sum(call.get("prompt_tokens") or 0 for call in self.llm_calls),
+                "completion": sum(call.get("completion_tokens") or 0 for call in self.llm_calls),
+            },
+            "ocr": self.ocr,
+            "checkpoint_bytes": self.checkpoint_bytes,
+        }
+
+# (trace, node name) of the node currently running in this context
+_active: contextvars.ContextVar[Tuple[Optional[ClaimTrace], Optional[str]]] = contextvars.ContextVar(
+    "telemetry_active", default=(None, None)
+)
+
+class Telemetry:
+    """Metrics registry plus open per-claim traces and their exporters"""
+
+    def __init__(
+        self,
+        enabled: bool = TELEMETRY_ENABLED,
+        trace_path: Optional[str] = TRACE_PATH,
+        metrics_path: Optional[str] = METRICS_PATH,
+        max_open_traces: int = TRACE_MAX_OPEN,
+        flush_interval: float = METRICS_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.max_open_traces = max_open_traces
+        self.flush_interval = flush_interval
+        self.registry = MetricsRegistry()
+        self._traces: "OrderedDict[str, ClaimTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._server: Optional["ThreadingHTTPServer"] = None
+
+    # --- traces ---
+
+    def trace(self, thread_id: str) -> ClaimTrace:
+        """Open trace for ``thread_id``; the least recent one is closed when too many are open"""
+        evicted = None
+        with self._lock:
+            trace = self._traces.get(thread_id)
+            if trace is None:
+                trace = self._traces[thread_id] = ClaimTrace(thread_id)
+                if len(self._traces) > self.max_open_traces:
+                    _, evicted = self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(thread_id)
+        if evicted is not None:
+            self._write_trace(evicted, "incomplete")
+        return trace
+
+    def finish_trace(self, thread_id: str, status: str = "completed") -> Optional[Dict[str, Any]]:
+        """Close a claim's trace, append it to TRACE_PATH and refresh the metrics file if due"""
+        with self._lock:
+            trace = self._traces.pop(thread_id, None)
+        record = self._write_trace(trace, status) if trace is not None else None
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.write_metrics()
+        return record
+
+    def _write_trace(self, trace: ClaimTrace, status: str) -> Dict[str, Any]:
+        record = trace.to_dict(status)
+        self.registry.inc("expense_claims_total", status=status)
+        if self.trace_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+                line = json.dumps(record, default=str) + "\n"
+                with self._lock, open(self.trace_path, "a") as f:
+                    f.write(line)
+            except OSError as e:
+                logger.warning("Could not write trace for %s: %s", trace.thread_id, e)
+        return record
+
+    @contextlib.contextmanager
+    def span(self, node: str, thread_id: Optional[str]) -> Iterator[Optional[ClaimTrace]]:
+        """Time one node run and make the claim's trace current while it runs"""
+        if not self.enabled:
+            yield None
+            return
+        trace = self.trace(thread_id) if thread_id is not None else None
+        token = _active.set((trace, node))
+        start_ms = trace.elapsed_ms() if trace else 0.0
+        start = time.perf_counter()
+        outcome = None
+        try:
+            yield trace
+        except BaseException as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            _active.reset(token)
+            self.registry.observe("expense_node_duration_seconds", seconds, node=node)
+            if outcome and outcome not in _CONTROL_FLOW:
+                self.registry.inc("expense_node_errors_total", node=node, error=outcome)
+            if trace is not None:
+                span = {"node": node, "start_ms": start_ms, "duration_ms": round(seconds * 1000, 2)}
+                if outcome:
+                    span["interrupted" if outcome in _CONTROL_FLOW else "error"] = outcome
+                trace.nodes.append(span)
+
+    # --- events recorded from inside nodes ---
+
+    def record_hop(self, next_agent: str) -> None:
+        if not self.enabled:
+            return
+        self.registry.inc("expense_supervisor_hops_total", next=next_agent)
+        trace, _node = _active.get()
+        if trace is not None:
+            trace.hops += 1
+
+    def record_ocr(self, seconds: float, source: str, thread_id: Optional[str] = None) -> None:
+        """OCR time, against the current claim or (for OCR done outside the graph) ``thread_id``"""
+        if not self.enabled:
+            return
+        self.registry.observe("expense_ocr_duration_seconds", seconds, source=source)
+        trace = self.trace(thread_id) if thread_id is not None else _active.get()[0]
+        if trace is not None:
+            trace.ocr.append({"source": source, "duration_ms": round(seconds * 1000, 2)})
+
+    def record_llm_call(
+        self,
+        seconds: float,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        trace, node = _active.get()
+        call_site = node or "unknown"
+        self.registry.observe("expense_llm_duration_seconds", seconds, call_site=call_site)
+        self.registry.inc("expense_llm_calls_total", call_site=call_site, outcome="error" if error else "ok")
+        if prompt_tokens:
+            self.registry.inc("expense_llm_tokens_total", prompt_tokens, call_site=call_site, kind="prompt")
+        if completion_tokens:
+            self.registry.inc("expense_llm_tokens_total", completion_tokens, call_site=call_site, kind="completion")
+        if trace is not None:
+            call = {"call_site": call_site, "duration_ms": round(seconds * 1000, 2),
+                    "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+            if error:
+                call["error"] = error
+            trace.llm_calls.append(call)
+
+    def record_hitl_answer(self, path: str) -> None:
+        if self.enabled:
+            self.registry.inc("expense_hitl_answers_total", path=path)
+
+    def record_checkpoint(self, thread_id: str, size: int) -> None:
+        """Size of a checkpoint just written; checkpoints are saved between nodes, so look the trace up by id"""
+        if not self.enabled:
+            return
+        self.registry.observe("expense_checkpoint_bytes", size, buckets=BYTES_BUCKETS)
+        with self._lock:
+            trace = self._traces.get(thread_id)
+        if trace is not None:
+            trace.checkpoint_bytes.append(size)
+
+    # --- exporters ---
+
+    def write_metrics(self, path: Optional[str] = None) -> Optional[str]:
+        """Atomically rewrite the Prometheus text file"""
+        path = path or self.metrics_path
+        self._last_flush = time.monotonic()
+        if not path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.registry.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+            return None
+        return path
+
+    def start_http_server(self, port: int = METRICS_PORT, host: str = "0.0.0.0") -> Optional["ThreadingHTTPServer"]:
+        """Serve the metrics at http://host:port/metrics from a daemon thread"""
+        if not port or self._server is not None:
+            return self._server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+        return self._server
+
+def _thread_id(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a graph node in a telemetry span; the finalize node also closes the claim's trace"""
+    # Only called while a graph is built, when LangGraph has already loaded langchain_core
+    from langchain_core.runnables import RunnableConfig
+
+    accepts_config = "config" in inspect.signature(node).parameters
+
+    def call(state, config):
+        return node(state, config) if accepts_config else node(state)
+
+    def finish(thread_id: Optional[str]) -> None:
+        if name == "finalize" and thread_id is not None:
+            get_telemetry().finish_trace(thread_id)
+
+    if asyncio.iscoroutinefunction(node):
+        async def instrumented(state, config: RunnableConfig):
+            thread_id = _thread_id(config)
+            with get_telemetry().span(name, thread_id):
+                result = await call(state, config)
+            finish(thread_id)
+            return result
+    else:
+        def instrumented(state, config: RunnableConfig):
+            thread_id = _thread_id(config)
+            with get_telemetry().span(name, thread_id):
+                result = call(state, config)
+            finish(thread_id)
+            return result
+
+    instrumented.__name__ = getattr(node, "__name__", name)
+    instrumented.__doc__ = node.__doc__
+    return instrumented
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """Set up logging for entry points (the app, CLIs); library modules only log"""
+    logging.basicConfig(level=getattr(logging, level.upper(), logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+def get_telemetry() -> Telemetry:
+    """Process-wide telemetry, created on first use (and serving /metrics if METRICS_PORT is set)"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+            if _telemetry.enabled and METRICS_PORT:
+                _telemetry.start_http_server(METRICS_PORT)
+        return _telemetry
+
+def set_telemetry(telemetry: Telemetry) -> Telemetry:
+    """Replace the shared instance, e.g. with one writing to a temporary directory"""
+    global _telemetry
+    with _telemetry_lock:
+        _telemetry = telemetry
+        return _telemetry
@@ -1,59 +1,206 @@
-"""Main workflow orchestration for the expense reimbursement system"""
+"""Main workflow orchestration for the expense reimbursement system
 
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+Importing this module is cheap and has no side effects: LangGraph, the
+agents and their clients load when a workflow is first built. The shared
+``expense_agent_system`` / ``async_expense_agent_system`` apps are built on
+first attribute access, or explicitly with ``get_expense_agent_system()``.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from .types.state import ExpenseState
-from .agents.supervisor import supervisor_agent
-from .agents.receipt_processor import receipt_processor_agent_node
-from .agents.location_analyst import location_analyst_agent_node
-from .agents.classification import classification_agent_node
-from .agents.hitl import hitl_agent_node
-from .agents.policy_engine import policy_engine_agent_node
-from .agents.exception_handler import exception_handler_agent_node
-from .agents.approval_router import approval_router_agent_node
-from .agents.finalize import finalize_agent_node
-
-def build_expense_workflow():
-    """Construct the complete agentic workflow"""
+from .config.settings import CHECKPOINT_BACKEND, MAX_CONCURRENT_CLAIMS, PARALLEL_ANALYSIS, ROUTING_MODE
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+logger = logging.getLogger(__name__)
+
+ROUTING_MODES = ("supervisor", "direct")
+
+def _without_goto(result: Any) -> Any:
+    from langgraph.types import Command
+
+    return Command(update=result.update) if isinstance(result, Command) else result
+
+def _route_by_edges(node: Callable) -> Callable:
+    """Drop a specialist's hand-back to the supervisor so the conditional edges route it"""
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def routed(*args, **kwargs):
+            return _without_goto(await node(*args, **kwargs))
+    else:
+        @functools.wraps(node)
+        def routed(*args, **kwargs):
+            return _without_goto(node(*args, **kwargs))
+    return routed
+
+def build_expense_workflow(
+    use_async: bool = False,
+    checkpointer: Optional["BaseCheckpointSaver"] = None,
+    routing_mode: str = ROUTING_MODE,
+    parallel_analysis: bool = PARALLEL_ANALYSIS,
+):
+    """Construct the complete agentic workflow
+
+    With ``use_async=True`` the LLM-backed agents use ``ainvoke`` and the
+    compiled graph must be driven with ``ainvoke``/``astream``. Without an
+    explicit ``checkpointer`` the backend configured by CHECKPOINT_BACKEND is used.
+    ``routing_mode="direct"`` compiles the supervisor's routing into conditional
+    edges, roughly halving the graph steps (and checkpoint writes) per claim.
+    ``parallel_analysis`` fans location analysis and classification out as
+    concurrent branches that join before the next routing decision, so their
+    LLM calls overlap.
+    """
+    if routing_mode not in ROUTING_MODES:
+        raise ValueError(f"Unknown routing mode {routing_mode!r}; expected one of {ROUTING_MODES}")
+
+    from langgraph.graph import StateGraph, START, END
+
+    from .utils.checkpointing import create_checkpointer
+    from .agents.supervisor import ANALYSIS_STAGES, STAGES, analysis_join, route_to_next_stage, supervisor_agent
+    from .agents.receipt_processor import receipt_processor_agent_node, areceipt_processor_agent_node
+    from .agents.location_analyst import location_analyst_agent_node, alocation_analyst_agent_node
+    from .agents.classification import classification_agent_node, aclassification_agent_node
+    from .agents.hitl import hitl_agent_node, ahitl_agent_node
+    from .agents.policy_engine import policy_engine_agent_node
+    from .agents.exception_handler import exception_handler_agent_node
+    from .agents.approval_router import approval_router_agent_node
+    from .agents.finalize import finalize_agent_node
+    from .utils.telemetry import instrument_node
 
     workflow = StateGraph(ExpenseState)
+    direct = routing_mode == "direct"
+
+    route = functools.partial(route_to_next_stage, parallel=parallel_analysis)
+    # Parallel branches hand back through static edges to the join (the supervisor, or analysis_join);
+    # classification's own hand-off to hitl would run beside the other branch instead of after it
+    joined = ANALYSIS_STAGES if parallel_analysis else []
+
+    def add_node(name, node):
+        if direct or name in joined:
+            node = _route_by_edges(node)
+        # Every node runs inside a telemetry span tagged with the claim's thread_id
+        workflow.add_node(name, instrument_node(name, node))
 
     # Add supervisor as the orchestrator
-    workflow.add_node("supervisor", supervisor_agent)
+    if not direct:
+        add_node("supervisor", functools.partial(supervisor_agent, parallel=parallel_analysis))
+    elif joined:
+        add_node("analysis_join", analysis_join)
 
     # Add specialist agents
-    workflow.add_node("receipt_processor", receipt_processor_agent_node)
-    workflow.add_node("location_analyst", location_analyst_agent_node)
-    workflow.add_node("classification", classification_agent_node)
-    workflow.add_node("hitl", hitl_agent_node)
-    workflow.add_node("policy_engine", policy_engine_agent_node)
-    workflow.add_node("exception_handler", exception_handler_agent_node)
-    workflow.add_node("approval_router", approval_router_agent_node)
-    workflow.add_node("finalize", finalize_agent_node)
+    if use_async:
+        add_node("receipt_processor", areceipt_processor_agent_node)
+        add_node("location_analyst", alocation_analyst_agent_node)
+        add_node("classification", aclassification_agent_node)
+        add_node("hitl", ahitl_agent_node)
+    else:
+        add_node("receipt_processor", receipt_processor_agent_node)
+        add_node("location_analyst", location_analyst_agent_node)
+        add_node("classification", classification_agent_node)
+        add_node("hitl", hitl_agent_node)
+    add_node("policy_engine", policy_engine_agent_node)
+    add_node("exception_handler", exception_handler_agent_node)
+    add_node("approval_router", approval_router_agent_node)
+    add_node("finalize", finalize_agent_node)
 
     # Define workflow edges
-    workflow.add_edge(START, "supervisor")
-
-    # Specialist agents hand back to supervisor
-    workflow.add_edge("receipt_processor", "supervisor")
-    workflow.add_edge("location_analyst", "supervisor")
-    workflow.add_edge("policy_engine", "supervisor")
-    workflow.add_edge("exception_handler", "supervisor")
-    workflow.add_edge("approval_router", "supervisor")
+    if direct:
+        # Each stage goes straight to the next one the claim needs
+        sources = [START] + [stage for stage in STAGES[:-1] if stage not in joined]
+        if joined:
+            sources.append("analysis_join")
+            for stage in joined:
+                workflow.add_edge(stage, "analysis_join")
+        for source in sources:
+            workflow.add_conditional_edges(source, route, STAGES)
+    else:
+        workflow.add_edge(START, "supervisor")
+
+        # Specialist agents hand back to supervisor
+        workflow.add_edge("receipt_processor", "supervisor")
+        workflow.add_edge("location_analyst", "supervisor")
+        if joined:
+            workflow.add_edge("classification", "supervisor")
+        workflow.add_edge("policy_engine", "supervisor")
+        workflow.add_edge("exception_handler", "supervisor")
+        workflow.add_edge("approval_router", "supervisor")
     workflow.add_edge("finalize", END)
 
     # Compile with checkpointing for HITL interruptions
-    memory = MemorySaver()
     return workflow.compile(
-        checkpointer=memory,
+        checkpointer=checkpointer or create_checkpointer(),
         interrupt_before=["hitl"]  # Pause before HITL for user input
     )
 
-# Create the application
-expense_agent_system = build_expense_workflow()
+async def aprocess_claims(
+    claims: Iterable[Tuple[str, ExpenseState]],
+    max_concurrency: int = MAX_CONCURRENT_CLAIMS,
+    app=None,
+) -> List[Any]:
+    """Run many claims concurrently on the current event loop
+
+    ``claims`` is an iterable of ``(thread_id, initial_state)`` pairs. At most
+    ``max_concurrency`` claims are in flight at once. Returns one entry per
+    claim, in input order: the final state values, or the exception raised by
+    that claim so one bad receipt does not cancel the batch. Claims paused for
+    HITL return their state at the interrupt; resume them with
+    ``Command(resume=...)`` on the same ``thread_id``.
+    """
+    app = app or get_expense_agent_system(use_async=True)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_claim(thread_id: str, initial_state: ExpenseState) -> Dict[str, Any]:
+        config = {"configurable": {"thread_id": thread_id}}
+        async with semaphore:
+            await app.ainvoke(initial_state, config)
+            snapshot = await app.aget_state(config)
+        return snapshot.values
+
+    tasks = [run_claim(thread_id, state) for thread_id, state in claims]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+def process_claims(
+    claims: Iterable[Tuple[str, ExpenseState]],
+    max_concurrency: int = MAX_CONCURRENT_CLAIMS,
+    app: Optional[Any] = None,
+) -> List[Any]:
+    """Blocking wrapper around aprocess_claims for scripts without an event loop"""
+    return asyncio.run(aprocess_claims(claims, max_concurrency=max_concurrency, app=app))
+
+_systems: Dict[str, Any] = {}
+_systems_lock = threading.Lock()
+
+def get_checkpointer():
+    """Checkpointer shared by the default sync and async apps"""
+    with _systems_lock:
+        if "checkpointer" not in _systems:
+            from .utils.checkpointing import create_checkpointer
+            _systems["checkpointer"] = create_checkpointer()
+        return _systems["checkpointer"]
+
+def get_expense_agent_system(use_async: bool = False):
+    """Build (once) and return the shared sync or async application"""
+    name = "async_expense_agent_system" if use_async else "expense_agent_system"
+    checkpointer = get_checkpointer()
+    with _systems_lock:
+        if name not in _systems:
+            _systems[name] = build_expense_workflow(use_async=use_async, checkpointer=checkpointer)
+            logger.info("Workflow %s initialized (interrupt before hitl, %s routing, parallel analysis %s, "
+                        "checkpointer backend %s)", name, ROUTING_MODE, PARALLEL_ANALYSIS, CHECKPOINT_BACKEND)
+        return _systems[name]
 
-print("=== WORKFLOW SYSTEM INITIALIZED ===")
-print("Available agents: supervisor, receipt_processor, location_analyst, classification, hitl, policy_engine, exception_handler, approval_router, finalize")
-print("Interrupt configured before: hitl")
-print("=== READY FOR EXPENSE PROCESSING ===\n")
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    """Lazily build the module-level apps on first access"""
+    if name == "expense_agent_system":
+        return get_expense_agent_system()
+    if name == "async_expense_agent_system":
+        return get_expense_agent_system(use_async=True)
+    if name == "checkpointer":
+        return get_checkpointer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Benchmark the past-claim kNN classifier at a million indexed claims
+
+Generates ``--claims`` synthetic labelled claims: ``--employees`` employees,
+each with a few habitual routes that always carry the same department and
+purpose (apart from ``--noise`` mislabelled ones), plus one-off trips. They
+are recorded through ``ClaimClassifier.record_many`` into a temporary
+SQLite file, then the index is rebuilt cold from disk and queried with
+``--queries`` fresh claims from the same distribution. Reports:
+
+- bulk record and cold rebuild time, distinct vectors and index memory
+- single-claim ``record`` latency (what ``finalize_agent_node`` adds)
+- ``predict`` latency percentiles
+- hit rate (claims that skip the classification LLM call) and the accuracy
+  of those hits against the generator's labels
+
+Usage:
+    python tests/benchmarks/claim_classifier_benchmark.py [--claims 1000000] [--employees 20000] [--queries 2000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.insert(0, root_dir)
+
+from src.utils.claim_classifier import ClaimClassifier, ClaimKey
+
+LABELS = [
+    ("Sales", "Client Meeting"),
+    ("Sales", "Prospect Visit"),
+    ("Marketing", "Conference"),
+    ("Engineering", "Team Offsite"),
+    ("Engineering", "Commute"),
+    ("HR", "Training"),
+    ("Finance", "Audit Visit"),
+    ("Executive", "Board Meeting"),
+]
+MERCHANTS = ["uber", "lyft", "yellow cab", "bolt", "addison lee"]
+STREETS = ["market", "main", "king", "queen", "station", "harbour", "park", "church", "mill", "bridge",
+           "high", "oak", "elm", "pine", "lake", "hill", "river", "canal", "castle", "abbey"]
+PLACES = ["airport terminal 1", "airport terminal 2", "central station", "convention center", "head office",
+          "client campus", "downtown hotel", "university", "stadium", "harbour ferry"]
+MIN_ACCURACY = 0.97
+MAX_P95_MS = 100.0
+
+def _address(rng: np.random.Generator) -> str:
+    if rng.random() < 0.4:
+        return str(rng.choice(PLACES))
+    return f"{rng.integers(1, 400)} {rng.choice(STREETS)} street"
+
+class ClaimGenerator:
+    """Employees with habitual labelled routes, plus one-off trips"""
+
+    def __init__(self, employees: int, noise: float, seed: int = 7):
+        self.rng = np.random.default_rng(seed)
+        self.noise = noise
+        self.routes = []
+        for employee in range(employees):
+            routes = []
+            for _ in range(int(self.rng.integers(1, 5))):
+                label = LABELS[int(self.rng.integers(len(LABELS)))]
+                merchant = str(self.rng.choice(MERCHANTS))
+                routes.append((merchant, _address(self.rng), _address(self.rng), label))
+            self.routes.append(routes)
+
+    def claim(self, one_off_rate: float = 0.15):
+        """(key, department, purpose, habitual)"""
+        rng = self.rng
+        employee = int(rng.integers(len(self.routes)))
+        weekday = int(rng.integers(0, 5)) if rng.random() < 0.85 else int(rng.integers(5, 7))
+        habitual = rng.random() >= one_off_rate
+        if habitual:
+            merchant, pickup, dropoff, label = self.routes[employee][int(rng.integers(len(self.routes[employee])))]
+            if rng.random() < self.noise:
+                label = LABELS[int(rng.integers(len(LABELS)))]
+        else:
+            merchant, pickup, dropoff = str(rng.choice(MERCHANTS)), _address(rng), _address(rng)
+            label = LABELS[int(rng.integers(len(LABELS)))]
+        return ClaimKey(f"emp_{employee:05d}", merchant, pickup, dropoff, weekday), label[0], label[1], habitual
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--claims", type=int, default=1_000_000, help="Labelled claims to index")
+    parser.add_argument("--employees", type=int, default=20_000, help="Distinct employees")
+    parser.add_argument("--queries", type=int, default=2_000, help="Fresh claims to classify")
+    parser.add_argument("--noise", type=float, default=0.02, help="Share of habitual claims with a different label")
+    args = parser.parse_args()
+
+    generator = ClaimGenerator(args.employees, args.noise)
+    with tempfile.TemporaryDirectory(prefix="classifier-bench-") as work_dir:
+        path = os.path.join(work_dir, "claim_classifier.sqlite")
+        classifier = ClaimClassifier(path)
+
+        start = time.perf_counter()
+        classifier.record_many((f"claim_{i}", *generator.claim()[:3]) for i in range(args.claims))
+        record_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        classifier = ClaimClassifier(path)
+        rebuild_seconds = time.perf_counter() - start
+        stats = classifier.stats()
+
+        latencies, hits, correct, habitual_hits, habitual = [], 0, 0, 0, 0
+        for _ in range(args.queries):
+            key, department, purpose, is_habitual = generator.claim()
+            start = time.perf_counter()
+            prediction = classifier.predict(key)
+            latencies.append((time.perf_counter() - start) * 1000)
+            habitual += is_habitual
+            if prediction is not None:
+                hits += 1
+                habitual_hits += is_habitual
+                correct += (prediction.department, prediction.purpose) == (department, purpose)
+
+        record_latencies = []
+        for i in range(200):
+            key, department, purpose, _ = generator.claim()
+            start = time.perf_counter()
+            classifier.record(f"new_{i}", key, department, purpose)
+            record_latencies.append((time.perf_counter() - start) * 1000)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    accuracy = correct / hits if hits else 0.0
+    print(f"\n=== PAST-CLAIM CLASSIFIER: {args.claims:,} claims, {args.employees:,} employees ===")
+    print(f"Bulk record: {record_seconds:.1f}s ({args.claims / record_seconds:,.0f} claims/s)")
+    print(f"Cold rebuild from SQLite: {rebuild_seconds:.1f}s")
+    print(f"Distinct vectors: {stats['distinct']:,}  index memory: {stats['index_bytes'] / 2 ** 20:.0f} MiB")
+    print(f"record (finalize): p50 {np.percentile(record_latencies, 50):.2f} ms")
+    print(f"predict: p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms")
+    print(f"Hit rate: {hits / args.queries:.1%} of claims skip the LLM "
+          f"({habitual_hits / max(habitual, 1):.1%} of habitual routes)")
+    print(f"Accuracy of hits: {accuracy:.2%}")
+
+    failed = accuracy < MIN_ACCURACY or p95 > MAX_P95_MS
+    print(f"\n=== {'CLASSIFIER BUDGET EXCEEDED' if failed else 'CLASSIFIER OK'} ===")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Deterministic offline stand-in for the OpenRouter chat model
+
+``FakeChatModel`` answers every prompt the agents send (extraction, fused
+extraction, location, classification and HITL parsing) from the prompt text
+alone, after a configurable simulated network latency. Answers and latencies
+are derived from a hash of the prompt, so runs are reproducible at any
+concurrency. Install it with ``set_llm(FakeChatModel(...))``.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.utils.receipt_parsers import REQUIRED_FIELDS, parse_receipt_text
+
+DEPARTMENTS = [
+    ("Sales", "Client Meeting"),
+    ("Marketing", "Conference"),
+    ("Engineering", "Team Offsite"),
+    ("HR", "Training"),
+    ("Finance", "Audit Visit"),
+]
+COUNTRY_HINTS = [
+    (re.compile(r"london|heathrow|canary wharf", re.IGNORECASE), "United Kingdom", "London"),
+    (re.compile(r"paris|gare du nord", re.IGNORECASE), "France", "Paris"),
+]
+_RECEIPT_TEXT = re.compile(r"Text:\s*(.*?)\s*Respond in JSON", re.DOTALL)
+
+def _unit(prompt: str, salt: str) -> float:
+    """Stable pseudo-random number in [0, 1) for ``prompt``"""
+    digest = hashlib.blake2b(f"{salt}:{prompt}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers agent prompts locally after a simulated delay"""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    clarify_rate: float = 0.0  # Fraction of classifications below the confidence threshold
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-expense-llm"
+
+    def _delay(self, prompt: str) -> float:
+        return max(0.0, self.latency_ms + (2 * _unit(prompt, "latency") - 1) * self.jitter_ms) / 1000
+
+    def _receipt_fields(self, prompt: str) -> Dict[str, Any]:
+        match = _RECEIPT_TEXT.search(prompt)
+        result = parse_receipt_text(match.group(1) if match else prompt)
+        fields = result.fields if result else {}
+        return {name: fields.get(name) for name in REQUIRED_FIELDS}
+
+    def _location(self, text: str) -> Dict[str, str]:
+        for pattern, country, city in COUNTRY_HINTS:
+            if pattern.search(text):
+                return {"country": country, "city": city}
+        return {"country": "United States", "city": "New York"}
+
+    def _classification(self, prompt: str) -> Dict[str, Any]:
+        department, purpose = DEPARTMENTS[int(_unit(prompt, "department") * len(DEPARTMENTS))]
+        unsure = _unit(prompt, "clarify") < self.clarify_rate
+        return {
+            "department": department,
+            "purpose": purpose,
+            "confidence": 60 if unsure else 92 + int(_unit(prompt, "confidence") * 8),
+            "questions": ["Which department and business purpose is this trip for?"] if unsure else [],
+        }
+
+    def answer(self, prompt: str) -> str:
+        """Response text for one prompt"""
+        if "Identify the country" in prompt:
+            return self._location(prompt)["country"]
+        if "User said:" in prompt:
+            said = prompt.split("User said:", 1)[1].split("\n", 1)[0]
+            department = next((name for name, _ in DEPARTMENTS if name.lower() in said.lower()), "Sales")
+            return json.dumps({"department": department, "purpose": said.strip() or "Business travel"})
+        if "Infer department" in prompt:
+            return json.dumps(self._classification(prompt))
+        if "From the receipt text" in prompt:
+            fields = self._receipt_fields(prompt)
+            fields.update(self._location(f"{fields['pickup_location']} {fields['dropoff_location']}"))
+            fields.update(self._classification(prompt))
+            return json.dumps(fields)
+        return json.dumps(self._receipt_fields(prompt))
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = self.answer(prompt)
+        self.calls += 1
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": len(prompt) // 4 + len(content) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay(messages[-1].content))
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay(messages[-1].content))
+        return self._result(messages)
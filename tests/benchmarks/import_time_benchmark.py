@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark and regression guard for the workflow package
+
+Each scenario runs in a fresh interpreter under ``python -X importtime``:
+
+- ``settings``: import src.config.settings
+- ``workflow``: import src.workflow (must stay cheap and side-effect free)
+- ``build``: import src.workflow and build the default app
+
+Reports the wall time (best of ``--repeat``) and the slowest modules by
+cumulative import time. Exits non-zero when ``import src.workflow`` exceeds
+``--budget-ms`` or pulls in any module from HEAVY_MODULES.
+
+Usage:
+    python tests/benchmarks/import_time_benchmark.py [--repeat 5] [--budget-ms 250] [--top 15]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+
+SCENARIOS = {
+    "settings": "import src.config.settings",
+    "workflow": "import src.workflow",
+    "build": "import src.workflow; src.workflow.get_expense_agent_system()",
+}
+
+# Must not be imported by `import src.workflow`; they load on first use
+HEAVY_MODULES = [
+    "langgraph.graph",
+    "langchain_openai",
+    "openai",
+    "httpx",
+    "pytesseract",
+    "cv2",
+    "numpy",
+    "PIL",
+]
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def run_scenario(code: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Run ``code`` in a fresh interpreter; returns (wall seconds, [(module, self_us, cumulative_us)])"""
+    env = dict(os.environ, CHECKPOINT_BACKEND="memory", PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=root_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario failed: {code}\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us)))
+    return wall, modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario (best wall time is reported)")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Max cumulative import time of src.workflow")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list per scenario")
+    args = parser.parse_args()
+
+    failures = []
+    for name, code in SCENARIOS.items():
+        runs = [run_scenario(code) for _ in range(args.repeat)]
+        wall, modules = min(runs, key=lambda run: run[0])
+        cumulative: Dict[str, int] = {module: total for module, _self, total in modules}
+
+        print(f"\n=== {name}: {code} ===")
+        print(f"Wall time (best of {args.repeat}): {wall * 1000:.0f} ms")
+        print(f"Modules imported: {len(modules)}")
+        print("Slowest modules by cumulative import time:")
+        for module, self_us, total_us in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+            print(f"  {total_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {module}")
+
+        if name == "workflow":
+            workflow_ms = cumulative.get("src.workflow", 0) / 1000
+            print(f"src.workflow cumulative import: {workflow_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+            if workflow_ms > args.budget_ms:
+                failures.append(f"import src.workflow took {workflow_ms:.1f} ms > {args.budget_ms:.0f} ms")
+            eager = [module for module in HEAVY_MODULES if module in cumulative]
+            if eager:
+                failures.append(f"import src.workflow eagerly imports: {', '.join(eager)}")
+
+    if failures:
+        print("\n=== STARTUP REGRESSION ===")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n=== STARTUP BUDGET OK ===")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark OCR wall time and field accuracy with and without OpenCV preprocessing
+
+Each receipt in tests/sample_data/receipts is OCR'd as-is and as a simulated
+12-megapixel phone photo (upscaled, tilted, on a dark background with uneven
+lighting). Fields are extracted offline with the template parsers and scored
+against tests/sample_data/inputs/receipt_fields.json.
+
+Usage:
+    python tests/benchmarks/ocr_preprocessing_benchmark.py [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.insert(0, root_dir)
+
+import pytesseract
+
+from src.utils.image_preprocessing import preprocess_for_ocr
+from src.utils.ocr import extract_text
+from src.utils.receipt_parsers import REQUIRED_FIELDS, parse_receipt_text
+
+RECEIPTS_DIR = os.path.join(root_dir, "tests", "sample_data", "receipts")
+FIELDS_PATH = os.path.join(root_dir, "tests", "sample_data", "inputs", "receipt_fields.json")
+
+def simulate_phone_photo(image: Image.Image, size=(3000, 4000), angle: float = 4.0) -> Image.Image:
+    """Place the receipt, tilted and enlarged, on a 12MP background with a lighting gradient"""
+    background = (70, 60, 50)
+    canvas = Image.new("RGB", size, background)
+    receipt = image.convert("RGB").resize((size[0] // 2, size[1] // 2))
+    receipt = receipt.rotate(angle, expand=True, fillcolor=background)
+    canvas.paste(receipt, ((size[0] - receipt.width) // 2, (size[1] - receipt.height) // 2))
+    gradient = np.linspace(0.65, 1.0, size[0], dtype=np.float32)[None, :, None]
+    return Image.fromarray((np.asarray(canvas, dtype=np.float32) * gradient).astype(np.uint8))
+
+def field_accuracy(text: str, expected: dict) -> float:
+    """Fraction of required fields the template parsers recover from ``text``"""
+    result = parse_receipt_text(text)
+    fields = result.fields if result else {}
+    correct = 0
+    for name in REQUIRED_FIELDS:
+        got, want = fields.get(name), expected.get(name)
+        if isinstance(want, float):
+            correct += got is not None and abs(float(got) - want) < 0.005
+        else:
+            correct += str(got or "").strip().lower() == str(want).strip().lower()
+    return correct / len(REQUIRED_FIELDS)
+
+def time_case(image: Image.Image, expected: dict, preprocess: bool, repeat: int) -> dict:
+    """Best-of-``repeat`` wall time for preprocessing + Tesseract, plus accuracy"""
+    best_prep = best_ocr = float("inf")
+    text = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prepared = preprocess_for_ocr(image) if preprocess else image
+        prep_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        text = extract_text(prepared, preprocess=False)
+        best_ocr = min(best_ocr, time.perf_counter() - start)
+        best_prep = min(best_prep, prep_seconds)
+    return {
+        "pixels": prepared.width * prepared.height,
+        "preprocess_s": round(best_prep, 3),
+        "ocr_s": round(best_ocr, 3),
+        "total_s": round(best_prep + best_ocr, 3),
+        "accuracy": round(field_accuracy(text, expected), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (best time is reported)")
+    args = parser.parse_args()
+
+    try:
+        print(f"Tesseract {pytesseract.get_tesseract_version()}")
+    except Exception as e:
+        print(f"ERROR: Tesseract is not available ({e}); set TESSERACT_CMD")
+        return 1
+
+    with open(FIELDS_PATH, "r") as f:
+        expected_fields = json.load(f)
+
+    rows = []
+    for filename, expected in sorted(expected_fields.items()):
+        with Image.open(os.path.join(RECEIPTS_DIR, filename)) as original:
+            original.load()
+        for variant, image in (("scan", original), ("phone_photo", simulate_phone_photo(original))):
+            for preprocess in (False, True):
+                row = {"receipt": filename, "variant": variant, "preprocess": preprocess}
+                row.update(time_case(image, expected, preprocess, args.repeat))
+                rows.append(row)
+                print(json.dumps(row))
+
+    print("\n=== SUMMARY ===")
+    for variant in ("scan", "phone_photo"):
+        for preprocess in (False, True):
+            subset = [r for r in rows if r["variant"] == variant and r["preprocess"] == preprocess]
+            total = sum(r["total_s"] for r in subset)
+            accuracy = sum(r["accuracy"] for r in subset) / len(subset)
+            label = "with preprocessing" if preprocess else "raw"
+            print(f"{variant:12s} {label:20s} total {total:7.3f}s  field accuracy {accuracy:.1%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Deterministic generator of synthetic Uber/Lyft/taxi receipts for offline benchmarks
+
+Receipts use the same labelled layout as tests/sample_data/receipts, with
+amounts, dates, currencies and routes drawn from a seeded RNG, so a given
+``(count, seed)`` always yields the same receipts. Each one carries its
+ground-truth fields and printed text, and renders to a 600x800 image.
+``--statement`` also writes every receipt into one scanned multi-page PDF.
+
+Usage:
+    python tests/benchmarks/synthetic_receipts.py OUT_DIR [--count 50] [--seed 7] [--statement]
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from PIL import Image, ImageDraw, ImageFont
+
+# header, merchant and printed currency symbol -> ISO code
+MERCHANTS = [
+    ("UBER RECEIPT", "Uber"),
+    ("LYFT RECEIPT", "Lyft"),
+    ("CITY TAXI RECEIPT", "City Taxi"),
+]
+CURRENCIES = [("$", "USD", 0.8), ("€", "EUR", 0.1), ("£", "GBP", 0.1)]
+
+# Mix of routes the gazetteer resolves and generic ones only the LLM can place
+PICKUPS = [
+    "Downtown Office, 123 Main St",
+    "Hotel Grand Plaza, Lobby",
+    "Train Station, Platform 4",
+    "Union Station, Chicago",
+    "JFK Terminal 4",
+    "Home, 42 Elm Street",
+    "Heathrow Terminal 5",
+    "Gare du Nord, Paris",
+]
+DROPOFFS = [
+    "Airport Terminal 3, International",
+    "Convention Center, Main Entrance",
+    "Business District, 789 Office Blvd",
+    "Client Headquarters, Manhattan New York",
+    "San Francisco Marriott Marquis",
+    "Canary Wharf, London",
+    "Customer Site, 18 Harbour Rd",
+]
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%b %d, %Y"]
+
+@dataclass
+class SyntheticReceipt:
+    """One generated receipt with its ground truth"""
+    name: str
+    fields: Dict[str, object]
+    text: str
+
+    def render(self, size=(600, 800), font_size: int = 24) -> Image.Image:
+        """Black text on a white page, like the sample receipts"""
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=font_size)
+        y = 40
+        for line in self.text.splitlines():
+            draw.text((40, y), line, fill="black", font=font)
+            y += int(font_size * 1.8)
+        return image
+
+    def png_bytes(self) -> bytes:
+        """The rendered receipt as an uploaded PNG file"""
+        buffer = io.BytesIO()
+        self.render().save(buffer, format="PNG")
+        return buffer.getvalue()
+
+def _pick_currency(rng: random.Random):
+    roll, total = rng.random(), 0.0
+    for symbol, code, weight in CURRENCIES:
+        total += weight
+        if roll < total:
+            return symbol, code
+    return CURRENCIES[0][:2]
+
+def make_receipt(index: int, rng: random.Random, start: datetime.date = datetime.date(2025, 1, 1)) -> SyntheticReceipt:
+    """Draw one receipt from ``rng``"""
+    header, merchant = rng.choice(MERCHANTS)
+    symbol, currency = _pick_currency(rng)
+    # Log-normal fares: mostly $10-60, with a tail above the approval thresholds
+    amount = round(min(400.0, rng.lognormvariate(3.3, 0.55)), 2)
+    expense_date = start + datetime.timedelta(days=rng.randrange(365))
+    pickup, dropoff = rng.choice(PICKUPS), rng.choice(DROPOFFS)
+
+    fields = {
+        "amount": amount,
+        "currency": currency,
+        "expense_date": expense_date.isoformat(),
+        "merchant": merchant,
+        "pickup_location": pickup,
+        "dropoff_location": dropoff,
+    }
+    text = "\n".join([
+        header,
+        f"Date: {expense_date.strftime(rng.choice(DATE_FORMATS))}",
+        f"Amount: {symbol}{amount:.2f}",
+        f"Merchant: {merchant}",
+        f"Pickup: {pickup}",
+        f"Drop-off: {dropoff}",
+        f"Trip ID: {rng.getrandbits(48):012x}",
+    ])
+    return SyntheticReceipt(f"{merchant.lower().replace(' ', '_')}_{index:05d}", fields, text)
+
+def generate_receipts(count: int, seed: int = 0) -> List[SyntheticReceipt]:
+    """``count`` receipts, identical for identical ``(count, seed)``"""
+    rng = random.Random(seed)
+    return [make_receipt(index, rng) for index in range(count)]
+
+def write_statement(receipts: Sequence[SyntheticReceipt], path: str) -> None:
+    """Scanned (image-only) PDF with one receipt per page, like a monthly ride statement"""
+    pages = [receipt.render().convert("L") for receipt in receipts]
+    pages[0].save(path, save_all=True, append_images=pages[1:], resolution=100)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir", help="Directory for the PNG receipts and receipt_fields.json")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--statement", action="store_true", help="Also write statement.pdf holding every receipt")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    receipts = generate_receipts(args.count, args.seed)
+    truth = {}
+    for receipt in receipts:
+        filename = f"{receipt.name}.png"
+        receipt.render().save(os.path.join(args.out_dir, filename))
+        truth[filename] = receipt.fields
+    with open(os.path.join(args.out_dir, "receipt_fields.json"), "w") as f:
+        json.dump(truth, f, indent=2)
+    if args.statement:
+        write_statement(receipts, os.path.join(args.out_dir, "statement.pdf"))
+    print(f"Wrote {len(truth)} receipts to {args.out_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Offline end-to-end benchmark and regression guard for the expense agent workflow
+
+Synthetic Uber/Lyft/taxi receipts (synthetic_receipts.py) run through the real
+agent graph with FakeChatModel (fake_llm.py) standing in for OpenRouter, so no
+API key, network or Windows Tesseract path is needed. Caches, claim history,
+the spend ledger, traces and checkpoints all live in a temporary directory.
+
+Reports:
+
+- claims/sec over the measured claims (after ``--warmup``)
+- p50/p95/p99 wall time per node, from the per-claim telemetry traces
+- graph steps, checkpoint writes and LLM calls per claim
+- checkpoint bytes and pending-write bytes per claim, and checkpointer time per step
+- peak RSS
+
+and exits non-zero when throughput, any node's p95, peak RSS or checkpoint
+bytes regress past the stored baseline by more than ``--tolerance``. Baselines
+are only compared when they were recorded with the same settings.
+
+``--ocr text`` feeds each receipt's printed text as pre-OCR'd input;
+``--ocr tesseract`` renders the images, uploads them to the blob store and OCRs them; ``auto`` (the default)
+uses Tesseract when it is installed.
+
+Usage:
+    python tests/benchmarks/workflow_benchmark.py [--claims 200] [--concurrency 1]
+        [--llm-latency-ms 25] [--clarify-rate 0.1] [--ocr auto] [--backend sqlite] [--routing supervisor]
+        [--analysis parallel]
+        [--tolerance 0.25] [--update-baseline]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.insert(0, root_dir)
+
+from synthetic_receipts import SyntheticReceipt, generate_receipts
+
+BASELINE_PATH = os.path.join(current_dir, "baselines", "workflow_benchmark.json")
+
+# Settings that must match for a baseline comparison to be meaningful
+CONFIG_KEYS = ["claims", "warmup", "concurrency", "llm_latency_ms", "clarify_rate", "ocr", "backend", "routing", "analysis", "seed"]
+
+# Answer given to every HITL question
+HITL_ANSWER = "Sales, client meeting"
+
+def isolate_environment(work_dir: str, backend: str) -> None:
+    """Point every cache and store at ``work_dir``; must run before ``src`` is imported"""
+    os.environ.update({
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY") or "offline-benchmark",
+        "CHECKPOINT_BACKEND": backend,
+        "CHECKPOINT_DB_PATH": os.path.join(work_dir, "checkpoints.sqlite"),
+        "LLM_CACHE_ENABLED": "false",
+        "OCR_CACHE_PATH": os.path.join(work_dir, "ocr_cache.sqlite"),
+        "BLOB_STORE_PATH": os.path.join(work_dir, "blobs"),
+        "CLAIM_INDEX_PATH": os.path.join(work_dir, "claim_index.sqlite"),
+        "CLAIM_CLASSIFIER_PATH": os.path.join(work_dir, "claim_classifier.sqlite"),
+        "SPEND_LEDGER_PATH": os.path.join(work_dir, "spend_ledger.sqlite"),
+        "GAZETTEER_LEARNED_PATH": os.path.join(work_dir, "gazetteer_learned.jsonl"),
+        "TRACE_PATH": os.path.join(work_dir, "traces.jsonl"),
+        "METRICS_PATH": os.path.join(work_dir, "metrics.prom"),
+        "METRICS_PORT": "0",
+    })
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process; None where ``resource`` is unavailable (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def tesseract_available() -> bool:
+    from src.utils import ocr  # Applies TESSERACT_CMD
+    try:
+        ocr.pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def initial_state(receipt: SyntheticReceipt, index: int, use_images: bool) -> Dict[str, Any]:
+    """Workflow input for one receipt, as app.py builds it"""
+    blob = None
+    if use_images:
+        from src.utils.blob_store import get_blob_store
+        blob = get_blob_store().put_bytes(receipt.png_bytes(), "image/png", f"{receipt.name}.png")
+    return dict(
+        receipt_blob=blob,
+        receipt_image=None,
+        ocr_text=None if use_images else receipt.text,
+        ocr_complete=False,
+        amount=None, currency=None, expense_date=None, merchant=None,
+        pickup_location=None, dropoff_location=None,
+        country=None, city=None, country_identified=False,
+        department=None, purpose=None, classification_confidence=None, department_confirmed=False,
+        needs_clarification=False, clarification_questions=[], user_provided_context=None,
+        rules_applied=False, applied_rule=None, requires_manager_approval=None, approval_status=None,
+        policy_violation=False, violations=[], current_agent=None, messages=[],
+        employee_id=f"emp_{index % 50:03d}",
+        approval_determined=False,
+    )
+
+def run_claim(app, thread_id: str, state: Dict[str, Any]) -> int:
+    """Run one claim to completion, answering HITL questions; returns the number of resumes"""
+    from langgraph.types import Command
+
+    config = {"configurable": {"thread_id": thread_id}}
+    app.invoke(state, config)
+    resumes = 0
+    while app.get_state(config).next and resumes < 3:
+        app.invoke(Command(resume=HITL_ANSWER), config)
+        resumes += 1
+    return resumes
+
+async def arun_claim(app, thread_id: str, make_state: Callable[[], Dict[str, Any]], semaphore: asyncio.Semaphore) -> int:
+    """Async variant of run_claim, bounded by ``semaphore``; the input is built once a slot is free"""
+    from langgraph.types import Command
+
+    config = {"configurable": {"thread_id": thread_id}}
+    async with semaphore:
+        await app.ainvoke(make_state(), config)
+        resumes = 0
+        while (await app.aget_state(config)).next and resumes < 3:
+            await app.ainvoke(Command(resume=HITL_ANSWER), config)
+            resumes += 1
+    return resumes
+
+def run_claims(app, receipts: List[SyntheticReceipt], prefix: str, concurrency: int, use_images: bool) -> int:
+    """Run every claim, serially on the sync app or concurrently on the async one
+
+    Inputs (and receipt images) are built as claims start, so rendering does not
+    inflate peak RSS.
+    """
+    if concurrency <= 1:
+        return sum(
+            run_claim(app, f"{prefix}-{index}", initial_state(receipt, index, use_images))
+            for index, receipt in enumerate(receipts)
+        )
+
+    async def run_all() -> List[int]:
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(
+            arun_claim(app, f"{prefix}-{index}", partial(initial_state, receipt, index, use_images), semaphore)
+            for index, receipt in enumerate(receipts)
+        ))
+    return sum(asyncio.run(run_all()))
+
+class CheckpointMeter:
+    """Times every checkpoint and pending-writes save on a saver, and sizes the writes"""
+
+    def __init__(self, saver):
+        self.saves = 0
+        self.seconds = 0.0
+        self.write_bytes = 0
+        self._lock = threading.Lock()
+        put, put_writes = saver.put, saver.put_writes
+
+        def timed_put(*args, **kwargs):
+            start = time.perf_counter()
+            result = put(*args, **kwargs)
+            self._add(time.perf_counter() - start)
+            return result
+
+        def timed_put_writes(config, writes, *args, **kwargs):
+            start = time.perf_counter()
+            put_writes(config, writes, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+            # Sized after timing: re-serializing is measurement overhead only
+            self._add(elapsed, sum(len(saver.serde.dumps_typed(value)[1]) for _, value in writes))
+
+        # The async savers delegate to these, so both apps are covered
+        saver.put, saver.put_writes = timed_put, timed_put_writes
+
+    def _add(self, seconds: float, write_bytes: int = 0) -> None:
+        with self._lock:
+            self.saves += 1
+            self.seconds += seconds
+            self.write_bytes += write_bytes
+
+    def reset(self) -> None:
+        with self._lock:
+            self.saves, self.seconds, self.write_bytes = 0, 0.0, 0
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+def summarize_traces(path: str) -> Dict[str, Any]:
+    """Per-node latency percentiles and per-claim LLM usage from a trace file"""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    claims = steps = llm_calls = tokens = 0
+    with open(path) as f:
+        for line in f:
+            trace = json.loads(line)
+            claims += 1
+            steps += len(trace["nodes"])
+            llm_calls += len(trace["llm_calls"])
+            tokens += trace["llm_tokens"]["prompt"] + trace["llm_tokens"]["completion"]
+            for node in trace["nodes"]:
+                durations[node["node"]].append(node["duration_ms"])
+    return {
+        "traced_claims": claims,
+        "steps_per_claim": round(steps / max(claims, 1), 3),
+        "llm_calls_per_claim": round(llm_calls / max(claims, 1), 3),
+        "llm_tokens_per_claim": round(tokens / max(claims, 1), 1),
+        "nodes": {name: {"runs": len(values), **percentiles(values)} for name, values in sorted(durations.items())},
+    }
+
+def run_benchmark(args: argparse.Namespace, work_dir: str) -> Dict[str, Any]:
+    isolate_environment(work_dir, args.backend)
+
+    from fake_llm import FakeChatModel
+    from src.utils.checkpointing import create_checkpointer
+    from src.utils.llm_client import set_llm
+    from src.utils.telemetry import Telemetry, set_telemetry
+    from src.workflow import build_expense_workflow
+
+    use_images = args.ocr == "tesseract"
+    fake = FakeChatModel(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_latency_ms * 0.2, clarify_rate=args.clarify_rate)
+    set_llm(fake)
+
+    checkpointer = create_checkpointer(args.backend)
+    meter = CheckpointMeter(checkpointer)
+    app = build_expense_workflow(use_async=args.concurrency > 1, checkpointer=checkpointer, routing_mode=args.routing,
+                                 parallel_analysis=args.analysis == "parallel")
+
+    receipts = generate_receipts(args.warmup + args.claims, seed=args.seed)
+
+    set_telemetry(Telemetry(trace_path=os.path.join(work_dir, "warmup_traces.jsonl"), metrics_path=None))
+    run_claims(app, receipts[:args.warmup], "warmup", args.concurrency, use_images)
+
+    trace_path = os.path.join(work_dir, "traces.jsonl")
+    telemetry = set_telemetry(Telemetry(trace_path=trace_path, metrics_path=None, flush_interval=float("inf")))
+    calls_before = fake.calls
+    meter.reset()
+    start = time.perf_counter()
+    resumes = run_claims(app, receipts[args.warmup:], "claim", args.concurrency, use_images)
+    wall = time.perf_counter() - start
+
+    checkpoints = telemetry.registry.snapshot().get("expense_checkpoint_bytes", {}).get("total")
+    traces = summarize_traces(trace_path)
+    steps = traces["steps_per_claim"] * args.claims
+    return {
+        "config": {key: getattr(args, key) for key in CONFIG_KEYS},
+        "claims_per_sec": round(args.claims / wall, 2),
+        "wall_seconds": round(wall, 3),
+        "hitl_resumes": resumes,
+        "llm_requests": fake.calls - calls_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "checkpoint_writes_per_claim": round(checkpoints["count"] / args.claims, 3) if checkpoints else None,
+        "checkpoint_bytes_per_claim": round(checkpoints["sum"] / args.claims) if checkpoints else None,
+        "write_bytes_per_claim": round(meter.write_bytes / args.claims),
+        "checkpointer_ms_per_step": round(meter.seconds * 1000 / max(steps, 1), 3),
+        **traces,
+    }
+
+def print_report(result: Dict[str, Any]) -> None:
+    config = result["config"]
+    print(f"\n=== Workflow benchmark: {config['claims']} claims, concurrency {config['concurrency']}, "
+          f"ocr={config['ocr']}, backend={config['backend']}, {config['routing']} routing, "
+          f"{config['analysis']} analysis, LLM latency {config['llm_latency_ms']} ms ===")
+    print(f"Throughput:          {result['claims_per_sec']:.2f} claims/sec ({result['wall_seconds']:.2f}s)")
+    print(f"Graph steps:         {result['steps_per_claim']:.2f} per claim")
+    print(f"LLM calls per claim: {result['llm_calls_per_claim']:.2f} (~{result['llm_tokens_per_claim']:.0f} tokens)")
+    print(f"HITL resumes:        {result['hitl_resumes']}")
+    if result["peak_rss_mb"] is not None:
+        print(f"Peak RSS:            {result['peak_rss_mb']:.1f} MB")
+    if result["checkpoint_bytes_per_claim"] is not None:
+        print(f"Checkpoint writes:   {result['checkpoint_writes_per_claim']:.2f} per claim")
+        print(f"Checkpoint bytes:    {result['checkpoint_bytes_per_claim']:,} per claim")
+    print(f"Pending writes:      {result['write_bytes_per_claim']:,} bytes per claim")
+    print(f"Checkpointer time:   {result['checkpointer_ms_per_step']:.3f} ms per step")
+    print(f"\n{'node':<20}{'runs':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in result["nodes"].items():
+        print(f"{name:<20}{stats['runs']:>7}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, slack_ms: float) -> List[str]:
+    """Regressions of ``result`` against ``baseline``"""
+    failures = []
+    if result["claims_per_sec"] < baseline["claims_per_sec"] * (1 - tolerance):
+        failures.append(f"throughput {result['claims_per_sec']:.2f} < baseline {baseline['claims_per_sec']:.2f} claims/sec")
+    for key, unit in (("peak_rss_mb", "MB"), ("checkpoint_bytes_per_claim", "bytes"), ("write_bytes_per_claim", "bytes")):
+        current, previous = result.get(key), baseline.get(key)
+        if current is not None and previous is not None and current > previous * (1 + tolerance):
+            failures.append(f"{key} {current} > baseline {previous} {unit}")
+    for name, stats in result["nodes"].items():
+        previous = baseline["nodes"].get(name)
+        # Sub-millisecond nodes are noisy, so allow an absolute slack on top of the ratio
+        if previous and stats["p95"] > previous["p95"] * (1 + tolerance) + slack_ms:
+            failures.append(f"{name} p95 {stats['p95']:.2f} ms > baseline {previous['p95']:.2f} ms")
+    return failures
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--claims", type=int, default=200, help="Measured claims")
+    parser.add_argument("--warmup", type=int, default=10, help="Claims run before measuring")
+    parser.add_argument("--concurrency", type=int, default=1, help="1 runs the sync app; more runs the async app concurrently")
+    parser.add_argument("--llm-latency-ms", type=float, default=25.0, help="Simulated LLM round trip")
+    parser.add_argument("--clarify-rate", type=float, default=0.1, help="Fraction of classifications that need HITL")
+    parser.add_argument("--ocr", choices=["auto", "tesseract", "text"], default="auto")
+    parser.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite", help="Checkpointer backend")
+    parser.add_argument("--routing", choices=["supervisor", "direct"], default="supervisor", help="Workflow routing mode")
+    parser.add_argument("--analysis", choices=["parallel", "sequential"], default="parallel",
+                        help="Run location analysis and classification as parallel branches or one after the other")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="Allowed absolute p95 regression per node")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--json", action="store_true", help="Print the raw result as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="workflow_benchmark_") as work_dir:
+        if args.ocr == "auto":
+            isolate_environment(work_dir, args.backend)
+            args.ocr = "tesseract" if tesseract_available() else "text"
+        result = run_benchmark(args, work_dir)
+
+    print_report(result)
+    if args.json:
+        print(json.dumps(result, indent=2))
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != result["config"]:
+        print(f"\nBaseline was recorded with different settings ({baseline.get('config')}); not comparing")
+        return 0
+
+    failures = compare(result, baseline, args.tolerance, args.slack_ms)
+    if failures:
+        print("\n=== PERFORMANCE REGRESSION ===")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print(f"\n=== WITHIN {args.tolerance:.0%} OF BASELINE ===")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""Shared pytest setup: make ``src`` importable when running ``pytest`` from the repo root"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
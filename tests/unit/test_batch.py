@@ -0,0 +1,34 @@
+"""Batch ingestion: OCR through the cache, fingerprints and duplicates per claim"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.batch import store_and_ocr
+from src.utils import ocr_cache
+from src.utils.ocr_cache import OCRCache
+
+RECEIPT_TEXT = "UBER RECEIPT\nDate: 2025-10-30\nAmount: $45.67\nPickup: Downtown Office\nDropoff: Airport\n"
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = OCRCache(":memory:")
+    monkeypatch.setattr(ocr_cache, "get_ocr_cache", lambda: cache)
+    monkeypatch.setattr(ocr_cache, "run_ocr", lambda image, steps=None: RECEIPT_TEXT)
+    return cache
+
+def _receipt_file(path):
+    image = Image.new("RGB", (300, 400), "white")
+    ImageDraw.Draw(image).text((20, 20), "UBER 45.67", fill="black")
+    image.save(path)
+    return str(path)
+
+def test_batch_ocr_fingerprints_claims_and_finds_resubmissions(tmp_path, cache):
+    path = _receipt_file(tmp_path / "receipt.png")
+    blob, claims, receipts, _ = store_and_ocr(path, str(tmp_path / "blobs"), "batch_0", "emp_1")
+    assert len(claims) == len(receipts) == 1
+    assert receipts[0]["receipt_hash"] and receipts[0]["duplicate_receipt"] is None
+
+    _, _, again, _ = store_and_ocr(path, str(tmp_path / "blobs"), "batch_1", "emp_1")
+    assert again[0]["receipt_hash"] == receipts[0]["receipt_hash"]
+    assert again[0]["duplicate_receipt"]["thread_id"] == "batch_0"
+    assert cache.stats()["exact_hits"] == 1
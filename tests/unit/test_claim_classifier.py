@@ -0,0 +1,84 @@
+"""Past-claim classifier: predictions and the background warm-up"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from src.utils import claim_classifier
+from src.utils.claim_classifier import ClaimClassifier, ClaimKey
+
+KEY = ClaimKey("emp_1", "uber", "office", "airport", 1)
+
+def test_predicts_once_enough_past_claims_agree():
+    classifier = ClaimClassifier(":memory:")
+    for number in range(3):
+        classifier.record(f"c{number}", KEY, "Sales", "Client Meeting")
+    prediction = classifier.predict(KEY)
+    assert (prediction.department, prediction.purpose, prediction.support) == ("Sales", "Client Meeting", 3)
+    assert classifier.predict(KEY._replace(employee_id="emp_2")) is None
+
+@pytest.fixture
+def slow_build(monkeypatch):
+    """Process-wide classifier whose index build waits for the returned event"""
+    release = threading.Event()
+
+    def build():
+        release.wait(5)
+        return ClaimClassifier(":memory:")
+
+    monkeypatch.setattr(claim_classifier, "ClaimClassifier", build)
+    monkeypatch.setattr(claim_classifier, "CLAIM_CLASSIFIER_ENABLED", True)
+    monkeypatch.setattr(claim_classifier, "_classifier", None)
+    monkeypatch.setattr(claim_classifier, "_warmup", None)
+    monkeypatch.setattr(claim_classifier, "_pending", [])
+    monkeypatch.setattr(claim_classifier, "_failed_at", None)
+    return release
+
+def test_request_path_does_not_wait_for_warm_up(slow_build):
+    thread = claim_classifier.warm_claim_classifier()
+    assert thread is not None and thread.is_alive()
+    assert claim_classifier.get_claim_classifier(wait=False) is None
+    assert claim_classifier.warm_claim_classifier() is thread
+
+    slow_build.set()
+    assert claim_classifier.get_claim_classifier() is not None
+    assert claim_classifier.warm_claim_classifier() is None
+
+def test_labels_finalized_during_warm_up_are_kept(slow_build):
+    claim_classifier.warm_claim_classifier()
+    claim_classifier.record_classification("c1", KEY, "Sales", "Client Meeting")
+    slow_build.set()
+    classifier = claim_classifier.get_claim_classifier()
+    claim_classifier.record_classification("c2", KEY, "Sales", "Client Meeting")
+    assert classifier.stats()["claims"] == 2
+    assert claim_classifier._pending == []
+
+def test_failed_build_backs_off_and_drops_the_queue(slow_build, monkeypatch):
+    builds = []
+
+    def broken():
+        builds.append(1)
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(claim_classifier, "ClaimClassifier", broken)
+    claim_classifier.record_classification("c1", KEY, "Sales", "Client Meeting")
+    claim_classifier._warmup.join()
+    assert claim_classifier._pending == []
+
+    for number in range(3):
+        assert claim_classifier.get_claim_classifier() is None
+        claim_classifier.record_classification(f"c{number + 2}", KEY, "Sales", "Client Meeting")
+    assert len(builds) == 1  # No rebuild while backing off
+
+    monkeypatch.setattr(claim_classifier, "CLAIM_CLASSIFIER_RETRY_SECONDS", 0)
+    claim_classifier.get_claim_classifier()
+    assert len(builds) == 2
+
+def test_pending_queue_is_capped(slow_build, monkeypatch):
+    monkeypatch.setattr(claim_classifier, "CLAIM_CLASSIFIER_MAX_PENDING", 2)
+    for number in range(5):
+        claim_classifier.record_classification(f"c{number}", KEY, "Sales", "Client Meeting")
+    assert len(claim_classifier._pending) == 2
+    slow_build.set()
+    assert claim_classifier.get_claim_classifier().stats()["claims"] == 2
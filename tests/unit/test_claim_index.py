@@ -0,0 +1,85 @@
+"""Indexed claim history: exact and near duplicates, amount outliers"""
+
+import pytest
+
+from src.utils.claim_index import ClaimIndex, ClaimRecord
+
+@pytest.fixture
+def index(tmp_path):
+    return ClaimIndex(str(tmp_path / "claims.sqlite"), window_days=3, amount_tolerance=0.1, min_samples=5, z_threshold=3.0)
+
+def _claim(claim_id, amount=45.0, expense_date="2025-03-10", currency="USD", merchant="Uber", employee_id="emp_1",
+           pickup="Office", dropoff="Airport"):
+    return ClaimRecord.from_state({
+        "employee_id": employee_id, "merchant": merchant, "amount": amount, "currency": currency,
+        "expense_date": expense_date, "pickup_location": pickup, "dropoff_location": dropoff,
+    }, claim_id)
+
+def test_exact_duplicate(index):
+    index.record(_claim("a"))
+    match = index.find_exact(_claim("b", merchant="  UBER "))
+    assert match["claim_id"] == "a"
+    assert match["amount"] == 45.0
+
+def test_exact_duplicate_needs_same_currency(index):
+    index.record(_claim("a", currency="EUR"))
+    assert index.find_exact(_claim("b", currency="USD")) is None
+    assert index.find_exact(_claim("c", currency="eur"))["claim_id"] == "a"
+
+def test_exact_duplicate_ignores_itself_and_other_employees(index):
+    index.record(_claim("a"))
+    assert index.find_exact(_claim("a")) is None
+    assert index.find_exact(_claim("b", employee_id="emp_2")) is None
+
+def test_near_duplicate_inside_window_and_tolerance(index):
+    index.record(_claim("a", amount=45.0, expense_date="2025-03-10", pickup=None))
+    assert [m["claim_id"] for m in index.find_near(_claim("b", amount=47.0, expense_date="2025-03-12", pickup=None))] == ["a"]
+    assert index.find_near(_claim("c", amount=47.0, expense_date="2025-03-14", pickup=None)) == []  # outside the window
+    assert index.find_near(_claim("d", amount=60.0, expense_date="2025-03-11", pickup=None)) == []  # amount too different
+    assert index.find_near(_claim("e", amount=47.0, expense_date="2025-03-11", pickup=None, currency="GBP")) == []
+
+def test_near_duplicate_needs_merchant_and_route(index):
+    index.record(_claim("a", amount=45.0))
+    assert [m["claim_id"] for m in index.find_near(_claim("b", amount=44.0))] == ["a"]
+    assert index.find_near(_claim("c", amount=44.0, merchant="Lyft")) == []
+    assert index.find_near(_claim("d", amount=44.0, dropoff="Hotel")) == []
+    index.record(_claim("e"))
+    assert "e" not in [m["claim_id"] for m in index.find_near(_claim("f"))]  # exact duplicates are reported separately
+
+def test_daily_commute_is_not_a_near_duplicate(index):
+    for day in range(3, 10):
+        index.record(_claim(f"commute_{day}", amount=45.0 + day % 2, expense_date=f"2025-03-{day:02d}"))
+    assert index.find_near(_claim("next", amount=45.5, expense_date="2025-03-10")) == []
+
+def test_near_duplicate_reads_nearest_days_first(tmp_path):
+    index = ClaimIndex(str(tmp_path / "claims.sqlite"), window_days=3, amount_tolerance=0.1, max_candidates=2)
+    for claim_id, expense_date in [("far_1", "2025-03-07"), ("far_2", "2025-03-13"), ("far_3", "2025-03-08"), ("near", "2025-03-10")]:
+        index.record(_claim(claim_id, amount=100.0, expense_date=expense_date, pickup=None))
+    matches = index.find_near(_claim("new", amount=101.0, expense_date="2025-03-10", pickup=None))
+    assert [m["claim_id"] for m in matches][0] == "near"
+
+def test_outlier_after_enough_history(index):
+    for i, amount in enumerate([20.0, 22.0, 21.0, 19.0, 23.0, 20.5]):
+        index.record(_claim(f"h{i}", amount=amount, expense_date=f"2025-01-{i + 1:02d}"))
+    assert index.find_outliers(_claim("normal", amount=22.0)) == []
+    findings = index.find_outliers(_claim("big", amount=200.0))
+    assert {finding.group for finding in findings} == {"merchant:uber", "route:office -> airport"}
+    assert all(finding.samples == 6 for finding in findings)
+
+def test_check_keeps_outliers_out_of_the_statistics(index):
+    for i in range(6):
+        index.record(_claim(f"h{i}", amount=20.0 + i % 3, expense_date=f"2025-01-{i + 1:02d}"))
+    _, _, outliers = index.check(_claim("big", amount=500.0, expense_date="2025-02-01"))
+    assert outliers
+    _, _, outliers = index.check(_claim("big2", amount=500.0, expense_date="2025-03-01"))
+    assert outliers
+
+def test_record_is_idempotent_per_claim_id(index):
+    assert index.record(_claim("a"))
+    assert not index.record(_claim("a"))
+    assert index.stats()["claims"] == 1
+
+def test_invalid_dates_skip_date_checks(index):
+    index.record(_claim("a", expense_date="2025-13-40"))
+    assert index.find_exact(_claim("b", expense_date="2025-13-40")) is None
+    assert index.find_near(_claim("c", expense_date="2025-13-40")) == []
@@ -0,0 +1,87 @@
+"""Page-by-page document ingestion: claim splitting, early stop and page preprocessing"""
+
+from PIL import Image
+
+from src.utils.document_ingest import PAGE_PREPROCESS_STEPS, Page, _iter_tiles, iter_document_claims, read_first_claim
+
+UBER = "UBER RECEIPT\nDate: 2025-03-01\nAmount: $12.50\nPickup: Office\nDropoff: Airport\n"
+LYFT = "LYFT RECEIPT\nDate: 2025-03-02\nAmount: $20.00\nPickup: Hotel\nDropoff: Client HQ\n"
+FOLIO_1 = "GRAND PLAZA HOTEL\nGuest folio\nArrival 03/14/2025\n03/14/2025 Room 189.00\n"
+FOLIO_2 = "03/15/2025 Room 189.00\n03/15/2025 Breakfast 34.50\nTotal USD 412.50\n\n03/16/2025 Visa payment -412.50\n"
+
+def _pages(*texts):
+    read = []
+
+    def pages():
+        for number, text in enumerate(texts, 1):
+            read.append(number)
+            yield Page(number, text=text)
+    return pages(), read
+
+def _no_ocr(image, steps=None):
+    raise AssertionError("text pages are never OCR'd")
+
+def test_statement_splits_into_one_claim_per_receipt():
+    pages, _ = _pages(UBER + "\n" + LYFT, UBER.replace("2025-03-01", "2025-03-03"))
+    claims = list(iter_document_claims(pages, _no_ocr))
+    assert [claim.text.splitlines()[0] for claim in claims] == ["UBER RECEIPT", "LYFT RECEIPT", "UBER RECEIPT"]
+    assert all(claim.complete for claim in claims)
+    assert [claim.pages for claim in claims] == [[1], [1], [2]]
+
+def test_folio_without_a_template_is_one_complete_claim():
+    pages, _ = _pages(FOLIO_1, FOLIO_2)
+    claims = list(iter_document_claims(pages, _no_ocr))
+    assert len(claims) == 1  # The payment trailer has no amount of its own
+    assert claims[0].complete
+    assert claims[0].pages == [1, 2]
+    assert "Total USD 412.50" in claims[0].text
+
+def test_folios_back_to_back_split():
+    second = FOLIO_1.replace("GRAND PLAZA", "HARBOUR VIEW").replace("03/14", "04/02")
+    pages, _ = _pages(FOLIO_1 + FOLIO_2, second + "Total USD 99.00\n")
+    claims = list(iter_document_claims(pages, _no_ocr))
+    assert len(claims) == 2
+    assert all(claim.complete for claim in claims)
+
+def test_max_claims_stops_reading_pages():
+    pages, read = _pages(FOLIO_1 + FOLIO_2, UBER, LYFT)
+    claims = list(iter_document_claims(pages, _no_ocr, max_claims=1))
+    assert len(claims) == 1 and claims[0].complete
+    assert read == [1]
+
+def test_incomplete_document_is_still_returned():
+    pages, read = _pages("Some scanned page\nwith no totals", "and another")
+    claims = list(iter_document_claims(pages, _no_ocr, max_claims=1))
+    assert len(claims) == 1 and not claims[0].complete
+    assert read == [1, 2]
+
+def test_image_pages_get_their_preprocessing_steps():
+    calls = []
+
+    def ocr(image, steps=None):
+        calls.append(steps)
+        return UBER
+
+    tall = Image.new("L", (100, 1000), 255)
+    regular = Image.new("L", (100, 150), 255)
+    list(iter_document_claims(_iter_tiles(tall, max_pages=20), ocr))
+    list(iter_document_claims(_iter_tiles(regular, max_pages=20), ocr))
+    assert calls[0] == PAGE_PREPROCESS_STEPS
+    assert calls[-1] is None  # A single photo gets the full pipeline
+    assert "crop" not in PAGE_PREPROCESS_STEPS and "downscale" not in PAGE_PREPROCESS_STEPS
+
+def test_first_claim_counts_what_it_skips():
+    pages = [Page(1, text=UBER + "\n" + LYFT, count=3), Page(2, text=UBER, count=3), Page(3, text=LYFT, count=3)]
+    first = read_first_claim((page for page in pages), _no_ocr)
+    assert first.claim.text.startswith("UBER RECEIPT")
+    assert first.more_claims == 1  # The Lyft receipt after it on page 1
+    assert first.unread_pages == 2
+
+def test_first_claim_of_a_single_receipt_skips_nothing():
+    first = read_first_claim((page for page in [Page(1, text=UBER, count=1)]), _no_ocr)
+    assert first.claim.complete
+    assert (first.more_claims, first.unread_pages) == (0, 0)
+
+def test_tiles_know_their_count():
+    tiles = [(page.number, page.count) for page in _iter_tiles(Image.new("L", (100, 1000), 255), max_pages=20)]
+    assert tiles[-1][0] == tiles[0][1] > 1
@@ -0,0 +1,35 @@
+"""Exception handler: which findings send a claim to a manager"""
+
+import pytest
+
+from src.agents import exception_handler
+from src.utils import claim_index
+from src.utils.claim_index import ClaimIndex
+
+@pytest.fixture
+def index(monkeypatch):
+    index = ClaimIndex(":memory:")
+    monkeypatch.setattr(claim_index, "get_claim_index", lambda: index)
+    return index
+
+def _state(**extra):
+    return dict({
+        "employee_id": "emp_1", "merchant": "Uber", "amount": 45.0, "currency": "USD", "expense_date": "2025-03-10",
+        "pickup_location": None, "dropoff_location": None, "violations": [], "approval_status": "auto_approved",
+    }, **extra)
+
+def _run(state, thread_id):
+    return exception_handler.exception_handler_agent_node(state, {"configurable": {"thread_id": thread_id}}).update
+
+def test_exact_duplicate_goes_to_a_manager(index):
+    _run(_state(), "a")
+    update = _run(_state(), "b")
+    assert [v["type"] for v in update["violations"]] == ["duplicate_claim"]
+    assert update["approval_status"] == "requires_manager"
+
+def test_near_duplicate_is_reported_without_escalating(index):
+    _run(_state(), "a")
+    update = _run(_state(amount=46.0, expense_date="2025-03-11"), "b")
+    assert [v["type"] for v in update["violations"]] == ["near_duplicate_claim"]
+    assert update["policy_violation"] and update["messages"]
+    assert "approval_status" not in update and "requires_manager_approval" not in update
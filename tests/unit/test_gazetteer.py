@@ -0,0 +1,75 @@
+"""Offline gazetteer: country resolution, common-word cities and memoized LLM answers"""
+
+import json
+
+import pytest
+
+from src.utils.gazetteer import Gazetteer
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    return Gazetteer(learned_path=str(tmp_path / "learned.jsonl"))
+
+def test_resolves_city_landmark_and_airport(gazetteer):
+    assert gazetteer.resolve("Downtown Office", "Paris, France").country == "France"
+    assert gazetteer.resolve("Times Square", "JFK Airport").city == "New York"
+    assert gazetteer.resolve("Marina Bay", "Singapore").city == "Singapore"
+
+def test_conflicting_countries_fall_back_to_llm(gazetteer):
+    assert gazetteer.resolve("London Heathrow", "Paris") is None
+
+def test_common_word_city_needs_a_second_signal(gazetteer):
+    assert gazetteer.resolve("Nice restaurant", "Hotel lobby") is None
+    assert gazetteer.resolve("Washington St", "Main St") is None
+    assert gazetteer.resolve("Nice airport", "Promenade, Nice, France").city == "Nice"
+
+def test_unconfirmed_common_word_city_is_ignored(gazetteer):
+    place = gazetteer.resolve("Nice restaurant", "London Heathrow")
+    assert place.country == "United Kingdom"
+    assert gazetteer.resolve("Times Square", "Phoenix Hotel").city == "New York"
+
+@pytest.mark.parametrize("answer, country", [
+    ("UK", "United Kingdom"),
+    ("United Kingdom.", "United Kingdom"),
+    ("The country is United Kingdom.", "United Kingdom"),
+    ("USA", "United States"),
+    ("U.S.", "United States"),
+    ("france", "France"),
+    ("Germany or France", None),
+    ("Narnia", None),
+    ("", None),
+])
+def test_canonical_country(gazetteer, answer, country):
+    assert gazetteer.canonical_country(answer) == country
+
+def test_remember_keeps_known_countries_once(gazetteer, tmp_path):
+    gazetteer.remember("Office", "Client HQ", "The country is United Kingdom.")
+    gazetteer.remember("Office", "Client HQ", "UK")
+    gazetteer.remember("Office", "Warehouse", "Narnia")
+
+    lines = (tmp_path / "learned.jsonl").read_text().splitlines()
+    assert [json.loads(line)["country"] for line in lines] == ["United Kingdom"]
+    assert gazetteer.resolve("office", "client hq").source == "learned"
+    assert gazetteer.resolve("Office", "Warehouse") is None
+
+def test_remember_skips_claims_without_a_route(gazetteer, tmp_path):
+    gazetteer.remember(None, "  ", "UK")
+    gazetteer.remember("", "!!", "France")
+
+    assert not (tmp_path / "learned.jsonl").exists()
+    assert gazetteer.resolve(None, None) is None
+
+def test_learned_file_is_compacted_on_load(tmp_path):
+    path = tmp_path / "learned.jsonl"
+    path.write_text(
+        '{"key": "a|b", "country": "The country is UK.", "city": null}\n'
+        '{"key": "a|b", "country": "UK", "city": null}\n'
+        '{"key": "c|d", "country": "somewhere", "city": null}\n'
+        '{"key": "|", "country": "France", "city": null}\n'
+    )
+    gazetteer = Gazetteer(learned_path=str(path))
+
+    assert gazetteer.resolve("a", "b").country == "United Kingdom"
+    assert gazetteer.resolve("c", "d") is None
+    assert gazetteer.resolve(None, None) is None
+    assert len(path.read_text().splitlines()) == 1
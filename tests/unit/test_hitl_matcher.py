@@ -0,0 +1,78 @@
+"""HITL answers: option numbers, ordinals, fuzzy matching and partial answers"""
+
+import pytest
+
+from src.agents.finalize import _record_classification
+from src.agents.hitl import _user_response_update
+from src.utils import claim_classifier
+from src.utils.hitl_matcher import AnswerMatch, AnswerMatcher
+
+OPTIONS = [
+    {"department": "Sales", "purpose": "Client Meeting"},
+    {"department": "Engineering", "purpose": "Commute"},
+]
+
+@pytest.fixture(scope="module")
+def matcher():
+    return AnswerMatcher()
+
+@pytest.mark.parametrize("answer, expected", [
+    ("2", OPTIONS[1]),
+    ("#1", OPTIONS[0]),
+    ("1.", OPTIONS[0]),
+    ("the second one", OPTIONS[1]),
+    ("first", OPTIONS[0]),
+])
+def test_option_numbers_and_ordinals(matcher, answer, expected):
+    assert matcher.match(answer, OPTIONS) == AnswerMatch(expected["department"], expected["purpose"], "option")
+
+def test_option_number_out_of_range_goes_to_the_llm(matcher):
+    assert matcher.match("3", OPTIONS) is None
+    assert matcher.match("fifth", OPTIONS) is None
+
+@pytest.mark.parametrize("answer, department, purpose", [
+    ("Sales, client meeting", "Sales", "Client Meeting"),
+    ("marketing conference", "Marketing", "Conference"),
+    ("It was for a clinet meeting, sales team", "Sales", "Client Meeting"),
+    ("client meeting", None, "Client Meeting"),
+    ("Sales", "Sales", None),
+])
+def test_fuzzy_matches(matcher, answer, department, purpose):
+    assert matcher.match(answer, OPTIONS) == AnswerMatch(department, purpose, "fuzzy")
+
+@pytest.mark.parametrize("answer", [
+    "sales and marketing",  # ambiguous department
+    "Sales, but really it was for the hiring event in Paris",  # mostly unmatched
+    " ".join(["sales"] * 30),  # too long
+    "",
+])
+def test_unclear_answers_go_to_the_llm(matcher, answer):
+    assert matcher.match(answer, OPTIONS) is None
+
+def test_offered_options_extend_the_vocabulary(matcher):
+    options = [{"department": "Sales", "purpose": "Roadshow Prep"}]
+    assert matcher.match("roadshow prep", options).purpose == "Roadshow Prep"
+
+GUESS = {"department": "Marketing", "purpose": "Conference", "employee_id": "emp_1", "merchant": "Uber",
+         "expense_date": "2025-03-10", "department_confirmed": False}
+
+def test_full_answer_is_a_hitl_classification():
+    update = _user_response_update(GUESS, "Sales, client meeting", {"department": "Sales", "purpose": "Client Meeting"}, "fuzzy")
+    assert update["classification_path"] == "hitl"
+    assert (update["department"], update["purpose"]) == ("Sales", "Client Meeting")
+
+def test_partial_answer_keeps_the_guess_but_is_not_learned(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(claim_classifier, "record_classification", lambda *args: recorded.append(args))
+
+    update = _user_response_update(GUESS, "Sales", {"department": "Sales", "purpose": None}, "fuzzy")
+    assert update["classification_path"] == "hitl_partial"
+    assert (update["department"], update["purpose"]) == ("Sales", "Conference")
+
+    config = {"configurable": {"thread_id": "claim-1"}}
+    _record_classification({**GUESS, **update}, config)
+    assert recorded == []
+
+    full = _user_response_update(GUESS, "2", {"department": "Engineering", "purpose": "Commute"}, "option")
+    _record_classification({**GUESS, **full}, config)
+    assert [args[2:] for args in recorded] == [("Engineering", "Commute")]
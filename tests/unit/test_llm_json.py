@@ -0,0 +1,214 @@
+"""LLM JSON replies: object scanning, schema coercion and the JSON-mode fallback"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from src.utils.llm_client import LLMClient
+from src.utils.llm_json import (
+    JSONObjectScanner,
+    JSONSchema,
+    LLMOutputError,
+    SchemaField,
+    first_json_object,
+    parse_json_object,
+    parse_llm_json,
+)
+
+SCHEMA = JSONSchema("test", {
+    "amount": SchemaField(float, required=True),
+    "confidence": SchemaField(int, minimum=0, maximum=100),
+    "tags": SchemaField(list, default=[]),
+    "merchant": SchemaField(str),
+})
+
+def test_parse_fenced_and_prose_wrapped_objects():
+    fenced = 'Here you go:\n```json\n{"amount": 12.5}\n```\nAnything else?'
+    assert parse_json_object(fenced) == {"amount": 12.5}
+    assert parse_json_object('Sure {not json} then {"a": {"b": [1, 2]}} done') == {"a": {"b": [1, 2]}}
+
+def test_parse_ignores_braces_inside_strings():
+    assert parse_json_object('{"note": "use {curly} } braces", "n": 1}') == {"note": "use {curly} } braces", "n": 1}
+
+def test_truncated_reply_raises():
+    with pytest.raises(LLMOutputError):
+        parse_json_object('{"amount": 12.5, "merchant": "Caf')
+    with pytest.raises(LLMOutputError):
+        parse_json_object("no object here")
+
+def test_scanner_reports_object_when_closing_brace_arrives():
+    scanner = JSONObjectScanner()
+    chunks = ['Result: {"merchant": "A}', 'B \\"q\\"", ', '"items": [{"x": 1}]', "}", " trailing prose {"]
+    results = [scanner.feed(chunk) for chunk in chunks]
+    assert results[:3] == [None, None, None]
+    assert results[3] == {"merchant": 'A}B "q"', "items": [{"x": 1}]}
+    assert scanner.feed("more") == results[3]
+
+def test_scanner_handles_escape_split_across_chunks():
+    scanner = JSONObjectScanner()
+    assert scanner.feed('{"a": "x\\') is None
+    assert scanner.feed('"y"}') == {"a": 'x"y'}
+
+def test_scanner_skips_braces_in_prose():
+    assert first_json_object(["see {this} and ", '{"ok": ', "true}"]) == {"ok": True}
+
+def test_first_json_object_stops_consuming_the_stream():
+    consumed = []
+
+    def chunks():
+        for chunk in ['{"a":', " 1}", " ignored", " never read"]:
+            consumed.append(chunk)
+            yield chunk
+
+    assert first_json_object(chunks()) == {"a": 1}
+    assert consumed == ['{"a":', " 1}"]
+
+def test_truncated_stream_raises_on_finish():
+    with pytest.raises(LLMOutputError):
+        first_json_object(['{"amount": ', "12"])
+
+def test_schema_coerces_near_misses_and_drops_unknown_keys():
+    data = parse_llm_json('{"amount": "$1,045.67", "confidence": "92%", "tags": "travel", "merchant": " Cafe ", "extra": 1}', SCHEMA)
+    assert data == {"amount": 1045.67, "confidence": 92, "tags": ["travel"], "merchant": "Cafe"}
+
+def test_schema_applies_defaults():
+    assert parse_llm_json('{"amount": 3}', SCHEMA) == {"amount": 3.0, "tags": []}
+
+def test_mutable_defaults_are_not_shared_between_replies():
+    first = parse_llm_json('{"amount": 3}', SCHEMA)
+    first["tags"].append("changed")
+    assert parse_llm_json('{"amount": 3}', SCHEMA)["tags"] == []
+
+def test_schema_reports_every_problem():
+    with pytest.raises(LLMOutputError) as raised:
+        SCHEMA.validate({"confidence": 140, "tags": {"a": 1}, "merchant": ["x"]})
+    message = str(raised.value)
+    for problem in ("amount is missing", "confidence: 140", "tags:", "merchant:"):
+        assert problem in message
+
+def test_schema_rejects_booleans_as_numbers():
+    with pytest.raises(LLMOutputError):
+        SCHEMA.validate({"amount": True})
+
+class RejectedJSONMode(Exception):
+    status_code = 400
+
+class ScriptedModel:
+    """Chat model double that rejects response_format and replies with fixed text"""
+
+    cache = None
+
+    def __init__(self, reply, rejects_json_mode=True):
+        self.reply = reply
+        self.rejects_json_mode = rejects_json_mode
+        self.calls = []
+
+    def _check(self, kwargs):
+        self.calls.append(kwargs)
+        if self.rejects_json_mode and "response_format" in kwargs:
+            raise RejectedJSONMode("Error code: 400 - response_format json_object is not supported by this model")
+
+    def invoke(self, messages, **kwargs):
+        self._check(kwargs)
+        return AIMessage(content=self.reply)
+
+    async def ainvoke(self, messages, **kwargs):
+        return self.invoke(messages, **kwargs)
+
+    def stream(self, messages, **kwargs):
+        self._check(kwargs)
+        for index in range(0, len(self.reply), 4):
+            yield AIMessageChunk(content=self.reply[index:index + 4])
+
+    async def astream(self, messages, **kwargs):
+        for chunk in self.stream(messages, **kwargs):
+            yield chunk
+
+def test_rejected_json_mode_falls_back_to_streaming():
+    model = ScriptedModel('{"amount": 7} and some trailing prose')
+    client = LLMClient(model, json_mode=True, backoff_base=0)
+
+    assert client.invoke_json([HumanMessage(content="q")], SCHEMA) == {"amount": 7.0, "tags": []}
+    assert not client.json_mode_enabled()
+    assert client.stats()["json_mode_fallbacks"] == 1
+    assert client.stats()["json_early_exits"] == 1
+
+    client.invoke_json([HumanMessage(content="q")], SCHEMA)
+    assert [call for call in model.calls if "response_format" in call] == [{"response_format": {"type": "json_object"}}]
+
+def test_rejected_json_mode_falls_back_async():
+    client = LLMClient(ScriptedModel('{"amount": 7}'), json_mode=True, backoff_base=0)
+    assert asyncio.run(client.ainvoke_json([HumanMessage(content="q")], SCHEMA))["amount"] == 7.0
+    assert client.stats()["json_mode_fallbacks"] == 1
+
+def test_supported_json_mode_is_kept():
+    model = ScriptedModel('{"amount": 7}', rejects_json_mode=False)
+    client = LLMClient(model, json_mode=True)
+    client.invoke_json([HumanMessage(content="q")], SCHEMA)
+    assert client.json_mode_enabled()
+    assert model.calls == [{"response_format": {"type": "json_object"}}]
+
+def test_other_bad_requests_are_not_treated_as_json_mode_rejections():
+    class BadRequest(Exception):
+        status_code = 400
+
+    class Broken(ScriptedModel):
+        def invoke(self, messages, **kwargs):
+            raise BadRequest("Error code: 400 - context length exceeded")
+
+    client = LLMClient(Broken(""), json_mode=True)
+    with pytest.raises(BadRequest):
+        client.invoke_json([HumanMessage(content="q")], SCHEMA)
+    assert client.json_mode_enabled()
+
+def test_bad_request_mentioning_json_is_not_a_json_mode_rejection():
+    class BadRequest(Exception):
+        status_code = 400
+
+    class Broken(ScriptedModel):
+        def invoke(self, messages, **kwargs):
+            raise BadRequest("Error code: 400 - invalid JSON in request body")
+
+    client = LLMClient(Broken(""), json_mode=True)
+    with pytest.raises(BadRequest):
+        client.invoke_json([HumanMessage(content="q")], SCHEMA)
+    assert client.json_mode_enabled()
+
+def test_json_mode_rejection_is_per_model_and_expires():
+    model = ScriptedModel('{"amount": 7}')
+    model.model_name = "plain-only"
+    other = ScriptedModel('{"amount": 7}', rejects_json_mode=False)
+    other.model_name = "json-capable"
+    client = LLMClient(model, json_mode=True, json_mode_retry_seconds=0.05, backoff_base=0)
+
+    client.invoke_json([HumanMessage(content="q")], SCHEMA)
+    assert not client.json_mode_enabled(model)
+    assert client.json_mode_enabled(other)
+
+    time.sleep(0.06)
+    assert client.json_mode_enabled(model)
+    client.invoke_json([HumanMessage(content="q")], SCHEMA)
+    assert client.stats()["json_mode_fallbacks"] == 2  # Tried again, and rejected again
+
+def test_per_loop_http_clients_are_closed_at_loop_shutdown():
+    class AsyncHTTPClient:
+        closed = False
+
+        async def aclose(self):
+            self.closed = True
+
+    built = []
+
+    def factory():
+        model = ScriptedModel('{"amount": 7}', rejects_json_mode=False)
+        model.http_async_client = AsyncHTTPClient()
+        built.append(model)
+        return model
+
+    client = LLMClient(ScriptedModel(""), async_model_factory=factory)
+    for _ in range(2):
+        asyncio.run(client.ainvoke_json([HumanMessage(content="q")], SCHEMA))
+    assert len(built) == 2  # One per event loop
+    assert all(model.http_async_client.closed for model in built)
@@ -0,0 +1,82 @@
+"""OCR cache: exact hits, pipeline changes, duplicates and counters"""
+
+import sqlite3
+import threading
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.utils import ocr_cache
+from src.utils.ocr_cache import OCRCache, cached_ocr, fingerprint_image, hamming_distance
+
+def _receipt(label="Uber 45.00"):
+    image = Image.new("RGB", (200, 300), "white")
+    ImageDraw.Draw(image).text((20, 20), label, fill="black")
+    return image
+
+@pytest.fixture
+def ocr_calls(monkeypatch):
+    calls = []
+
+    def fake_ocr(image, steps=None):
+        calls.append(steps)
+        return f"Uber total 45.00 steps={','.join(steps or ['default'])}"
+
+    monkeypatch.setattr(ocr_cache, "run_ocr", fake_ocr)
+    return calls
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(1 << 255, 0) == 1
+
+def test_exact_hit_skips_ocr_and_reports_other_claims(ocr_calls):
+    cache = OCRCache(":memory:")
+    text, fingerprint, duplicate = cached_ocr(_receipt(), "claim-a", "emp_1", cache=cache)
+    assert duplicate is None
+    assert cached_ocr(_receipt(), "claim-a", "emp_1", cache=cache) == (text, fingerprint, None)
+    _, _, duplicate = cached_ocr(_receipt(), "claim-b", "emp_2", cache=cache)
+    assert duplicate["match"] == "exact" and duplicate["thread_id"] == "claim-a"
+    assert len(ocr_calls) == 1
+    assert cache.stats()["exact_hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_changed_pipeline_reruns_ocr_but_keeps_the_first_submitter(ocr_calls):
+    cache = OCRCache(":memory:")
+    cached_ocr(_receipt(), "claim-a", cache=cache)
+    text, _, duplicate = cached_ocr(_receipt(), "claim-b", cache=cache, steps=["grayscale"])
+    assert text.endswith("steps=grayscale")
+    assert duplicate["thread_id"] == "claim-a"
+    assert cached_ocr(_receipt(), "claim-c", cache=cache, steps=["grayscale"])[0] == text
+    assert ocr_calls == [None, ["grayscale"]]
+
+def test_rows_from_before_pipelines_are_migrated(tmp_path, ocr_calls):
+    path = str(tmp_path / "ocr.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE ocr_cache (sha256 TEXT PRIMARY KEY, phash TEXT NOT NULL, text TEXT NOT NULL, thread_id TEXT, "
+        "employee_id TEXT, first_seen REAL NOT NULL, last_access REAL NOT NULL)"
+    )
+    fingerprint = fingerprint_image(_receipt())
+    conn.execute("INSERT INTO ocr_cache VALUES (?, ?, 'old text', 'claim-a', NULL, 0, 0)",
+                 (fingerprint.sha256, format(fingerprint.phash, "x")))
+    conn.commit()
+    conn.close()
+
+    text, _, duplicate = cached_ocr(_receipt(), "claim-b", cache=OCRCache(path))
+    assert text != "old text" and duplicate["thread_id"] == "claim-a"
+
+def test_counters_are_consistent_under_threads(ocr_calls):
+    cache = OCRCache(":memory:")
+    images = [_receipt(f"Uber {n}.00") for n in range(4)]
+
+    def submit():
+        for _ in range(25):
+            for image in images:
+                cached_ocr(image, "claim-a", cache=cache)
+
+    threads = [threading.Thread(target=submit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["exact_hits"] + stats["misses"] == 400
@@ -0,0 +1,30 @@
+"""Batch re-scoring of processed claims"""
+
+import json
+
+from src.utils.policy_batch import main
+
+def _record(**extra):
+    return dict({
+        "amount": 10.0, "currency": "USD", "expense_date": "2025-07-01", "country": "United States",
+        "department": "Sales", "approval_status": "requires_manager",
+    }, **extra)
+
+def test_rescore_keeps_violations_and_cap_breaches_with_a_manager(tmp_path, capsys):
+    results = tmp_path / "results.jsonl"
+    output = tmp_path / "rescored.jsonl"
+    records = [
+        _record(violations=[{"type": "duplicate_claim", "severity": "high"}]),
+        _record(cap_breaches=[{"cap": "daily"}]),
+        _record(violations=[{"type": "near_duplicate_claim", "severity": "medium"}]),
+        _record(),
+    ]
+    results.write_text("\n".join(json.dumps(record) for record in records))
+
+    assert main([str(results), "--output", str(output)]) == 0
+
+    statuses = [json.loads(line)["approval_status"] for line in output.read_text().splitlines()]
+    assert statuses == ["requires_manager", "requires_manager", "auto_approved", "auto_approved"]
+    report = capsys.readouterr().out
+    assert "Decisions changed: 2" in report
+    assert "violations or spend caps: 2" in report
@@ -0,0 +1,100 @@
+"""Effective-dated policy table: interval boundaries, key specificity, dates and countries"""
+
+import pytest
+
+from src.utils import policy_rules
+from src.utils.helpers import calculate_approval_threshold, determine_approval_status
+from src.utils.policy_batch import evaluate_policy_batch
+from src.utils.policy_rules import PolicyRule, PolicyTable, get_policy_table, normalize_expense_date
+
+def _rule(id, effective_from, effective_to, threshold, country="*", department="*", category="*", currency="USD"):
+    return PolicyRule(id, country, department, category, effective_from, effective_to, threshold, currency)
+
+@pytest.fixture
+def table():
+    return PolicyTable(
+        [
+            _rule("old", "0001-01-01", "2024-01-01", 50),
+            _rule("new", "2024-01-01", None, 75),
+            _rule("uk", "2024-01-01", "2025-04-01", 60, country="United Kingdom", currency="GBP"),
+            _rule("sales", "2025-06-01", None, 100, department="Sales", category="ground_transport"),
+        ],
+        {"USD": 1.0, "GBP": 1.25},
+    )
+
+@pytest.mark.parametrize("expense_date, rule_id", [
+    ("2023-12-31", "old"),
+    ("2024-01-01", "new"),  # effective_from is inclusive
+    ("2099-01-01", "new"),  # open-ended
+])
+def test_interval_boundaries(table, expense_date, rule_id):
+    assert table.find_rule(expense_date).id == rule_id
+
+def test_effective_to_is_exclusive(table):
+    assert table.find_rule("2025-03-31", country="United Kingdom").id == "uk"
+    assert table.find_rule("2025-04-01", country="United Kingdom").id == "new"
+
+def test_country_outranks_department(table):
+    assert table.find_rule("2025-03-01", "United Kingdom", "Sales", "ground_transport").id == "uk"
+    assert table.find_rule("2025-07-01", "United States", "Sales", "ground_transport").id == "sales"
+    assert table.find_rule("2025-07-01", "United States", "Sales", "meals").id == "new"
+
+@pytest.mark.parametrize("country", ["UK", "United Kingdom.", "united kingdom", "The country is United Kingdom"])
+def test_country_aliases_hit_the_country_rule(table, country):
+    assert table.find_rule("2024-06-01", country=country).id == "uk"
+
+def test_overlapping_rules_are_rejected():
+    with pytest.raises(ValueError):
+        PolicyTable([_rule("a", "2024-01-01", "2024-06-01", 10), _rule("b", "2024-05-01", None, 20)], {"USD": 1.0})
+
+@pytest.mark.parametrize("raw, expected", [
+    ("2025-03-07", "2025-03-07"),
+    ("03/07/2025", "2025-03-07"),
+    ("2025-13-40", None),
+    ("2025-02-30", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_expense_date(raw, expected):
+    assert normalize_expense_date(raw) == expected
+
+def test_evaluate_converts_to_rule_currency(table):
+    decision = table.evaluate(70.0, "USD", "2024-06-01", country="UK")
+    assert decision.rule.id == "uk"
+    assert decision.amount_in_rule_currency == 56.0
+    assert decision.approval_status == "auto_approved"
+
+def test_evaluate_sends_unjudgeable_claims_to_a_manager(table):
+    assert table.evaluate(10.0, "USD", "2025-13-40").approval_status == "requires_manager"
+    assert table.evaluate(None, "USD", "2024-06-01").approval_status == "requires_manager"
+    assert table.evaluate(10.0, "XYZ", "2024-06-01").approval_status == "requires_manager"
+
+def test_batch_agrees_with_per_claim_evaluation():
+    table = get_policy_table()
+    rows = [
+        (40.0, "USD", "2023-06-01", "United States", "Sales"),
+        (60.0, "GBP", "2024-06-01", "UK", "Marketing"),
+        (90.0, "USD", "2025-07-01", "USA", "Sales"),
+        (20.0, "USD", "2025-13-40", "United States", "HR"),
+        (20.0, "USD", "2025-02-30", "United States", "HR"),
+        (4000.0, "INR", "2024-03-01", "India", "Engineering"),
+        (10.0, "EUR", None, "Germany", "Finance"),
+    ]
+    amounts, currencies, dates, countries, departments = map(list, zip(*rows))
+    result = evaluate_policy_batch(
+        amounts, dates, currencies=currencies, countries=countries, departments=departments,
+        categories=["ground_transport"] * len(rows), table=table,
+    )
+    for row, (amount, currency, expense_date, country, department) in enumerate(rows):
+        decision = table.evaluate(amount, currency, expense_date, country, department, "ground_transport")
+        assert result.approval_status[row] == decision.approval_status
+        assert result.rule_ids()[row] == (decision.rule.id if decision.rule else None)
+
+def test_threshold_is_in_the_claim_currency(table, monkeypatch):
+    monkeypatch.setattr(policy_rules, "_table", table)
+    # The UK rule is 60 GBP = 75 USD; a 70 USD claim is under it, as evaluate() decides
+    threshold = calculate_approval_threshold("2024-06-01", country="UK", currency="USD")
+    assert threshold == pytest.approx(75.0)
+    assert determine_approval_status(70.0, threshold) == table.evaluate(70.0, "USD", "2024-06-01", country="UK").approval_status
+    assert calculate_approval_threshold("2024-06-01", country="UK", currency="GBP") == 60
+    assert calculate_approval_threshold("2024-06-01", country="UK", currency="XYZ") == 0.0
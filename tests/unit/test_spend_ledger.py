@@ -0,0 +1,75 @@
+"""Spend ledger: period keys, running totals, caps, rebuild and consistency"""
+
+import random
+
+import pytest
+
+from src.utils.spend_ledger import SpendLedger, period_keys
+
+@pytest.fixture
+def ledger(tmp_path):
+    return SpendLedger(str(tmp_path / "ledger.sqlite"))
+
+def test_period_keys_use_iso_week_monday():
+    assert period_keys("2025-03-16") == {"daily": "D:2025-03-16", "weekly": "W:2025-03-10", "monthly": "M:2025-03"}
+    assert period_keys("2024-12-31")["weekly"] == "W:2024-12-30"
+
+def test_totals_per_day_week_and_month(ledger):
+    ledger.record_claim("a", "emp_1", "Sales", "2025-03-10", 40.10)
+    ledger.record_claim("b", "emp_1", "Sales", "2025-03-12", 20.20)
+    ledger.record_claim("c", "emp_1", "Sales", "2025-03-31", 5.00)
+    ledger.record_claim("d", "emp_2", "Sales", "2025-03-12", 1.00)
+
+    assert ledger.spent("employee", "emp_1", "2025-03-12") == {"daily": 20.2, "weekly": 60.3, "monthly": 65.3}
+    assert ledger.spent("department", "Sales", "2025-03-12") == {"daily": 21.2, "weekly": 61.3, "monthly": 66.3}
+    assert ledger.spent("employee", None, "2025-03-12") == {"daily": 0.0, "weekly": 0.0, "monthly": 0.0}
+
+def test_claim_is_recorded_once(ledger):
+    assert ledger.record_claim("a", "emp_1", "Sales", "2025-03-10", 10.0)
+    assert not ledger.record_claim("a", "emp_1", "Sales", "2025-03-10", 10.0)
+    assert ledger.spent("employee", "emp_1", "2025-03-10")["daily"] == 10.0
+
+def test_remove_claim_takes_totals_back_out(ledger):
+    ledger.record_claim("a", "emp_1", "Sales", "2025-03-10", 10.0)
+    ledger.record_claim("b", "emp_1", "Sales", "2025-03-10", 5.0)
+    assert ledger.remove_claim("a")
+    assert not ledger.remove_claim("a")
+    assert ledger.spent("employee", "emp_1", "2025-03-10")["daily"] == 5.0
+    assert ledger.check()["consistent"]
+
+def test_check_caps_reports_each_breach(ledger):
+    ledger.record_claim("a", "emp_1", "Sales", "2025-03-10", 90.0)
+    spend, breaches = ledger.check_caps(
+        "emp_1", "Sales", "2025-03-11", 20.0,
+        employee_caps={"daily": 50.0, "weekly": 100.0}, department_caps={"monthly": 1000.0},
+    )
+    assert spend["employee"]["weekly"] == 90.0
+    assert [(b["scope"], b["period"], b["projected_usd"]) for b in breaches] == [("employee", "weekly", 110.0)]
+
+def test_cap_equal_to_total_is_not_a_breach(ledger):
+    ledger.record_claim("a", "emp_1", None, "2025-03-10", 40.0)
+    _, breaches = ledger.check_caps("emp_1", None, "2025-03-10", 10.0, employee_caps={"daily": 50.0}, department_caps={})
+    assert breaches == []
+
+def test_rebuild_matches_incremental_totals(ledger):
+    rng = random.Random(3)
+    for i in range(300):
+        day = f"2025-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}"
+        ledger.record_claim(f"c{i}", f"emp_{rng.randint(1, 5)}", rng.choice(["Sales", "HR", None]), day, rng.randint(100, 9000) / 100)
+    for i in range(0, 300, 7):
+        ledger.remove_claim(f"c{i}")
+    before = ledger.spent("employee", "emp_1", "2025-02-14")
+
+    assert ledger.check()["consistent"]
+    ledger.rebuild()
+    assert ledger.check()["consistent"]
+    assert ledger.spent("employee", "emp_1", "2025-02-14") == before
+
+def test_check_detects_drift(ledger):
+    ledger.record_claim("a", "emp_1", "Sales", "2025-03-10", 10.0)
+    ledger._conn.execute("UPDATE spend_totals SET total_cents = total_cents + 1 WHERE scope = 'employee'")
+    result = ledger.check()
+    assert not result["consistent"]
+    assert result["stored_but_not_expected"]
+    ledger.rebuild()
+    assert ledger.check()["consistent"]